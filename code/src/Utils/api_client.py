@@ -0,0 +1,246 @@
+# Import required libraries
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from Utils.metrics import inc, timed, CACHE_REQUESTS
+
+# Base URL of the external recommendation engine
+API_BASE_URL = "https://api.recommendation-engine.com"  # Hypothetical API endpoint
+
+# Raised instead of calling the API while the circuit breaker is open
+class CircuitOpenError(Exception):
+    pass
+
+# Statuses meaning the endpoint does not exist on the server (rather than the request being bad)
+MISSING_ENDPOINT_STATUSES = (404, 405)
+
+# Convert NumPy scalars and arrays coming from DataFrame rows into JSON types
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Serialise a payload canonically so equal payloads produce equal cache keys
+def encode_payload(payload):
+    return json.dumps(payload, sort_keys=True, default=_to_json)
+
+# Stop calling an endpoint after repeated failures and probe it again after a cool-down
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    # True if a request may be sent; once the cool-down has passed a single probe is let through
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+# Thread-safe response cache with a time-to-live and LRU eviction
+class TTLCache:
+    def __init__(self, ttl=300.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# Pooled keep-alive client for the recommendation API with caching and a circuit breaker
+class RecommendationClient:
+    def __init__(self, api_key, base_url=API_BASE_URL, timeout=10, pool_size=10, cache_ttl=300.0,
+                 failure_threshold=3, reset_timeout=30.0):
+        # requests is only imported once an API key is actually used
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        # No credentials are sent without a key
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self.cache = TTLCache(cache_ttl)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    # POST a JSON body through the circuit breaker and return the decoded response
+    def _post(self, path, body):
+        return self._request("POST", path, data=body)
+
+    # GET a JSON resource through the circuit breaker
+    def _get(self, path, params=None):
+        return self._request("GET", path, params=params)
+
+    # Send a request and return the decoded response. Only signs of an unhealthy endpoint
+    # (connection errors, timeouts, 5xx) count as breaker failures; a 4xx means the endpoint is up
+    # and rejected this request, and is raised to the caller as is
+    @timed("api_request")
+    def _request(self, method, path, **kwargs):
+        import requests
+
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.base_url}, skipping request")
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        response.raise_for_status()
+        return response.json()
+
+    # Return the recommendations for one payload, served from the cache when possible
+    def _recommend(self, path, payload):
+        body = encode_payload(payload)
+        key = hashlib.sha1((path + body).encode("utf-8")).hexdigest()
+        recs = self.cache.get(key)
+        inc(CACHE_REQUESTS, cache="api", result="miss" if recs is None else "hit")
+        if recs is None:
+            recs = self._post(path, body).get("recommendations", [])
+            self.cache.set(key, recs)
+        return recs
+
+    # Recommendations for an existing customer
+    def recommend(self, customer_data, strategy="hybrid", similarity_data=None):
+        return self._recommend("/recommend", {
+            "customer_data": customer_data,
+            "strategy": strategy,
+            "similarity_data": similarity_data or [],
+        })
+
+    # Recommendations for a new customer; the strategy is only sent when given
+    def recommend_new(self, customer_data, strategy=None):
+        payload = {"customer_data": customer_data}
+        if strategy is not None:
+            payload["strategy"] = strategy
+        return self._recommend("/recommend-new", payload)
+
+    # Customers of a recommendation server (python -m Utils.server) whose name contains `query`:
+    # the number of matches and one page of names, with the server's snapshot version
+    def customers(self, query="", offset=0, limit=50):
+        return self._get("/customers", {"query": query, "offset": offset, "limit": limit})
+
+    # Stored record and live revision of one customer of a recommendation server
+    def customer(self, name):
+        return self._get("/customer", {"name": name})
+
+    # Whole-base cohort summary of a recommendation server
+    def cohorts(self):
+        return self._get("/cohorts")
+
+    # Size of a named segment on a recommendation server and its first `limit` customers
+    def segment(self, name, limit=50):
+        return self._get("/segment", {"name": name, "limit": limit})
+
+    # Run recommend or recommend_new in the background and return a Future
+    def submit(self, method, *args, **kwargs):
+        return self.executor.submit(getattr(self, method), *args, **kwargs)
+
+    # Recommendations for many payloads: cached ones are served locally and the rest go out in one
+    # /recommend-batch request, or concurrently one by one if the server has no batch endpoint or
+    # the batch call fails on the server's side. A batch rejected as a bad request (4xx) is raised
+    def recommend_many(self, payloads, path="/recommend"):
+        import requests
+
+        bodies = [encode_payload(p) for p in payloads]
+        keys = [hashlib.sha1((path + body).encode("utf-8")).hexdigest() for body in bodies]
+        results = [self.cache.get(key) for key in keys]
+        pending = [i for i, recs in enumerate(results) if recs is None]
+        inc(CACHE_REQUESTS, len(results) - len(pending), cache="api", result="hit")
+        inc(CACHE_REQUESTS, len(pending), cache="api", result="miss")
+        if not pending:
+            return results
+        try:
+            batch_body = encode_payload({"endpoint": path, "requests": [payloads[i] for i in pending]})
+            responses = self._post("/recommend-batch", batch_body).get("results", [])
+            if len(responses) != len(pending):
+                raise ValueError("Batch response size does not match request size")
+            fetched = [r.get("recommendations", []) for r in responses]
+        except CircuitOpenError:
+            raise
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 500
+            if status < 500 and status not in MISSING_ENDPOINT_STATUSES:
+                raise
+            fetched = self._post_each(path, bodies, pending)
+        except Exception:
+            fetched = self._post_each(path, bodies, pending)
+        for i, recs in zip(pending, fetched):
+            results[i] = recs
+            self.cache.set(keys[i], recs)
+        return results
+
+    # Send the given bodies one request each, concurrently, and return their recommendations
+    def _post_each(self, path, bodies, indices):
+        return list(self.executor.map(lambda i: self._post(path, bodies[i]).get("recommendations", []), indices))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+# Clients shared across calls, one per API key and base URL
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Return the shared client for an API key so connections are pooled across requests
+def get_client(api_key, base_url=API_BASE_URL, **kwargs):
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            client = _clients[(api_key, base_url)] = RecommendationClient(api_key, base_url, **kwargs)
+        return client
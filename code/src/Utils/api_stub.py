@@ -0,0 +1,72 @@
+# Import required libraries
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Utils.recommendations import recommend_new_customer
+
+# Local stand-in for the external recommendation API, for running the client offline
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    # Simulated recommendations computed with the local contextual recommender
+    def _recommend(self, payload):
+        return {"recommendations": recommend_new_customer(payload["customer_data"])}
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with server.lock:
+            server.request_counts[self.path] = server.request_counts.get(self.path, 0) + 1
+        if server.latency:
+            time.sleep(server.latency)
+        if random.random() < server.fail_rate:
+            self._send_json(503, {"error": "simulated failure"})
+        elif self.path in ("/recommend", "/recommend-new"):
+            self._send_json(200, self._recommend(payload))
+        elif self.path == "/recommend-batch":
+            self._send_json(200, {"results": [self._recommend(p) for p in payload.get("requests", [])]})
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def log_message(self, format, *args):
+        pass
+
+# Start the stub API in a background thread; port 0 picks a free port
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.request_counts = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local stub of the recommendation API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, args.latency, args.fail_rate)
+    print(f"Stub recommendation API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,134 @@
+# Import required libraries
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from Utils.data_processing import preprocess_data, load_sample_data, SAMPLE_DATA_PATH
+from Utils.recommendations import get_candidates, rank_recommendations_batch
+
+# Per-process state shared by every chunk a worker scores
+_worker_state = {}
+
+# Load customers and build the embeddings and neighbour index once in the parent process
+def load_batch_inputs(json_path=SAMPLE_DATA_PATH, backend="exact"):
+    # Imported here so pool workers never load the transformer model
+    from Utils.embeddings import load_model, load_embedding_cache, get_embeddings, get_neighbor_index
+
+    df = load_sample_data(json_path)
+    processed_df = preprocess_data(df)
+    embeddings = get_embeddings(processed_df, load_model(), cache=load_embedding_cache())
+    return df, get_neighbor_index(embeddings, backend)
+
+# Pool initializer: keep the customers and neighbour index resident in the worker
+def _init_worker(df, neighbor_index, strategy, top_n):
+    _worker_state.update(df=df, neighbor_index=neighbor_index, strategy=strategy, top_n=top_n)
+
+# Score one chunk of customers, looking up all of their neighbours in a single batched query
+def score_chunk(rows, df=None, neighbor_index=None, strategy="hybrid", top_n=5):
+    if df is None:
+        df = _worker_state["df"]
+        neighbor_index = _worker_state["neighbor_index"]
+        strategy = _worker_state["strategy"]
+        top_n = _worker_state["top_n"]
+    neighbors, _ = neighbor_index.query_batch(neighbor_index.vectors[rows], 3)
+    customers = [df.iloc[idx].to_dict() for idx in rows]
+    candidate_lists = [get_candidates(customer_data, df, idx, similar_users[similar_users >= 0], strategy)
+                       for customer_data, idx, similar_users in zip(customers, rows, neighbors)]
+    # Score the whole chunk as one customers x products matrix
+    ranked = rank_recommendations_batch(candidate_lists, customers, strategy, top_n)
+    return [{"Customer Name": customer_data["Customer Name"], "recommendations": recs}
+            for customer_data, recs in zip(customers, ranked)]
+
+# Stream result records to a JSON Lines file
+class JsonlWriter:
+    def __init__(self, path):
+        self.f = sys.stdout if path == "-" else open(path, 'w')
+
+    def write(self, records):
+        for record in records:
+            self.f.write(json.dumps(record, default=float) + "\n")
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+# Stream result records to a Parquet file, one row group per chunk
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pa
+        rec_type = pa.struct([("product", pa.string()), ("score", pa.float64()), ("reason", pa.string()), ("risk", pa.float64())])
+        self.schema = pa.schema([("Customer Name", pa.string()), ("recommendations", pa.list_(rec_type))])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        self.writer.write_table(self.pa.Table.from_pylist(records, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+# Pick the output writer from the file extension
+def open_writer(path):
+    if path.endswith(".parquet"):
+        return ParquetWriter(path)
+    return JsonlWriter(path)
+
+# Score every customer (or the given rows) in chunks across a process pool and stream the results
+def run_batch(df, neighbor_index, writer, rows=None, strategy="hybrid", top_n=5, chunk_size=1000, workers=None, log=sys.stderr):
+    rows = list(range(len(df))) if rows is None else list(rows)
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    done = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(df, neighbor_index, strategy, top_n)) as executor:
+        for results in executor.map(score_chunk, chunks):
+            writer.write(results)
+            done += len(results)
+            elapsed = time.perf_counter() - start
+            print(f"{done}/{len(rows)} customers, {done / elapsed:.1f} customers/sec", file=log)
+    elapsed = time.perf_counter() - start
+    return {"customers": done, "seconds": elapsed, "customers_per_sec": done / elapsed if elapsed else 0.0}
+
+# Resolve customer names to row indices, failing loudly on unknown names
+def resolve_customers(df, names):
+    row_by_name = {name: i for i, name in enumerate(df["Customer Name"])}
+    missing = [name for name in names if name not in row_by_name]
+    if missing:
+        raise SystemExit(f"Unknown customers: {', '.join(missing)}")
+    return [row_by_name[name] for name in names]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute top-N recommendations for the whole customer base")
+    parser.add_argument("--data", default=SAMPLE_DATA_PATH, help="customer JSON dataset")
+    parser.add_argument("--output", default="recommendations.jsonl", help=".jsonl, .parquet or - for stdout")
+    parser.add_argument("--customer", action="append", default=[], help="only score this customer (repeatable)")
+    parser.add_argument("--customers-file", help="file with one customer name per line to score")
+    parser.add_argument("--strategy", default="hybrid", choices=["hybrid", "collaborative", "contextual"])
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--backend", default="exact", help="neighbour index backend")
+    args = parser.parse_args(argv)
+
+    df, neighbor_index = load_batch_inputs(args.data, args.backend)
+    names = list(args.customer)
+    if args.customers_file:
+        with open(args.customers_file, 'r') as f:
+            names.extend(line.strip() for line in f if line.strip())
+    rows = resolve_customers(df, names) if names else None
+
+    writer = open_writer(args.output)
+    try:
+        stats = run_batch(df, neighbor_index, writer, rows, args.strategy, args.top_n, args.chunk_size, args.workers)
+    finally:
+        writer.close()
+    print(f"Scored {stats['customers']} customers in {stats['seconds']:.2f}s "
+          f"({stats['customers_per_sec']:.1f} customers/sec)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
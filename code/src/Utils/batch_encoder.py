@@ -0,0 +1,71 @@
+# Import required libraries
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+# Collect encode requests from concurrent callers and run them through the model as one batch
+class MicroBatchEncoder:
+    def __init__(self, encode, max_batch_size=32, max_wait=0.01):
+        self.encode_fn = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.closed = False
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    # Queue one text for encoding and return a Future for its vector
+    def submit(self, text):
+        if self.closed:
+            raise RuntimeError("MicroBatchEncoder is closed")
+        future = Future()
+        self.requests.put((text, future))
+        return future
+
+    # Encode one text, blocking until the batch it joined has been encoded
+    def encode(self, text, timeout=None):
+        return self.submit(text).result(timeout)
+
+    # Wait for the first request, then gather more until the batch is full or max_wait has passed
+    def _next_batch(self):
+        item = self.requests.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            texts = [text for text, _ in batch]
+            try:
+                vectors = np.asarray(self.encode_fn(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    # Stop the worker after the queued requests have been served
+    def close(self):
+        self.closed = True
+        self.requests.put(None)
+        self.worker.join()
@@ -0,0 +1,127 @@
+# Import required libraries
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from Utils.data_processing import load_sample_data, preprocess_data
+from Utils.embeddings import get_embeddings, get_similarity_matrix, get_neighbor_index
+from Utils.recommendations import recommend_products, recommend_new_customer
+from Utils.synthetic import write_dataset, parse_size
+
+# CPU-only stand-in for the transformer: hashed bag-of-words projected to the model's dimension
+class HashingEncoder:
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    # batch_size is accepted for compatibility with SentenceTransformer.encode and ignored
+    def encode(self, texts, batch_size=None):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.replace("\n", " ").replace(",", " ").split():
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, h % self.dim] += 1.0 if h & (1 << 63) else -1.0
+        return vectors
+
+# Run a stage once for wall time and once under tracemalloc for peak Python/NumPy allocation
+def measure(fn, memory=True):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    stats = {"seconds": seconds}
+    if memory:
+        del result
+        tracemalloc.start()
+        result = fn()
+        stats["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, stats
+
+# Current git commit, if the benchmark runs inside a checkout
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Time and memory-profile every pipeline stage on one dataset
+def run_benchmark(json_path, encoder=None, sample=100, max_similarity_rows=20000, memory=True, seed=0):
+    encoder = encoder or HashingEncoder()
+    stages = {}
+    df, stages["load_sample_data"] = measure(lambda: load_sample_data(json_path), memory)
+    processed_df, stages["preprocess_data"] = measure(lambda: preprocess_data(df), memory)
+    embeddings, stages["get_embeddings"] = measure(lambda: get_embeddings(processed_df, encoder), memory)
+
+    # The dense matrix is O(N^2), so it is skipped above a size where it would not fit in memory
+    if len(df) <= max_similarity_rows:
+        _, stages["get_similarity_matrix"] = measure(lambda: get_similarity_matrix(embeddings), memory)
+    else:
+        stages["get_similarity_matrix"] = {"skipped": f"more than {max_similarity_rows} rows"}
+    neighbor_index, stages["get_neighbor_index"] = measure(lambda: get_neighbor_index(embeddings), memory)
+
+    # Per-call stages run over a fixed random sample of customers
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(df), min(sample, len(df)), replace=False)
+    customers = [df.iloc[i].to_dict() for i in rows]
+    _, stats = measure(lambda: [recommend_products(c, df, neighbor_index) for c in customers], memory)
+    stages["recommend_products"] = dict(stats, calls=len(customers), ms_per_call=stats["seconds"] * 1000 / len(customers))
+    _, stats = measure(lambda: [recommend_new_customer(c) for c in customers], memory)
+    stages["recommend_new_customer"] = dict(stats, calls=len(customers), ms_per_call=stats["seconds"] * 1000 / len(customers))
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "rows": len(df),
+        "encoder": type(encoder).__name__,
+        "stages": stages,
+    }
+
+# Relative change of every stage's time and peak memory between two result files
+def compare_results(old, new):
+    changes = {}
+    for stage, after in new["stages"].items():
+        before = old["stages"].get(stage, {})
+        changes[stage] = {metric: after[metric] / before[metric] if before.get(metric) else None
+                          for metric in ("seconds", "peak_mb") if metric in after}
+    return changes
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stage-by-stage benchmark on synthetic customers")
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help="dataset sizes, e.g. 10k 100k 1m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample", type=int, default=100, help="customers per recommendation stage")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output-dir", default="benchmarks", help="where to write <size>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], 'r') as f:
+            old = json.load(f)
+        with open(args.compare[1], 'r') as f:
+            new = json.load(f)
+        for stage, change in compare_results(old, new).items():
+            print(f"{stage:>24}: " + "  ".join(f"{k} x{v:.2f}" for k, v in change.items() if v is not None))
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for size in args.sizes:
+            rows = parse_size(size)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                json_path = write_dataset(os.path.join(tmp_dir, "customers.json"), rows, args.seed)
+                result = run_benchmark(json_path, sample=args.sample, memory=not args.no_memory, seed=args.seed)
+            result["seed"] = args.seed
+            out_path = os.path.join(args.output_dir, f"{size}.json")
+            with open(out_path, 'w') as f:
+                json.dump(result, f, indent=2)
+            for stage, stats in result["stages"].items():
+                print(f"{size:>5} {stage:>24}: " + ("skipped" if "skipped" in stats else
+                      f"{stats['seconds']:.3f}s" + (f"  peak {stats['peak_mb']:.1f} MB" if "peak_mb" in stats else "")))
+            print(f"Wrote {out_path}")
@@ -0,0 +1,132 @@
+# Import required libraries
+import sys
+import threading
+import numpy as np
+
+# Map of interests to potential products
+INTEREST_PRODUCTS = {
+    "Tech": ["Wireless Keyboard", "External SSD"],
+    "Gaming": ["Gaming Mouse", "Mechanical Keyboard"],
+    "Fashion": ["Designer Watch", "Silk Scarf"],
+    "Winter Wear": ["Winter Boots", "Wool Gloves"],
+    "Mobile": ["Phone Stand", "Screen Protector"],
+    "Accessories": ["Smart Watch", "Wireless Earbuds"],
+    "Photography": ["Camera Bag", "Lens Cleaner"],
+    "Gadgets": ["Smart Speaker", "Fitness Tracker"],
+    "Luxury": ["Premium Credit Card", "Investment Portfolio"],
+    "Travel": ["Travel Insurance", "Currency Exchange Card"]
+}
+
+# Map of categories to the products (owned or recommended) that belong to them
+CATEGORY_PRODUCTS = {
+    "Tech": ["Laptop", "Mouse", "Wireless Keyboard", "External SSD"],
+    "Gaming": ["Gaming Mouse", "Mechanical Keyboard"],
+    "Fashion": ["Shoes", "Jacket", "Designer Watch", "Silk Scarf"],
+    "Winter Wear": ["Winter Boots", "Wool Gloves"],
+    "Mobile": ["Phone", "Phone Stand", "Screen Protector"],
+    "Accessories": ["Earbuds", "Smart Watch", "Wireless Earbuds"],
+    "Photography": ["Camera", "Tripod", "Camera Bag", "Lens Cleaner"],
+    "Gadgets": ["Smart Speaker", "Fitness Tracker"],
+    "Luxury": ["Watch", "Sunglasses", "Premium Credit Card", "Investment Portfolio"],
+    "Travel": ["Travel Insurance", "Currency Exchange Card"]
+}
+
+# Product catalog compiled once with interned IDs and precomputed lookup indexes. It is shared by
+# request threads: new products are interned under a lock, and only the known interests and
+# categories are memoised, so the memo stays bounded by terms x products
+class ProductCatalog:
+    def __init__(self, interest_products=INTEREST_PRODUCTS, category_products=CATEGORY_PRODUCTS):
+        self.source = {"interest_products": interest_products, "category_products": category_products}
+        self.products = []
+        self.product_ids = {}
+        self.lock = threading.Lock()
+        self.interest_products = {interest: tuple(self.intern(p) for p in products) for interest, products in interest_products.items()}
+        self.categories = list(category_products)
+        self.product_categories = {}
+        for category, products in category_products.items():
+            for product in products:
+                self.product_categories.setdefault(self.intern(product), set()).add(category)
+        self.product_categories = {product: frozenset(cats) for product, cats in self.product_categories.items()}
+        self._category_matrix = None
+        # Pre-resolve "term is a substring of product" for every known interest/category and product
+        self.terms = frozenset(interest_products) | frozenset(category_products)
+        self._matches = {}
+        for term in self.terms:
+            for product in self.products:
+                self.matches(term, product)
+
+    # Return the canonical string for a product, assigning it an integer ID on first sight. The
+    # product is appended before its ID is published, so lock-free readers never see a dangling ID
+    def intern(self, product):
+        if product not in self.product_ids:
+            with self.lock:
+                if product not in self.product_ids:
+                    product = sys.intern(product)
+                    self.products.append(product)
+                    self.product_ids[product] = len(self.products) - 1
+        return self.products[self.product_ids[product]]
+
+    # Check whether a term (interest or category) appears in a product name, case-insensitively.
+    # Only known terms and interned products are memoised; the result never changes, so
+    # concurrent writers store the same value
+    def matches(self, term, product):
+        key = (term, product)
+        match = self._matches.get(key)
+        if match is None:
+            match = term.lower() in product.lower()
+            if term in self.terms and product in self.product_ids:
+                self._matches[key] = match
+        return match
+
+    # Terms that match the product, in their original order
+    def matching_terms(self, terms, product):
+        return [term for term in terms if self.matches(term, product)]
+
+    # True if any of the terms matches the product
+    def any_match(self, terms, product):
+        return any(self.matches(term, product) for term in terms)
+
+    # Contextual products for a list of interests
+    def contextual_products(self, interests):
+        products = []
+        for interest in interests:
+            products.extend(self.interest_products.get(interest, ()))
+        return products
+
+    # Categories of the products a customer has already purchased
+    def purchase_categories(self, purchases):
+        categories = set()
+        for purchase in purchases:
+            categories.update(self.product_categories.get(purchase, ()))
+        return categories
+
+    # Boolean terms x products matrix of substring matches for the given product IDs
+    def term_matrix(self, terms, product_ids=None):
+        products = self.products if product_ids is None else [self.products[i] for i in product_ids]
+        return np.array([[self.matches(term, product) for product in products] for term in terms], dtype=bool).reshape(len(terms), len(products))
+
+    # Categories x products match matrix over the whole catalog, rebuilt only when new products were interned
+    def category_matrix(self):
+        matrix = self._category_matrix
+        if matrix is None or matrix.shape[1] != len(self.products):
+            matrix = self._category_matrix = self.term_matrix(self.categories)
+        return matrix
+
+    # Integer IDs of the given products, interning unseen ones
+    def ids(self, products):
+        return np.array([self.product_ids[self.intern(p)] for p in products], dtype=np.int64)
+
+    # Serialisable form that preserves every product ID, including products interned later
+    def to_dict(self):
+        return dict(self.source, products=list(self.products))
+
+    # Rebuild a catalog saved with to_dict, with identical product IDs
+    @classmethod
+    def from_dict(cls, data):
+        catalog = cls(data["interest_products"], data["category_products"])
+        for product in data["products"]:
+            catalog.intern(product)
+        return catalog
+
+# Catalog shared by the recommendation functions
+DEFAULT_CATALOG = ProductCatalog()
@@ -0,0 +1,170 @@
+# Import required libraries
+import threading
+import numpy as np
+from Utils.scoring import assess_risk_vector
+
+# Age bands of the cohort counts: (label, first age, first age of the next band)
+AGE_BANDS = [("18-24", 18, 25), ("25-34", 25, 35), ("35-44", 35, 45), ("45-54", 45, 55), ("55-64", 55, 65), ("65+", 65, 200)]
+
+# Levels of the social media activity column, in order
+SOCIAL_LEVELS = ["Low", "Medium", "High"]
+
+# Percentiles reported for each metric
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Metrics with percentiles
+METRICS = ["sentiment", "engagement", "risk"]
+
+# Percentiles of every metric included in a summary, so a value can be ranked to within one percentile
+RANK_GRID = tuple(range(101))
+
+# Named segments: inclusive (min, max) bounds per metric plus optional interest/age band/social level
+SEGMENTS = {
+    "High risk, high engagement": {"risk": (0.3, None), "engagement": (80, None)},
+    "High risk": {"risk": (0.3, None)},
+    "Disengaged": {"engagement": (None, 29)},
+    "Happy and engaged": {"sentiment": (0.5, None), "engagement": (70, None)},
+    "Social influencers": {"social": "High", "sentiment": (0.3, None)},
+}
+
+# Whole-base aggregates over columnar arrays of the customers: percentiles, segment counts and
+# segment queries. Built once per snapshot; live profile updates patch the touched rows
+class CohortIndex:
+    def __init__(self, sentiment, engagement, age, social, interests, interest_terms):
+        # Own writable copies: the inputs may be read-only memory-mapped columns
+        self.columns = {
+            "sentiment": np.array(sentiment, dtype=np.float64),
+            "engagement": np.array(engagement, dtype=np.float64),
+            "age": np.array(age, dtype=np.float64),
+        }
+        self.columns["risk"] = assess_risk_vector(self.columns["sentiment"], self.columns["engagement"])
+        # Social level code per customer (-1 when unknown)
+        self.social = np.array(social, dtype=np.int8)
+        # Rows of the customers with each interest, ascending (an inverted index over the interests column)
+        self.interest_terms = list(interest_terms)
+        self.interest_ids = {term: i for i, term in enumerate(self.interest_terms)}
+        self.interests = interests
+        self.age_band = np.searchsorted([start for _, start, _ in AGE_BANDS[1:]], self.columns["age"], side="right")
+        self.sorted = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.social)
+
+    # Build from the mapped columns of a CustomerStore without decoding any row
+    @classmethod
+    def from_store(cls, store):
+        codes, levels = store.codes("Social Media Activity")
+        level_code = np.array([SOCIAL_LEVELS.index(level) if level in SOCIAL_LEVELS else -1 for level in levels], dtype=np.int8)
+        social = level_code[np.asarray(codes, dtype=np.int64)] if len(levels) else np.full(len(store), -1, dtype=np.int8)
+        offsets, values, terms = store.list_column("Interests")
+        n = max(1, len(store))
+        rows = np.repeat(np.arange(len(store), dtype=np.int64), np.diff(offsets))
+        # One posting per (interest, customer) pair, ordered by interest then row
+        pairs = np.unique(np.asarray(values, dtype=np.int64) * n + rows)
+        codes, rows = pairs // n, pairs % n
+        bounds = np.searchsorted(codes, np.arange(len(terms) + 1))
+        postings = [rows[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        return cls(store.numeric("Sentiment Score"), store.numeric("Engagement Score"), store.numeric("Age"),
+                   social, postings, terms)
+
+    # Refresh the metrics of rows whose profile changed (e.g. by event ingestion); `customers` is
+    # the CustomerView holding their new values
+    def update(self, rows, customers):
+        rows = np.asarray(rows, dtype=np.int64)
+        records = customers.records(rows)
+        level_code = {level: i for i, level in enumerate(SOCIAL_LEVELS)}
+        with self.lock:
+            self.columns["sentiment"][rows] = [record["Sentiment Score"] for record in records]
+            self.columns["engagement"][rows] = [record["Engagement Score"] for record in records]
+            self.columns["risk"][rows] = assess_risk_vector(self.columns["sentiment"][rows], self.columns["engagement"][rows])
+            self.social[rows] = [level_code.get(record["Social Media Activity"], -1) for record in records]
+            # Percentiles are re-sorted on next use
+            self.sorted = {}
+
+    # Sorted values of a metric, cached until the next update
+    def _sorted(self, metric):
+        with self.lock:
+            if metric not in self.sorted:
+                self.sorted[metric] = np.sort(self.columns[metric])
+            return self.sorted[metric]
+
+    # Percentiles of a metric over the whole base
+    def percentiles(self, metric, qs=PERCENTILES):
+        values = self._sorted(metric)
+        if len(values) == 0:
+            return {q: 0.0 for q in qs}
+        return {q: float(values[min(len(values) - 1, int(q / 100 * len(values)))]) for q in qs}
+
+    # Share of customers (0-100) with a metric value at or below `value`
+    def percentile_rank(self, metric, value):
+        values = self._sorted(metric)
+        return 100.0 * np.searchsorted(values, value, side="right") / len(values) if len(values) else 0.0
+
+    # Customers per interest (most common first), age band and social level
+    def segment_counts(self):
+        by_interest = sorted(((term, len(rows)) for term, rows in zip(self.interest_terms, self.interests)),
+                             key=lambda item: (-item[1], item[0]))
+        by_age = np.bincount(self.age_band, minlength=len(AGE_BANDS))
+        by_social = np.bincount(self.social[self.social >= 0], minlength=len(SOCIAL_LEVELS))
+        return {
+            "interest": dict(by_interest),
+            "age_band": {label: int(n) for (label, _, _), n in zip(AGE_BANDS, by_age)},
+            "social": {level: int(n) for level, n in zip(SOCIAL_LEVELS, by_social)},
+        }
+
+    # Rows matching every given condition: (min, max) bounds on metrics (None = open),
+    # an interest, an age band label and a social level
+    def segment(self, interest=None, age_band=None, social=None, **bounds):
+        mask = np.ones(len(self), dtype=bool)
+        for metric, (low, high) in bounds.items():
+            values = self.columns[metric]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        if age_band is not None:
+            mask &= self.age_band == [label for label, _, _ in AGE_BANDS].index(age_band)
+        if social is not None:
+            mask &= self.social == SOCIAL_LEVELS.index(social)
+        if interest is not None:
+            if interest not in self.interest_ids:
+                return np.empty(0, dtype=np.int64)
+            rows = self.interests[self.interest_ids[interest]]
+            return rows[mask[rows]]
+        return np.flatnonzero(mask)
+
+    # Rows of one of the named SEGMENTS
+    def named_segment(self, name):
+        return self.segment(**SEGMENTS[name])
+
+    # Whole-base summary: percentiles of every metric and the segment counts, plus the RANK_GRID
+    # percentiles that let a CohortSummary rank values
+    def summary(self):
+        return {
+            "customers": len(self),
+            "percentiles": {metric: self.percentiles(metric) for metric in METRICS},
+            "segments": {name: int(len(self.named_segment(name))) for name in SEGMENTS},
+            "counts": self.segment_counts(),
+            "quantiles": {metric: list(self.percentiles(metric, RANK_GRID).values()) for metric in METRICS},
+        }
+
+# Whole-base aggregates from a CohortIndex summary (e.g. fetched from the recommendation server),
+# answering the percentile queries of the insights chart without the per-customer arrays;
+# percentile ranks are read off the RANK_GRID, so they are exact to within one percentile
+class CohortSummary:
+    def __init__(self, summary):
+        self.summary = summary
+
+    def __len__(self):
+        return self.summary["customers"]
+
+    def percentiles(self, metric, qs=PERCENTILES):
+        return {q: float(self.summary["quantiles"][metric][RANK_GRID.index(q)]) for q in qs}
+
+    def percentile_rank(self, metric, value):
+        grid = self.summary["quantiles"][metric]
+        return 100.0 * np.searchsorted(grid, value, side="right") / len(grid) if len(self) else 0.0
+
+    def segment_counts(self):
+        return self.summary["counts"]
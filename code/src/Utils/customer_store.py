@@ -0,0 +1,310 @@
+# Import required libraries
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Default location of the columnar customer store
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "customer_store")
+
+# Bump when the store layout changes so old stores are converted again instead of misread
+STORE_FORMAT = 2
+
+# Column layout of the customer schema; integer columns fall back to float32 when a value does not fit
+NUMERIC_COLUMNS = {"Sentiment Score": np.float64, "Age": np.int16, "Engagement Score": np.int16}
+CATEGORICAL_COLUMNS = ["Social Media Activity", "Gender"]
+LIST_COLUMNS = ["Purchase History", "Interests"]
+STRING_COLUMNS = ["Customer Name"]
+COLUMN_ORDER = ["Customer Name", "Purchase History", "Sentiment Score", "Social Media Activity",
+                "Age", "Gender", "Interests", "Engagement Score"]
+
+# Iterate customer records from a JSON array or a newline-delimited JSON file
+def iter_records(path):
+    with open(path, 'r') as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+# Smallest integer type that can hold codes for a dictionary of the given size
+def _code_dtype(size):
+    return np.int8 if size < 2 ** 7 else np.int16 if size < 2 ** 15 else np.int32
+
+# Numeric column values in the given type. An integer column whose values are not all whole numbers
+# within the type's range (a fractional score, a missing value) is stored as float32 instead, so
+# nothing is truncated and missing values become NaN
+def _numeric_array(values, dtype):
+    array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if not np.issubdtype(dtype, np.integer):
+        return array.astype(dtype)
+    info = np.iinfo(dtype)
+    if len(array) and not (np.all(np.isfinite(array)) and np.all(array == np.round(array))
+                           and array.min() >= info.min and array.max() <= info.max):
+        return array.astype(np.float32)
+    return array.astype(dtype)
+
+# 64-bit hash of a name, used by the name index
+def name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+# Fingerprint of the source file, used to tell whether a store is stale
+def source_signature(path):
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+# Convert customer JSON into dictionary-encoded, offset+values memory-mapped column files
+def convert_json_to_store(json_path, store_dir=DEFAULT_STORE_DIR):
+    numeric = {name: [] for name in NUMERIC_COLUMNS}
+    dictionaries = {name: {} for name in CATEGORICAL_COLUMNS + LIST_COLUMNS}
+    codes = {name: [] for name in CATEGORICAL_COLUMNS}
+    list_values = {name: [] for name in LIST_COLUMNS}
+    list_offsets = {name: [0] for name in LIST_COLUMNS}
+    strings = {name: [] for name in STRING_COLUMNS}
+
+    for record in iter_records(json_path):
+        for name in NUMERIC_COLUMNS:
+            numeric[name].append(record.get(name))
+        for name in CATEGORICAL_COLUMNS:
+            codes[name].append(dictionaries[name].setdefault(record[name], len(dictionaries[name])))
+        for name in LIST_COLUMNS:
+            values = dictionaries[name]
+            list_values[name].extend(values.setdefault(v, len(values)) for v in record[name])
+            list_offsets[name].append(len(list_values[name]))
+        for name in STRING_COLUMNS:
+            strings[name].append(record[name].encode("utf-8"))
+
+    # Write into a temporary directory and swap it in, so readers never see a partial store
+    tmp_dir = store_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, dtype in NUMERIC_COLUMNS.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), _numeric_array(numeric[name], dtype))
+    for name in CATEGORICAL_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), np.asarray(codes[name], dtype=_code_dtype(len(dictionaries[name]))))
+    for name in LIST_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{name}.offsets.npy"), np.asarray(list_offsets[name], dtype=np.int64))
+        np.save(os.path.join(tmp_dir, f"{name}.values.npy"), np.asarray(list_values[name], dtype=np.int32))
+    for name in STRING_COLUMNS:
+        lengths = np.fromiter((len(s) for s in strings[name]), dtype=np.int64, count=len(strings[name]))
+        np.save(os.path.join(tmp_dir, f"{name}.offsets.npy"), np.concatenate([[0], np.cumsum(lengths)]))
+        np.save(os.path.join(tmp_dir, f"{name}.data.npy"), np.frombuffer(b"".join(strings[name]), dtype=np.uint8))
+        # Name hashes in sorted order with their rows, so a name is found without decoding the column
+        hashes = np.fromiter((name_hash(s.decode("utf-8")) for s in strings[name]), dtype=np.uint64, count=len(strings[name]))
+        order = np.lexsort((np.arange(len(hashes)), hashes))
+        np.save(os.path.join(tmp_dir, f"{name}.hashes.npy"), hashes[order])
+        np.save(os.path.join(tmp_dir, f"{name}.hash_rows.npy"), order.astype(np.int64))
+        # Casefolded names, each followed by a newline, for case-insensitive substring search
+        folded = b"".join(s.decode("utf-8").casefold().replace("\n", " ").encode("utf-8") + b"\n" for s in strings[name])
+        np.save(os.path.join(tmp_dir, f"{name}.folded.npy"), np.frombuffer(folded, dtype=np.uint8))
+    manifest = {
+        "format": STORE_FORMAT,
+        "rows": len(strings[STRING_COLUMNS[0]]),
+        "source": source_signature(json_path),
+        "dictionaries": {name: list(values) for name, values in dictionaries.items()},
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return CustomerStore(store_dir)
+
+# Read-only view over a columnar customer store; every column is memory-mapped on demand
+class CustomerStore:
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "manifest.json"), 'r') as f:
+            self.manifest = json.load(f)
+        self.dictionaries = self.manifest["dictionaries"]
+        self._arrays = {}
+        # End of every name in the casefolded search column, found on the first search
+        self._ends = {}
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    # Memory-map one array file of the store
+    def _array(self, filename):
+        if filename not in self._arrays:
+            self._arrays[filename] = np.load(os.path.join(self.store_dir, filename), mmap_mode="r")
+        return self._arrays[filename]
+
+    # Numeric column values
+    def numeric(self, name):
+        return self._array(f"{name}.npy")
+
+    # Dictionary codes and dictionary of a categorical column
+    def codes(self, name):
+        return self._array(f"{name}.codes.npy"), self.dictionaries[name]
+
+    # Offsets, value codes and dictionary of a list column; row i is values[offsets[i]:offsets[i + 1]]
+    def list_column(self, name):
+        return self._array(f"{name}.offsets.npy"), self._array(f"{name}.values.npy"), self.dictionaries[name]
+
+    # Decoded string column (all rows, or only the given rows)
+    def strings(self, name, rows=None):
+        offsets, data = self._array(f"{name}.offsets.npy"), self._array(f"{name}.data.npy")
+        if rows is None:
+            bounds, data = offsets.tolist(), data.tobytes()
+            return [data[start:end].decode("utf-8") for start, end in zip(bounds[:-1], bounds[1:])]
+        return [data[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8") for i in rows]
+
+    # Decoded list column as one Python list per row, sharing the dictionary's string objects
+    def lists(self, name, rows=None):
+        offsets, values, dictionary = self.list_column(name)
+        if rows is None:
+            decoded = [dictionary[v] for v in values.tolist()]
+            bounds = offsets.tolist()
+            return [decoded[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        return [[dictionary[v] for v in values[offsets[i]:offsets[i + 1]].tolist()] for i in rows]
+
+    # Decoded records of the given rows, with the same fields and values as load_sample_data
+    def records(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {}
+        for name in STRING_COLUMNS:
+            columns[name] = self.strings(name, rows)
+        for name in LIST_COLUMNS:
+            columns[name] = self.lists(name, rows)
+        for name in NUMERIC_COLUMNS:
+            columns[name] = self.numeric(name)[rows].tolist()
+        for name in CATEGORICAL_COLUMNS:
+            codes, dictionary = self.codes(name)
+            columns[name] = [dictionary[code] for code in codes[rows].tolist()]
+        return [{name: columns[name][i] for name in COLUMN_ORDER} for i in range(len(rows))]
+
+    # Row of the customer with this name (the last one if the name repeats), or None
+    def find(self, name, column="Customer Name"):
+        hashes, rows = self._array(f"{column}.hashes.npy"), self._array(f"{column}.hash_rows.npy")
+        key = np.uint64(name_hash(name))
+        start, end = np.searchsorted(hashes, key, side="left"), np.searchsorted(hashes, key, side="right")
+        for row in rows[start:end][::-1].tolist():
+            if self.strings(column, [row])[0] == name:
+                return row
+        return None
+
+    # Rows whose name contains `query` case-insensitively, ascending. Matches are found on the
+    # casefolded name bytes, one byte of the query at a time, so no name is decoded
+    def search(self, query, column="Customer Name"):
+        needle = np.frombuffer(query.casefold().encode("utf-8"), dtype=np.uint8)
+        if len(needle) == 0:
+            return np.arange(len(self), dtype=np.int64)
+        folded = self._array(f"{column}.folded.npy")
+        if 10 in needle or len(needle) > len(folded):
+            return np.empty(0, dtype=np.int64)
+        starts = np.flatnonzero(folded[:len(folded) - len(needle) + 1] == needle[0])
+        for i in range(1, len(needle)):
+            starts = starts[folded[starts + i] == needle[i]]
+        if column not in self._ends:
+            self._ends[column] = np.flatnonzero(folded == 10)
+        return np.unique(np.searchsorted(self._ends[column], starts))
+
+    # True if the store was built from the current version of the source file with this layout
+    def is_current(self, json_path):
+        return self.manifest.get("format") == STORE_FORMAT and self.manifest["source"] == source_signature(json_path)
+
+    # Build a DataFrame with the same columns and values as load_sample_data (all rows, or only the
+    # given rows, e.g. a range for one chunk); categorical columns stay dictionary-encoded as pandas
+    # Categoricals over the mapped codes
+    def to_dataframe(self, rows=None):
+        select = slice(None) if rows is None else np.asarray(rows, dtype=np.int64)
+        columns = {}
+        for name in STRING_COLUMNS:
+            columns[name] = self.strings(name, rows)
+        for name in LIST_COLUMNS:
+            columns[name] = self.lists(name, rows)
+        for name in NUMERIC_COLUMNS:
+            columns[name] = self.numeric(name)[select]
+        for name in CATEGORICAL_COLUMNS:
+            codes, dictionary = self.codes(name)
+            columns[name] = pd.Categorical.from_codes(codes[select], categories=dictionary)
+        return pd.DataFrame(columns)[COLUMN_ORDER]
+
+# Name -> row lookups over a store (the `in`, [] and get() of a dict), answered from the store's
+# sorted name hashes instead of a dict holding every name
+class NameIndex:
+    def __init__(self, store, column="Customer Name"):
+        self.store = store
+        self.column = column
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, name):
+        return isinstance(name, str) and self.store.find(name, self.column) is not None
+
+    def __getitem__(self, name):
+        row = self.get(name)
+        if row is None:
+            raise KeyError(name)
+        return row
+
+    def get(self, name, default=None):
+        row = self.store.find(name, self.column) if isinstance(name, str) else None
+        return default if row is None else row
+
+# Positional row access of a CustomerView with the DataFrame.iloc interface: one row gives a
+# Series, a list of rows a DataFrame
+class _RowIndexer:
+    def __init__(self, view):
+        self.view = view
+
+    def __getitem__(self, rows):
+        if np.ndim(rows) == 0:
+            return pd.Series(self.view.record(int(rows)))
+        return pd.DataFrame(self.view.records(np.asarray(rows, dtype=np.int64)), columns=COLUMN_ORDER)
+
+# The customers of a store as requests see them: rows are decoded from the mapped columns only when
+# read, and live profile updates (event ingestion) are per-row overrides on top. A view is never
+# changed in place; with_updates returns a new view over the same store, so readers holding the old
+# one keep a consistent picture
+class CustomerView:
+    def __init__(self, store, overrides=None):
+        self.store = store
+        self.overrides = overrides or {}
+        self.iloc = _RowIndexer(self)
+
+    def __len__(self):
+        return len(self.store)
+
+    # Decoded record of one row with its live fields
+    def record(self, row):
+        return self.records([row])[0]
+
+    # Decoded records of the given rows with their live fields
+    def records(self, rows):
+        records = self.store.records(rows)
+        if self.overrides:
+            for record, row in zip(records, np.asarray(rows, dtype=np.int64).tolist()):
+                record.update(self.overrides.get(row, {}))
+        return records
+
+    # New view with the given fields ({row: {field: value}}) replaced
+    def with_updates(self, updates):
+        overrides = dict(self.overrides)
+        for row, fields in updates.items():
+            overrides[row] = dict(overrides.get(row, {}), **fields)
+        return CustomerView(self.store, overrides)
+
+# Open the store for a JSON dataset, (re)building it when missing or stale
+def load_customer_store(json_path, store_dir=DEFAULT_STORE_DIR):
+    if os.path.exists(os.path.join(store_dir, "manifest.json")):
+        store = CustomerStore(store_dir)
+        if store.is_current(json_path):
+            return store
+    return convert_json_to_store(json_path, store_dir)
+
+if __name__ == "__main__":
+    import argparse
+    from Utils.data_processing import SAMPLE_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Convert customer JSON into the columnar customer store")
+    parser.add_argument("source", nargs="?", default=SAMPLE_DATA_PATH, help="JSON array or NDJSON file")
+    parser.add_argument("--out", default=DEFAULT_STORE_DIR, help="store directory")
+    args = parser.parse_args()
+    store = convert_json_to_store(args.source, args.out)
+    print(f"Wrote {len(store)} customers to {args.out}")
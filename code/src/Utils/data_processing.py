@@ -4,24 +4,36 @@ import json
 import os
 from datetime import datetime
 
+# Numerical encodings of the categorical customer fields
+SOCIAL_ACTIVITY_CODES = {"Low": 0, "Medium": 1, "High": 2}
+GENDER_CODES = {"Male": 0, "Female": 1}
+
 # Preprocess customer data by encoding categorical variables
 def preprocess_data(df):
-    df_encoded = df.copy()
+    # Shallow copy: only the replaced columns get new storage, list cells are shared
+    df_encoded = df.copy(deep=False)
     # Encode social media activity as numerical values
-    df_encoded["Social Media Activity"] = df_encoded["Social Media Activity"].map({"Low": 0, "Medium": 1, "High": 2})
+    df_encoded["Social Media Activity"] = df_encoded["Social Media Activity"].map(SOCIAL_ACTIVITY_CODES)
     # Encode gender as numerical values
-    df_encoded["Gender"] = df_encoded["Gender"].map({"Male": 0, "Female": 1})
+    df_encoded["Gender"] = df_encoded["Gender"].map(GENDER_CODES)
     # Add timestamp of last update
     df_encoded["Last Updated"] = datetime.now()
     return df_encoded
 
+# Encode a single customer record the same way preprocess_data encodes a DataFrame row
+def preprocess_record(customer_data):
+    record = dict(customer_data)
+    record["Social Media Activity"] = SOCIAL_ACTIVITY_CODES.get(record["Social Media Activity"])
+    record["Gender"] = GENDER_CODES.get(record["Gender"])
+    return record
+
+# Default location of the sample customer dataset
+SAMPLE_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dataset", "sample_data.json")
+
 # Load sample customer data from JSON file
-def load_sample_data():
-    # Construct path to sample_data.json file
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    json_path = os.path.join(current_dir, "..", "dataset", "sample_data.json")
-    
+def load_sample_data(json_path=SAMPLE_DATA_PATH):
     # Load and return data as pandas DataFrame
     with open(json_path, 'r') as f:
         customers = json.load(f)
-    return pd.DataFrame(customers)
\ No newline at end of file
+    return pd.DataFrame(customers)
+
@@ -0,0 +1,199 @@
+# Import required libraries
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from Utils.file_lock import file_lock
+from Utils.metrics import inc, CACHE_REQUESTS
+
+# Default location of the on-disk embedding cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "embeddings")
+
+# Vectors a cache holds before the least recently used ones are dropped, and the share of that limit
+# a compaction keeps, so a full cache is not rewritten on every miss
+DEFAULT_MAX_ROWS = 500000
+COMPACT_TO = 0.75
+
+# Rows copied at a time when compacting
+COMPACT_CHUNK = 65536
+
+# Hash a customer's feature string into a stable cache key
+def fingerprint(feature_str):
+    return hashlib.sha1(feature_str.encode("utf-8")).hexdigest()
+
+# Write a JSON file atomically so a crash never leaves a half-written index
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+# Memory-mapped store of embedding vectors keyed by feature fingerprint, holding at most about
+# max_rows vectors: each row records when it was last used, and a cache that outgrows the limit keeps
+# only its most recently used rows. Several processes may share one cache: writers hold a lock file
+# next to the directory and re-read the index before appending, and grown or compacted files replace
+# the old ones, so readers' existing mappings stay valid
+class EmbeddingCache:
+    def __init__(self, model_name, model_version, cache_dir=DEFAULT_CACHE_DIR, max_rows=DEFAULT_MAX_ROWS):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.model_version = model_version
+        self.max_rows = max_rows
+        self.meta_path = os.path.join(cache_dir, "meta.json")
+        # Outside the directory, which clear() removes
+        self.lock_path = os.path.normpath(cache_dir) + ".lock"
+        self.generation = 0
+        self.vectors = None
+        # Last use time of every row
+        self.used = None
+        self.keys = {}
+        self.count = 0
+        with file_lock(self.lock_path):
+            self._open()
+
+    # File holding the index, vectors or use times of a generation (the current one by default). A
+    # compaction writes the next generation and switches to it by rewriting meta.json, so a crash
+    # never pairs an index with another generation's vectors
+    def _path(self, kind, generation=None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.cache_dir, f"{kind}-{generation}." + ("json" if kind == "keys" else "npy"))
+
+    # Load the sidecar index and map the vectors, discarding a cache built by another model or
+    # in an older layout; called with the lock held
+    def _open(self):
+        self.generation = 0
+        self.vectors = None
+        self.used = None
+        self.keys = {}
+        self.count = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+            if (meta.get("model_name") != self.model_name or meta.get("model_version") != self.model_version
+                    or "generation" not in meta):
+                self.clear()
+                return
+            self.generation = meta["generation"]
+            with open(self._path("keys"), 'r') as f:
+                self.keys = json.load(f)
+            self.count = meta["count"]
+            self.vectors = np.load(self._path("vectors"), mmap_mode="r+")
+            self.used = np.load(self._path("used"), mmap_mode="r+")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # Remove every cached vector
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.generation = 0
+        self.vectors = None
+        self.used = None
+        self.keys = {}
+        self.count = 0
+
+    # Replace a file of the current generation with a larger copy of its first `count` rows
+    def _grow(self, kind, array, shape, dtype):
+        tmp_path = self._path(kind) + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+        if self.count:
+            grown[:self.count] = array[:self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._path(kind))
+        return np.load(self._path(kind), mmap_mode="r+")
+
+    # Make room for at least `needed` rows, doubling the files when they are full
+    def _reserve(self, needed, dim, dtype):
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        self.vectors = self._grow("vectors", self.vectors, (new_capacity, dim), dtype)
+        self.used = self._grow("used", self.used, (new_capacity,), np.float64)
+
+    # Persist the index and metadata after the vectors they describe
+    def _commit(self):
+        self.vectors.flush()
+        self.used.flush()
+        _write_json(self._path("keys"), self.keys)
+        _write_json(self.meta_path, {
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "generation": self.generation,
+            "dim": int(self.vectors.shape[1]),
+            "count": self.count,
+        })
+
+    # Keep the COMPACT_TO * max_rows most recently used rows (and every row used at `now`) in a new
+    # generation of files, then commit it and delete the files of older generations
+    def _compact(self, now):
+        used = np.asarray(self.used[:self.count])
+        keep_count = max(int(self.max_rows * COMPACT_TO), int(np.count_nonzero(used >= now)))
+        keep = np.sort(np.argsort(used, kind="stable")[-keep_count:])
+        generation = self.generation + 1
+        capacity = max(self.max_rows, len(keep))
+        vectors = np.lib.format.open_memmap(self._path("vectors", generation), mode="w+", dtype=self.vectors.dtype,
+                                            shape=(capacity, self.vectors.shape[1]))
+        new_used = np.lib.format.open_memmap(self._path("used", generation), mode="w+", dtype=np.float64,
+                                             shape=(capacity,))
+        for start in range(0, len(keep), COMPACT_CHUNK):
+            rows = keep[start:start + COMPACT_CHUNK]
+            vectors[start:start + len(rows)] = self.vectors[rows]
+        new_used[:len(keep)] = used[keep]
+        new_row = np.full(self.count, -1, dtype=np.int64)
+        new_row[keep] = np.arange(len(keep))
+        self.keys = {key: int(new_row[row]) for key, row in self.keys.items() if new_row[row] >= 0}
+        self.generation, self.count, self.vectors, self.used = generation, len(keep), vectors, new_used
+        self._commit()
+        current = {os.path.basename(self._path(kind)) for kind in ("keys", "vectors", "used")}
+        for name in os.listdir(self.cache_dir):
+            if name != "meta.json" and name not in current:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    # Still mapped by another process on a platform that cannot delete it; the next
+                    # compaction retries
+                    pass
+
+    # Return embeddings for the feature strings, encoding only the ones not cached yet
+    def get_or_encode(self, features, encode):
+        if not features:
+            return np.asarray(encode([]))
+        now = time.time()
+        keys = [fingerprint(f) for f in features]
+        missing = {}
+        for key, feature_str in zip(keys, features):
+            if key not in self.keys and key not in missing:
+                missing[key] = feature_str
+        inc(CACHE_REQUESTS, len(keys) - len(missing), cache="embedding", result="hit")
+        inc(CACHE_REQUESTS, len(missing), cache="embedding", result="miss")
+        if missing:
+            # Encode outside the lock; another process may meanwhile add some of the same strings
+            encoded = dict(zip(missing, np.asarray(encode(list(missing.values())))))
+            with file_lock(self.lock_path):
+                self._open()
+                absent = {key: feature_str for key, feature_str in zip(keys, features) if key not in self.keys}
+                # Strings this process had cached but another process cleared meanwhile
+                extra = [key for key in absent if key not in encoded]
+                if extra:
+                    encoded.update(zip(extra, np.asarray(encode([absent[key] for key in extra]))))
+                if absent:
+                    new_vectors = np.stack([encoded[key] for key in absent])
+                    self._reserve(self.count + len(absent), new_vectors.shape[1], new_vectors.dtype)
+                    self.vectors[self.count:self.count + len(absent)] = new_vectors
+                    for offset, key in enumerate(absent):
+                        self.keys[key] = self.count + offset
+                    self.count += len(absent)
+                    # Every string of this call counts as used, so a compaction keeps them
+                    self.used[[self.keys[key] for key in keys]] = now
+                    if self.count > self.max_rows:
+                        self._compact(now)
+                    else:
+                        self._commit()
+        rows = np.fromiter((self.keys[key] for key in keys), dtype=np.int64, count=len(keys))
+        # Hits record their use in the mapped file without the lock: concurrent writers only ever
+        # store a recent time, and a file replaced meanwhile just loses the update
+        self.used[rows] = now
+        return np.asarray(self.vectors[rows])
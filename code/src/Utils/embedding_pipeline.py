@@ -0,0 +1,146 @@
+# Import required libraries
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from Utils.customer_store import CustomerStore, DEFAULT_STORE_DIR, load_customer_store, source_signature
+from Utils.data_processing import preprocess_data, SAMPLE_DATA_PATH
+from Utils.embeddings import (NUMERIC_WEIGHT, combine_features, get_feature_strings, get_numeric_block,
+                              get_numeric_features, load_model, model_identity)
+from Utils.metrics import timed
+
+# Per-process state shared by every chunk a worker encodes
+_worker_state = {}
+
+# Write a JSON file atomically so a killed job never leaves a half-written progress file
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+# Progress sidecar of an output file: settings of the run and the chunks already written
+def progress_path(out_path):
+    return out_path + ".progress.json"
+
+# Identity of the model a factory builds, named like model_identity names the model itself, so a run
+# never resumes into vectors of another model and a snapshot build can tell whether it may reuse them
+def factory_identity(model_factory):
+    if model_factory is load_model:
+        return model_identity()
+    name = getattr(model_factory, "__qualname__", type(model_factory).__qualname__)
+    return {"model_name": f"{model_factory.__module__}.{name}", "model_version": ""}
+
+# Vectors of a finished run over this dataset with the model `identity` names, memory-mapped; None when
+# the output is missing, unfinished or was written for other data, another model or another weighting
+def finished_embeddings(out_path, json_path, identity, numeric_weight=NUMERIC_WEIGHT):
+    if not os.path.exists(progress_path(out_path)) or not os.path.exists(out_path):
+        return None
+    with open(progress_path(out_path), 'r') as f:
+        progress = json.load(f)
+    settings = progress["settings"]
+    if (settings["source"] != source_signature(json_path) or settings["model"] != identity
+            or settings["numeric_weight"] != numeric_weight
+            or len(progress["done"]) < -(-settings["rows"] // settings["chunk_size"])):
+        return None
+    return np.load(out_path, mmap_mode="r")
+
+# Pool initializer: open the customer store and load the model once per worker; `threads` caps
+# the intra-op threads of each worker so the pool does not oversubscribe the CPUs
+def _init_worker(store_dir, model_factory, batch_size, numeric_weight, threads):
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    _worker_state.update(store=CustomerStore(store_dir), model=model_factory(), batch_size=batch_size,
+                         numeric_weight=numeric_weight, out=None)
+
+# Output dimension of the model, probed in a worker so the parent never loads it
+def _probe_dim():
+    text_dim = np.asarray(_worker_state["model"].encode(["Purchases: \nInterests: "], batch_size=1)).shape[1]
+    return text_dim + get_numeric_features(0, 0, 0, 0, 0).shape[-1]
+
+# Encode customers [start, stop) and write their vectors into the shared output file
+@timed("encode_chunk")
+def _encode_chunk(out_path, start, stop):
+    if _worker_state["out"] is None:
+        _worker_state["out"] = np.load(out_path, mmap_mode="r+")
+    df = preprocess_data(_worker_state["store"].to_dataframe(range(start, stop)))
+    text_vectors = _worker_state["model"].encode(get_feature_strings(df), batch_size=_worker_state["batch_size"])
+    out = _worker_state["out"]
+    out[start:stop] = combine_features(text_vectors, get_numeric_block(df), _worker_state["numeric_weight"])
+    out.flush()
+    return start, stop
+
+# Embed every customer of a dataset into a preallocated .npy file, chunk by chunk across a pool of
+# worker processes. Each finished chunk is recorded in a progress sidecar, so running the same job
+# again after it was killed only encodes the chunks that were not written yet
+def encode_dataset(json_path=SAMPLE_DATA_PATH, out_path="embeddings.npy", store_dir=DEFAULT_STORE_DIR,
+                   model_factory=load_model, chunk_size=10000, batch_size=64, workers=None, threads=None,
+                   numeric_weight=NUMERIC_WEIGHT, log=sys.stderr):
+    rows = len(load_customer_store(json_path, store_dir))
+    settings = {"rows": rows, "chunk_size": chunk_size, "numeric_weight": numeric_weight,
+                "source": source_signature(json_path), "model": factory_identity(model_factory)}
+    chunks = [(start, min(start + chunk_size, rows)) for start in range(0, rows, chunk_size)]
+    workers = workers or os.cpu_count()
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(store_dir, model_factory, batch_size, numeric_weight, threads)) as executor:
+        # Resume only a run over the same data with the same model and chunking; anything else starts over
+        progress = None
+        if os.path.exists(progress_path(out_path)) and os.path.exists(out_path):
+            with open(progress_path(out_path), 'r') as f:
+                progress = json.load(f)
+            if progress["settings"] != settings:
+                progress = None
+        if progress is None:
+            dim = executor.submit(_probe_dim).result()
+            np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=(rows, dim)).flush()
+            progress = {"settings": settings, "dim": dim, "done": []}
+            _write_json(progress_path(out_path), progress)
+        done = set(progress["done"])
+        pending = [chunk for i, chunk in enumerate(chunks) if i not in done]
+        if done:
+            print(f"Resuming: {len(done)}/{len(chunks)} chunks already written", file=log)
+
+        encoded = 0
+        chunk_ids = {chunk: i for i, chunk in enumerate(chunks)}
+        futures = [executor.submit(_encode_chunk, out_path, start, stop) for start, stop in pending]
+        for future in as_completed(futures):
+            start, stop = future.result()
+            done.add(chunk_ids[(start, stop)])
+            progress["done"] = sorted(done)
+            _write_json(progress_path(out_path), progress)
+            encoded += stop - start
+            elapsed = time.perf_counter() - start_time
+            remaining = sum(b - a for i, (a, b) in enumerate(chunks) if i not in done)
+            rate = encoded / elapsed
+            print(f"{rows - remaining}/{rows} customers, {rate:.1f} customers/sec, "
+                  f"~{remaining / rate:.0f}s left", file=log)
+    elapsed = time.perf_counter() - start_time
+    return {"customers": encoded, "seconds": elapsed, "customers_per_sec": encoded / elapsed if elapsed else 0.0,
+            "dim": progress["dim"]}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embed a customer dataset across worker processes into a .npy file")
+    parser.add_argument("--data", default=SAMPLE_DATA_PATH, help="customer JSON or NDJSON dataset")
+    parser.add_argument("--out", default="embeddings.npy",
+                        help="output .npy (resumed if a previous run was killed); snapshot builds reuse "
+                             "<snapshot dir>/embeddings.npy")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR, help="columnar customer store the workers read")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="customers per chunk (unit of resume)")
+    parser.add_argument("--batch-size", type=int, default=64, help="model.encode batch size")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per worker")
+    args = parser.parse_args()
+
+    stats = encode_dataset(args.data, args.out, args.store_dir, chunk_size=args.chunk_size, batch_size=args.batch_size,
+                           workers=args.workers, threads=args.threads)
+    print(f"Encoded {stats['customers']} customers ({stats['dim']} dims) in {stats['seconds']:.2f}s "
+          f"({stats['customers_per_sec']:.1f} customers/sec) into {args.out}", file=sys.stderr)
@@ -1,22 +1,102 @@
 # Import required libraries
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+# sentence_transformers and sklearn are imported inside the functions that need them so
+# the app can start from a snapshot without loading either library
+from importlib.metadata import version
+import os
+import numpy as np
+from Utils.neighbors import build_index, normalize_rows
+from Utils.embedding_cache import EmbeddingCache, DEFAULT_CACHE_DIR
+from Utils.metrics import timed
+
+# Name of the pre-trained transformer model used for customer embeddings
+MODEL_NAME = 'all-MiniLM-L6-v2'
 
 # Load pre-trained transformer model with caching
+@timed("load_model")
 def load_model():
-    return SentenceTransformer('all-MiniLM-L6-v2')
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+# Installed sentence-transformers version, read without importing the library
+def model_version():
+    return version("sentence-transformers")
+
+# Identity of the encoder behind a set of vectors, recorded with snapshots and embedding caches so
+# vectors of different models are never mixed; None stands for the default transformer model
+def model_identity(model=None):
+    if model is None or type(model).__name__ == "SentenceTransformer":
+        return {"model_name": MODEL_NAME, "model_version": model_version()}
+    return {"model_name": f"{type(model).__module__}.{type(model).__qualname__}", "model_version": ""}
+
+# Open the on-disk embedding cache of a model (the default transformer model when None); every
+# model gets its own directory so switching models never discards another model's vectors.
+# EMBEDDING_CACHE_DIR overrides the default location
+def load_embedding_cache(model=None, cache_dir=None):
+    identity = model_identity(model)
+    cache_dir = cache_dir or os.environ.get("EMBEDDING_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return EmbeddingCache(identity["model_name"], identity["model_version"], os.path.join(cache_dir, identity["model_name"]))
+
+# Weight of the structured feature block relative to the unit-length text embedding
+NUMERIC_WEIGHT = 0.5
+
+# Create the feature string for one preprocessed customer (DataFrame row or record dict); only the
+# free-text fields go to the transformer, the numeric and categorical ones become get_numeric_features
+def get_feature_string(row):
+    return f"Purchases: {', '.join(row['Purchase History'])}\nInterests: {', '.join(row['Interests'])}"
 
-# Generate embeddings from customer data using the model
-def get_embeddings(df, model):
-    features = []
-    # Create feature strings for each customer
-    for _, row in df.iterrows():
-        feature_str = f"Purchases: {', '.join(row['Purchase History'])}\nInterests: {', '.join(row['Interests'])}\nSentiment: {row['Sentiment Score']}\nEngagement: {row['Engagement Score']}\nAge: {row['Age']}\nGender: {row['Gender']}\nSocial: {row['Social Media Activity']}"
-        features.append(feature_str)
-    return model.encode(features)
+# Create feature strings for each customer, column-wise instead of row by row
+def get_feature_strings(df):
+    return ("Purchases: " + df["Purchase History"].str.join(", ") + "\nInterests: " + df["Interests"].str.join(", ")).tolist()
+
+# Scale the structured fields of preprocessed customers to [-1, 1]; missing values map to 0
+def get_numeric_features(sentiment, engagement, age, social, gender):
+    columns = [
+        np.clip(np.asarray(sentiment, dtype=np.float32), -1, 1),
+        np.asarray(engagement, dtype=np.float32) / 50 - 1,
+        np.clip((np.asarray(age, dtype=np.float32) - 18) / 31 - 1, -1, 1),
+        np.asarray(social, dtype=np.float32) - 1,
+        np.asarray(gender, dtype=np.float32) * 2 - 1,
+    ]
+    # Divided by sqrt(5) so the block's norm is at most 1
+    return np.nan_to_num(np.stack(columns, axis=-1) / np.sqrt(len(columns)))
+
+# Numeric feature block of every row of a preprocessed DataFrame
+def get_numeric_block(df):
+    return get_numeric_features(df["Sentiment Score"], df["Engagement Score"], df["Age"],
+                                df["Social Media Activity"], df["Gender"])
+
+# Concatenate unit-length text embeddings with the weighted numeric block
+def combine_features(text_vectors, numeric_block, numeric_weight=NUMERIC_WEIGHT):
+    return np.hstack([normalize_rows(text_vectors), numeric_weight * np.asarray(numeric_block, dtype=np.float32).reshape(len(text_vectors), -1)])
+
+# Generate embeddings from customer data using the model, reusing cached vectors when given a cache:
+# the purchases/interests text embedding followed by the numeric feature block
+@timed("get_embeddings")
+def get_embeddings(df, model, cache=None, numeric_weight=NUMERIC_WEIGHT):
+    features = get_feature_strings(df)
+    if cache is None:
+        text_vectors = model.encode(features)
+    else:
+        text_vectors = cache.get_or_encode(features, model.encode)
+    return combine_features(text_vectors, get_numeric_block(df), numeric_weight)
+
+# Embed one preprocessed customer record the same way get_embeddings embeds a DataFrame row;
+# `encode` maps one feature string to one vector (e.g. MicroBatchEncoder.encode)
+def get_customer_vector(record, encode, numeric_weight=NUMERIC_WEIGHT):
+    numeric = get_numeric_features(record["Sentiment Score"], record["Engagement Score"], record["Age"],
+                                   np.nan if record["Social Media Activity"] is None else record["Social Media Activity"],
+                                   np.nan if record["Gender"] is None else record["Gender"])
+    return combine_features(np.asarray(encode(get_feature_string(record)))[None, :], numeric[None, :], numeric_weight)[0]
 
 # Calculate cosine similarity matrix and normalize it
+@timed("get_similarity_matrix")
 def get_similarity_matrix(embeddings):
+    from sklearn.metrics.pairwise import cosine_similarity
     sim_matrix = cosine_similarity(embeddings)
     sim_matrix = (sim_matrix - sim_matrix.min()) / (sim_matrix.max() - sim_matrix.min())
-    return sim_matrix
\ No newline at end of file
+    return sim_matrix
+
+# Build a top-K neighbour index over the embeddings (exact by default, "ivf" for approximate)
+@timed("get_neighbor_index")
+def get_neighbor_index(embeddings, backend="exact", **kwargs):
+    return build_index(embeddings, backend, **kwargs)
@@ -0,0 +1,366 @@
+# Import required libraries
+import heapq
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from Utils import metrics
+from Utils.data_processing import SAMPLE_DATA_PATH, SOCIAL_ACTIVITY_CODES
+from Utils.rec_table import reverse_neighbors
+from Utils.server import StaticLease
+
+# Length of the sliding window the live profile fields are aggregated over (seconds)
+WINDOW_SECONDS = 7 * 24 * 3600
+
+# Interactions per window that lift engagement by the full scale (100 points)
+ENGAGEMENT_SATURATION = 50
+
+# Social interactions per window needed for Medium and High social media activity
+SOCIAL_THRESHOLDS = ((20, "High"), (5, "Medium"), (0, "Low"))
+
+# Customers decoded per write of a checkpoint
+CHECKPOINT_CHUNK = 10000
+
+# Event types understood by the ingestor
+EVENT_TYPES = {"purchase", "interaction", "sentiment"}
+
+# Events received, by type and outcome, and how long events waited before being applied
+EVENTS = metrics.REGISTRY.counter("aidhp_events_total", "Customer events ingested by type and result")
+INGEST_LAG = metrics.REGISTRY.histogram("aidhp_ingest_lag_seconds", "Seconds from receiving an event to applying it")
+
+# Sliding-window aggregates of one customer's events on top of the customer's stored profile:
+# recent interactions lift the stored engagement score and social activity, and both fall back
+# to the stored values as the events leave the window
+class ProfileWindow:
+    def __init__(self, engagement=0, social="Low"):
+        self.base_engagement = engagement.item() if hasattr(engagement, "item") else engagement
+        self.base_social = social
+        self.sentiment = deque()
+        self.interactions = deque()
+        self.social = deque()
+        self.has_interactions = False
+        self.has_social = False
+
+    # Drop events that are older than the window
+    def evict(self, horizon):
+        for events in (self.sentiment, self.interactions, self.social):
+            while events and events[0][0] < horizon:
+                events.popleft()
+
+    def add(self, event):
+        ts = event["ts"]
+        if event["type"] == "sentiment":
+            self.sentiment.append((ts, min(max(float(event["value"]), -1.0), 1.0)))
+        else:
+            # Purchases count as interactions too
+            self.has_interactions = True
+            self.interactions.append((ts, 1))
+            if event.get("channel") == "social":
+                self.has_social = True
+                self.social.append((ts, 1))
+
+    # Profile fields derived from the window. Sentiment keeps its last value once all signals have
+    # left the window; engagement and social activity only change once the customer had
+    # interactions (social ones for the activity level), and never drop below the stored values
+    def fields(self):
+        fields = {}
+        if self.sentiment:
+            fields["Sentiment Score"] = round(sum(v for _, v in self.sentiment) / len(self.sentiment), 2)
+        if self.has_interactions:
+            lift = round(100 * len(self.interactions) / ENGAGEMENT_SATURATION)
+            fields["Engagement Score"] = max(self.base_engagement, min(100, self.base_engagement + lift))
+        if self.has_social:
+            level = next(level for threshold, level in SOCIAL_THRESHOLDS if len(self.social) >= threshold)
+            fields["Social Media Activity"] = max(level, self.base_social, key=lambda l: SOCIAL_ACTIVITY_CODES.get(l, -1))
+        return fields
+
+# Rows that have any of the given rows among their neighbours; the reverse index is built once per snapshot
+def _reverse_neighbors(snapshot, rows):
+    if "reverse_neighbors" not in snapshot:
+        snapshot["reverse_neighbors"] = reverse_neighbors(snapshot["neighbors"])
+    offsets, users = snapshot["reverse_neighbors"]
+    return np.concatenate([users[offsets[row]:offsets[row + 1]] for row in rows] + [np.empty(0, dtype=np.int64)])
+
+# Applies streams of customer events (purchases, interactions, sentiment signals) to the live
+# snapshot in micro-batches: the profile fields are kept as sliding-window aggregates, updated
+# customers get fresh rows in the customer view and item co-occurrence, and only the precomputed
+# recommendation rows that depend on them are invalidated. `services` is anything with lease()
+# (a SnapshotReloader, or StaticLease over one snapshot). Updates publish a new customer view, so
+# request threads that already hold one keep a consistent picture. With a SnapshotReloader the
+# ingested profiles are applied to every reloaded snapshot before it is swapped in
+class EventIngestor:
+    def __init__(self, services, window=WINDOW_SECONDS, max_batch_size=1000, max_wait=0.5):
+        self.services = services if hasattr(services, "lease") else StaticLease(services)
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.windows = {}
+        # Fields set by ingestion per customer, re-applied to every newly loaded snapshot
+        self.profiles = {}
+        # (time an event leaves the window, customer), so expiring customers are recomputed
+        self.expiry = []
+        self.watermark = float("-inf")
+        # Version of the snapshot that holds every ingested profile
+        self.applied_version = None
+        self.batches = 0
+        self.lock = threading.Lock()
+        if hasattr(self.services, "add_swap_hook"):
+            self.services.add_swap_hook(self.prepare)
+        self.events = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    # Queue one event; it is applied with the next micro-batch
+    def submit(self, event):
+        self.events.put((time.monotonic(), event))
+
+    # Wait for the first event, then gather more until the batch is full or max_wait has passed
+    def _next_batch(self):
+        item = self.events.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.events.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.events.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.apply([event for _, event in batch])
+            except Exception as e:
+                print(f"Event batch failed: {e}")
+            now = time.monotonic()
+            for received, _ in batch:
+                metrics.observe(INGEST_LAG, now - received)
+
+    # Apply every ingested profile to a newly loaded snapshot before it goes live (a SnapshotReloader
+    # swap hook). Batches wait until the swap is done, so none lands on the outgoing snapshot only
+    @contextmanager
+    def prepare(self, snapshot):
+        with self.lock:
+            self._write(snapshot, self._reapply(snapshot))
+            self.applied_version = snapshot["version"]
+            yield
+
+    # Merge the ingested purchases into a snapshot's histories and item index, and return the
+    # customers whose stored profile differs from their ingested one
+    def _reapply(self, snapshot):
+        row_of, customers = snapshot["row_of"], snapshot["customers"]
+        names = []
+        for name, profile in self.profiles.items():
+            row = row_of.get(name)
+            if row is None:
+                continue
+            stored = customers.record(row)
+            if "Purchase History" in profile:
+                history = list(stored["Purchase History"])
+                for product in profile["Purchase History"]:
+                    if product not in history:
+                        snapshot["item_index"].add_purchase(history, product)
+                        history.append(product)
+                profile["Purchase History"] = history
+            if any(stored[field] != value for field, value in profile.items()):
+                names.append(name)
+        return names
+
+    # Apply one micro-batch of events to the snapshot that is live right now
+    @metrics.timed("ingest_batch")
+    def apply(self, events):
+        with self.lock, self.services.lease() as leased:
+            snapshot = getattr(leased, "snapshot", leased)
+            row_of = snapshot["row_of"]
+            touched = set()
+            if snapshot["version"] != self.applied_version:
+                # A snapshot that was not prepared by the swap hook gets every profile now
+                touched = set(self._reapply(snapshot))
+                self.applied_version = snapshot["version"]
+
+            for event in events:
+                name = event.get("customer")
+                kind = event.get("type")
+                if kind not in EVENT_TYPES:
+                    metrics.inc(EVENTS, type=str(kind), result="invalid")
+                    continue
+                if name not in row_of:
+                    metrics.inc(EVENTS, type=kind, result="unknown_customer")
+                    continue
+                try:
+                    event = dict(event, ts=float(event.get("ts", time.time())))
+                    if kind == "purchase" and not isinstance(event["product"], str):
+                        raise TypeError("product must be a string")
+                    if kind == "sentiment":
+                        float(event["value"])
+                except (KeyError, TypeError, ValueError):
+                    metrics.inc(EVENTS, type=kind, result="invalid")
+                    continue
+                stored = None
+                if kind == "purchase":
+                    profile = self.profiles.setdefault(name, {})
+                    if "Purchase History" not in profile:
+                        stored = snapshot["customers"].record(row_of[name])
+                    history = profile["Purchase History"] if stored is None else list(stored["Purchase History"])
+                    if event["product"] not in history:
+                        snapshot["item_index"].add_purchase(history, event["product"])
+                        profile["Purchase History"] = history + [event["product"]]
+                if name not in self.windows:
+                    stored = stored or snapshot["customers"].record(row_of[name])
+                    self.windows[name] = ProfileWindow(stored["Engagement Score"], stored["Social Media Activity"])
+                self.windows[name].add(event)
+                heapq.heappush(self.expiry, (event["ts"] + self.window, name))
+                self.watermark = max(self.watermark, event["ts"])
+                touched.add(name)
+                metrics.inc(EVENTS, type=kind, result="applied")
+
+            # Windows slide with event time: customers whose oldest events just left are recomputed
+            while self.expiry and self.expiry[0][0] < self.watermark:
+                touched.add(heapq.heappop(self.expiry)[1])
+            for name in touched:
+                window = self.windows.get(name)
+                if window is not None:
+                    window.evict(self.watermark - self.window)
+                    self.profiles.setdefault(name, {}).update(window.fields())
+            self._write(snapshot, [name for name in touched if name in row_of and name in self.profiles])
+            self.batches += 1
+
+    # Publish a customer view with the ingested fields of the given customers
+    def _write(self, snapshot, names):
+        if not names:
+            return
+        updates = {snapshot["row_of"][name]: dict(self.profiles[name]) for name in names}
+        customers = snapshot["customers"].with_updates(updates)
+        snapshot["customers"] = customers
+        rows = np.array(list(updates), dtype=np.int64)
+        snapshot["revisions"][rows] += 1
+        snapshot["cohorts"].update(rows, customers)
+        # Precomputed recommendations of these customers no longer match their profile, and
+        # neither do those of customers that have them as a neighbour once their purchases changed
+        dependents = rows
+        bought = [row for row, fields in updates.items() if "Purchase History" in fields]
+        if bought:
+            dependents = np.union1d(rows, _reverse_neighbors(snapshot, bought))
+        for table in snapshot["tables"].values():
+            table.invalidate(rows if table.strategy == "contextual" else dependents)
+
+    # Persist the live profiles as a JSON dataset (written atomically). A SnapshotReloader watching
+    # that file then rebuilds only the customers whose profile changed. The bundled sample dataset
+    # is never overwritten
+    def checkpoint(self, json_path):
+        if os.path.abspath(json_path) == os.path.abspath(SAMPLE_DATA_PATH):
+            raise ValueError("Refusing to checkpoint over the bundled sample dataset; pass a separate file")
+        with self.lock, self.services.lease() as leased:
+            customers = getattr(leased, "snapshot", leased)["customers"]
+        # Decoded and written a chunk of rows at a time, so the whole base is never held as objects
+        tmp_path = json_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("[")
+            for start in range(0, len(customers), CHECKPOINT_CHUNK):
+                records = customers.records(np.arange(start, min(start + CHECKPOINT_CHUNK, len(customers))))
+                f.write(("," if start else "") + ",".join(json.dumps(record) for record in records))
+            f.write("]")
+        os.replace(tmp_path, json_path)
+
+    # Checkpoint to `json_path` every `interval` seconds while new events keep arriving
+    def start_checkpoints(self, json_path, interval=60.0):
+        def run():
+            written = 0
+            while True:
+                time.sleep(interval)
+                if self.batches != written:
+                    written = self.batches
+                    try:
+                        self.checkpoint(json_path)
+                    except Exception as e:
+                        print(f"Profile checkpoint failed: {e}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    # Read events from an NDJSON file in a background thread; with `follow` the file is tailed
+    # for appended events like `tail -f`
+    def consume_file(self, path, follow=True, poll=0.5):
+        def run():
+            with open(path, 'r') as f:
+                pending = ""
+                while True:
+                    line = f.readline()
+                    if not line:
+                        if not follow:
+                            return
+                        time.sleep(poll)
+                        continue
+                    pending += line
+                    # A line without its newline yet is still being written
+                    if not pending.endswith("\n"):
+                        continue
+                    if pending.strip():
+                        self._submit_line(pending)
+                    pending = ""
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    # Accept NDJSON events over TCP (one event per line, any number of connections); port 0 picks a free port
+    def listen(self, host="127.0.0.1", port=0):
+        ingestor = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        ingestor._submit_line(line)
+
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, server.server_address
+
+    def _submit_line(self, line):
+        try:
+            self.submit(json.loads(line))
+        except ValueError:
+            metrics.inc(EVENTS, type="unparsed", result="invalid")
+
+    # Stop the worker after the queued events have been applied
+    def close(self):
+        self.events.put(None)
+        self.worker.join()
+
+# Send the events of an NDJSON file to a listening ingestor
+def send_events(path, address):
+    import socket
+
+    with socket.create_connection(address) as conn, open(path, 'rb') as f:
+        for line in f:
+            conn.sendall(line if line.endswith(b"\n") else line + b"\n")
+
+if __name__ == "__main__":
+    import argparse
+    from Utils.sharding import parse_address
+
+    parser = argparse.ArgumentParser(description="Send NDJSON customer events to a running ingestor")
+    parser.add_argument("events", help="NDJSON file of events")
+    parser.add_argument("--to", default="127.0.0.1:7100", help="host:port the ingestor listens on")
+    args = parser.parse_args()
+    send_events(args.events, parse_address(args.to))
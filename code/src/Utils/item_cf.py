@@ -0,0 +1,163 @@
+# Import required libraries
+import json
+import os
+import threading
+import numpy as np
+
+# Item-to-item purchase co-occurrence as a product x product CSR matrix, with buffered incremental updates
+class ItemCooccurrence:
+    # Pending updates are merged into the CSR arrays once this many (row, col) cells have changed
+    compact_threshold = 10000
+
+    def __init__(self, products=(), buyers=None, indptr=None, indices=None, data=None):
+        self.products = list(products)
+        self.product_ids = {p: i for i, p in enumerate(self.products)}
+        n = len(self.products)
+        # Number of customers who bought each product
+        self.buyers = np.zeros(n, dtype=np.int64) if buyers is None else buyers
+        # (indptr, indices, data) swapped as one tuple so readers never see a half-compacted matrix
+        self.csr = (np.zeros(n + 1, dtype=np.int64) if indptr is None else indptr,
+                    np.empty(0, dtype=np.int32) if indices is None else indices,
+                    np.empty(0, dtype=np.int32) if data is None else data)
+        self.pending = {}
+        self.pending_buyers = {}
+        self.pending_cells = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products)
+
+    # ID of a product, assigning a new one on first sight
+    def _id(self, product):
+        if product not in self.product_ids:
+            self.product_ids[product] = len(self.products)
+            self.products.append(product)
+        return self.product_ids[product]
+
+    # Build the matrix from every customer's purchase history
+    @classmethod
+    def from_histories(cls, histories):
+        index = cls()
+        rows = [[index._id(p) for p in history] for history in histories]
+        n = len(index.products)
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        items = np.fromiter((i for r in rows for i in r), dtype=np.int64, count=int(lengths.sum()))
+        customers = np.repeat(np.arange(len(rows)), lengths)
+
+        # Each customer's distinct products, then every ordered pair of them
+        pairs = np.unique(customers * n + items)
+        customers, items = pairs // n, pairs % n
+        lengths = np.bincount(customers, minlength=len(rows))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        repeat = lengths[customers]
+        left = np.repeat(items, repeat)
+        position = np.arange(len(left)) - np.repeat(np.cumsum(repeat) - repeat, repeat)
+        right = items[np.repeat(starts[customers], repeat) + position]
+        keep = left != right
+        index.buyers = np.bincount(items, minlength=n).astype(np.int64)
+        index.csr = _csr_from_cells(left[keep] * n + right[keep], None, n)
+        return index
+
+    # Record that a customer with `history` bought `product`
+    def add_purchase(self, history, product):
+        if product in history:
+            return
+        with self.lock:
+            j = self._id(product)
+            self.pending_buyers[j] = self.pending_buyers.get(j, 0) + 1
+            for i in {self._id(p) for p in history}:
+                for row, col in ((i, j), (j, i)):
+                    cells = self.pending.setdefault(row, {})
+                    self.pending_cells += col not in cells
+                    cells[col] = cells.get(col, 0) + 1
+            if self.pending_cells >= self.compact_threshold:
+                self._compact()
+
+    # Merge the pending updates into the CSR arrays
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        if not self.pending and not self.pending_buyers:
+            return
+        n = len(self.products)
+        indptr, indices, data = self.csr
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        extra = [(row * n + col, count) for row, cells in self.pending.items() for col, count in cells.items()]
+        keys = np.concatenate((rows * n + indices, np.array([k for k, _ in extra], dtype=np.int64)))
+        weights = np.concatenate((data, np.array([c for _, c in extra], dtype=np.int32)))
+        buyers = np.zeros(n, dtype=np.int64)
+        buyers[:len(self.buyers)] = self.buyers
+        for j, count in self.pending_buyers.items():
+            buyers[j] += count
+        self.csr = _csr_from_cells(keys, weights, n)
+        self.buyers = buyers
+        self.pending = {}
+        self.pending_buyers = {}
+        self.pending_cells = 0
+
+    # Co-occurring product IDs and counts of one product, including pending updates
+    def row(self, i):
+        indptr, indices, data = self.csr
+        if i + 1 < len(indptr):
+            cols, counts = indices[indptr[i]:indptr[i + 1]], data[indptr[i]:indptr[i + 1]]
+        else:
+            cols, counts = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        cells = self.pending.get(i)
+        if cells:
+            cols = np.concatenate((cols, np.fromiter(cells, dtype=np.int32, count=len(cells))))
+            counts = np.concatenate((counts, np.fromiter(cells.values(), dtype=np.int32, count=len(cells))))
+        return cols, counts
+
+    # Cosine-normalised co-occurrence of every product with a purchase history (summed over the
+    # history), indexed like self.products; the history's own products score 0
+    def scores(self, history):
+        owned = [self.product_ids[p] for p in set(history) if p in self.product_ids]
+        scores = np.zeros(len(self.products))
+        if not owned:
+            return scores
+        with self.lock:
+            buyers = np.zeros(len(self.products))
+            buyers[:len(self.buyers)] = self.buyers
+            for j, count in self.pending_buyers.items():
+                buyers[j] += count
+            # Products only ever seen in someone's history count as bought once
+            buyers = np.maximum(buyers, 1)
+            for i in owned:
+                cols, counts = self.row(i)
+                np.add.at(scores, cols, counts / np.sqrt(buyers[i] * buyers[cols]))
+        scores[owned] = 0.0
+        return scores
+
+    # Products most co-purchased with a purchase history, best first, excluding the history itself
+    def candidates(self, history, n=20):
+        scores = self.scores(history)
+        found = np.flatnonzero(scores > 0)
+        order = np.lexsort((found, -scores[found]))[:n]
+        return [self.products[j] for j in found[order]]
+
+    def save(self, directory):
+        self.compact()
+        os.makedirs(directory, exist_ok=True)
+        for name, array in zip(["indptr", "indices", "data"], self.csr):
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        np.save(os.path.join(directory, "buyers.npy"), self.buyers)
+        with open(os.path.join(directory, "products.json"), 'w') as f:
+            json.dump(self.products, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        with open(os.path.join(directory, "products.json"), 'r') as f:
+            products = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ["indptr", "indices", "data", "buyers"]}
+        return cls(products, arrays["buyers"], arrays["indptr"], arrays["indices"], arrays["data"])
+
+# CSR arrays of an n x n matrix from flat row * n + col keys, summing duplicate cells
+def _csr_from_cells(keys, weights, n):
+    cells, inverse = np.unique(keys, return_inverse=True)
+    data = np.bincount(inverse, weights=weights, minlength=len(cells)).astype(np.int32)
+    rows = cells // n
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n)))).astype(np.int64)
+    return indptr, (cells % n).astype(np.int32), data
@@ -0,0 +1,223 @@
+# Import required libraries
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation is off unless METRICS_ENABLED is set (or enable() is called); while off,
+# every hook below costs a single flag check
+ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds for stage latencies (seconds) and candidate-set sizes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Render a label set as a Prometheus label string
+def _labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+# Monotonic counter keyed by label values
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def render(self):
+        with self.lock:
+            return [f"{self.name}{_labels(key)} {value}" for key, value in sorted(self.values.items())]
+
+# Cumulative histogram keyed by label values
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_labels(key, ('le', bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+# Collection of named metrics rendered together in the Prometheus text format
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help_text):
+        return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self.metrics.values():
+            with metric.lock:
+                metric.values.clear()
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("aidhp_stage_seconds", "Latency of pipeline stages in seconds")
+API_FALLBACKS = REGISTRY.counter("aidhp_api_fallback_total", "External API calls that failed and fell back to local recommendations")
+CACHE_REQUESTS = REGISTRY.counter("aidhp_cache_requests_total", "Cache lookups by cache and result")
+CANDIDATE_SET_SIZE = REGISTRY.histogram("aidhp_candidate_set_size", "Candidate products per recommendation request", SIZE_BUCKETS)
+
+# Turn instrumentation on or off at runtime
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+# Trace of the request running in the current thread or task, if one was started
+_current_trace = contextvars.ContextVar("aidhp_trace", default=None)
+
+# Per-request record of the stages it went through and the events it triggered
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+        self.events = {}
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "total_ms": (time.perf_counter() - self.start) * 1000,
+            "spans": self.spans,
+            "events": self.events,
+        }
+
+# Record one finished stage in the histogram and the current trace
+def record_stage(name, start, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    current = _current_trace.get()
+    if current is not None:
+        current.spans.append({"stage": name, "start_ms": (start - current.start) * 1000, "ms": seconds * 1000})
+
+# Increment a counter, noting the event on the current trace
+def inc(counter, value=1, **labels):
+    if not ENABLED:
+        return
+    counter.inc(value, **labels)
+    current = _current_trace.get()
+    if current is not None:
+        event = counter.name + _labels(tuple(sorted(labels.items())))
+        current.events[event] = current.events.get(event, 0) + value
+
+# Add an observation to a histogram
+def observe(histogram, value, **labels):
+    if ENABLED:
+        histogram.observe(value, **labels)
+
+# Decorator timing every call of a function as a pipeline stage
+def timed(stage_name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_stage(stage_name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+# Time a block of code as a pipeline stage
+@contextmanager
+def stage(stage_name):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, start, time.perf_counter() - start)
+
+# Collect the stages and events of one request; yields None while instrumentation is off
+@contextmanager
+def trace(name):
+    if not ENABLED:
+        yield None
+        return
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+# All metrics in the Prometheus text exposition format
+def export_prometheus():
+    return REGISTRY.render()
+
+# Serve /metrics for Prometheus scraping
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Start the /metrics endpoint in a background thread and turn instrumentation on
+def start_metrics_server(port=9100, host="0.0.0.0"):
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
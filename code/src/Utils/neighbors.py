@@ -0,0 +1,262 @@
+# Import required libraries
+import json
+import os
+import time
+import numpy as np
+from Utils.metrics import timed
+
+# Normalise rows to unit length so a dot product equals cosine similarity
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+# Select the k largest scores per row, sorted in descending order
+def top_k(scores, k):
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=np.float32)
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+# Merge two sets of (indices, scores) candidates and keep the best k per row
+def merge_top_k(indices_a, scores_a, indices_b, scores_b, k):
+    indices = np.concatenate([indices_a, indices_b], axis=1)
+    scores = np.concatenate([scores_a, scores_b], axis=1)
+    pos, best = top_k(scores, k)
+    return np.take_along_axis(indices, pos, axis=1), best
+
+# Shared query interface for all neighbour index backends
+class NeighborIndex:
+    # Arrays only read for a few rows per query, so they can stay on disk when memory-mapped
+    lazy_arrays = ()
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    # Bytes of the arrays every query scans, i.e. what has to stay resident for fast queries
+    def memory_bytes(self):
+        return sum(value.nbytes for name, value in vars(self).items()
+                   if isinstance(value, np.ndarray) and name not in self.lazy_arrays)
+
+    # Resolve a row index or a raw vector into a normalised query vector
+    def _as_query(self, idx_or_vector):
+        if np.isscalar(idx_or_vector):
+            return self.vectors[int(idx_or_vector)][None, :]
+        return normalize_rows(idx_or_vector)
+
+    # Return (indices, scores) of the k most similar customers, best first
+    @timed("neighbor_query")
+    def query(self, idx_or_vector, k):
+        indices, scores = self.query_batch(self._as_query(idx_or_vector), k)
+        found = indices[0] >= 0
+        return indices[0][found], scores[0][found]
+
+# Exact cosine top-K using a blocked matrix multiply instead of a full N x N matrix
+class ExactIndex(NeighborIndex):
+    def __init__(self, embeddings, block_size=4096):
+        self.vectors = normalize_rows(embeddings)
+        self.block_size = block_size
+
+    # Top-K for a batch of query vectors, scanning the corpus block by block
+    def query_batch(self, queries, k):
+        queries = normalize_rows(queries)
+        n_queries = queries.shape[0]
+        best_idx = np.empty((n_queries, 0), dtype=np.int64)
+        best_scores = np.empty((n_queries, 0), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block = self.vectors[start:start + self.block_size]
+            block_idx, block_scores = top_k(queries @ block.T, k)
+            best_idx, best_scores = merge_top_k(best_idx, best_scores, block_idx + start, block_scores, k)
+        return best_idx, best_scores
+
+# Approximate top-K using an inverted file: k-means cells probed nearest first. Given `centroids`
+# (e.g. of a previous index over mostly the same customers) the vectors are only assigned to them
+class IVFIndex(NeighborIndex):
+    def __init__(self, embeddings, n_lists=None, n_probe=4, n_iter=10, seed=42, centroids=None):
+        self.vectors = normalize_rows(embeddings)
+        n = self.vectors.shape[0]
+        if centroids is not None:
+            self.n_lists = len(centroids)
+            self.n_probe = min(n_probe, self.n_lists)
+            self.centroids = np.array(centroids, dtype=np.float32)
+            assignments = self._assign(self.centroids)
+        else:
+            self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+            self.n_probe = min(n_probe, self.n_lists)
+            self.centroids, assignments = self._train(n_iter, seed)
+        # Store cell members contiguously so a probe reads one slice per cell
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(self.n_lists + 1))
+
+    # Spherical k-means over the normalised vectors
+    def _train(self, n_iter, seed):
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(len(self), self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignments = self._assign(centroids)
+            # Group the members of each cell contiguously with one sort (as the cell lists are
+            # stored), so each mean is over a slice instead of a mask over every vector; empty
+            # cells keep their centroid
+            counts = np.bincount(assignments, minlength=self.n_lists)
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            grouped = self.vectors[np.argsort(assignments, kind="stable")]
+            for cell in np.flatnonzero(counts):
+                centroids[cell] = grouped[offsets[cell]:offsets[cell + 1]].mean(axis=0)
+            centroids = normalize_rows(centroids)
+        return centroids, self._assign(centroids)
+
+    # Assign each vector to its closest centroid, in blocks to bound memory
+    def _assign(self, centroids, block_size=65536):
+        assignments = np.empty(len(self), dtype=np.int64)
+        for start in range(0, len(self), block_size):
+            assignments[start:start + block_size] = np.argmax(self.vectors[start:start + block_size] @ centroids.T, axis=1)
+        return assignments
+
+    # Probe the n_probe closest cells of each query and rank their members exactly,
+    # padding with -1 when fewer than k customers were probed
+    def query_batch(self, queries, k):
+        queries = normalize_rows(queries)
+        cells, _ = top_k(queries @ self.centroids.T, self.n_probe)
+        all_idx = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            members = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells[row]])
+            pos, scores = top_k((self.vectors[members] @ query)[None, :], k)
+            all_idx[row, :pos.shape[1]] = members[pos[0]]
+            all_scores[row, :pos.shape[1]] = scores[0]
+        return all_idx, all_scores
+
+# Exact search over compressed vectors: the first pass scans int8 or float16 codes, then the best
+# k * rerank candidates are re-scored against the full-precision vectors, which are only read
+# for those rows (and stay on disk once the index is memory-mapped by load_index)
+class QuantizedIndex(NeighborIndex):
+    code_dtype = np.int8
+    lazy_arrays = ("vectors",)
+
+    def __init__(self, embeddings, rerank=4, block_size=4096):
+        self.vectors = normalize_rows(embeddings)
+        self.rerank = rerank
+        self.block_size = block_size
+        self.codes, self.scales = quantize(self.vectors, self.code_dtype)
+
+    # Approximate scores of the queries against a block of codes
+    def _block_scores(self, queries, start):
+        block = self.codes[start:start + self.block_size].astype(np.float32)
+        return (queries @ block.T) * self.scales[start:start + self.block_size]
+
+    def query_batch(self, queries, k):
+        queries = normalize_rows(queries)
+        n_candidates = min(len(self), k * self.rerank)
+        cand_idx = np.empty((len(queries), 0), dtype=np.int64)
+        cand_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block_idx, block_scores = top_k(self._block_scores(queries, start), n_candidates)
+            cand_idx, cand_scores = merge_top_k(cand_idx, cand_scores, block_idx + start, block_scores, n_candidates)
+
+        # Re-rank the candidates exactly, reading only their full-precision rows
+        rows = np.unique(cand_idx)
+        full = np.asarray(self.vectors[rows])
+        exact = np.einsum("qcd,qd->qc", full[np.searchsorted(rows, cand_idx)], queries)
+        pos, scores = top_k(exact, k)
+        return np.take_along_axis(cand_idx, pos, axis=1), scores
+
+# QuantizedIndex storing float16 codes (no scales needed)
+class Float16Index(QuantizedIndex):
+    code_dtype = np.float16
+
+# Compress unit vectors to int8 with a per-vector scale, or to float16 with unit scales
+def quantize(vectors, dtype=np.int8):
+    if dtype == np.float16:
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+# Available neighbour index backends
+BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "int8": QuantizedIndex,
+    "float16": Float16Index,
+}
+
+# Build a neighbour index over customer embeddings with the chosen backend
+def build_index(embeddings, backend="exact", **kwargs):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown neighbour index backend: {backend}")
+    return BACKENDS[backend](embeddings, **kwargs)
+
+# Save an index as one .npy file per array plus a JSON file of its settings
+def save_index(index, directory):
+    os.makedirs(directory, exist_ok=True)
+    backend = next(name for name, cls in BACKENDS.items() if type(index) is cls)
+    settings = {}
+    for name, value in vars(index).items():
+        if isinstance(value, np.ndarray):
+            np.save(os.path.join(directory, f"{name}.npy"), value)
+        else:
+            settings[name] = value
+    with open(os.path.join(directory, "index.json"), 'w') as f:
+        json.dump({"backend": backend, "settings": settings}, f)
+
+# Load an index written by save_index, memory-mapping its arrays instead of reading them
+def load_index(directory, mmap_mode="r"):
+    with open(os.path.join(directory, "index.json"), 'r') as f:
+        meta = json.load(f)
+    index = BACKENDS[meta["backend"]].__new__(BACKENDS[meta["backend"]])
+    vars(index).update(meta["settings"])
+    for filename in os.listdir(directory):
+        if filename.endswith(".npy"):
+            setattr(index, filename[:-4], np.load(os.path.join(directory, filename), mmap_mode=mmap_mode))
+    return index
+
+# Compare recall@k and query latency of each backend against the exact index
+def compare_backends(embeddings, k=10, n_queries=200, backends=("exact", "ivf", "int8", "float16"), seed=0):
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(embeddings), min(n_queries, len(embeddings)), replace=False)
+    truth, _ = build_index(embeddings, "exact").query_batch(np.asarray(embeddings)[queries], k)
+    results = []
+    for backend in backends:
+        start = time.perf_counter()
+        index = build_index(embeddings, backend)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [index.query(int(q), k)[0] for q in queries]
+        latency = (time.perf_counter() - start) / len(queries)
+        hits = sum(len(set(f.tolist()) & set(t.tolist())) for f, t in zip(found, truth))
+        results.append({
+            "backend": backend,
+            "recall_at_k": hits / truth.size,
+            "avg_query_ms": latency * 1000,
+            "build_s": build_time,
+            "memory_mb": index.memory_bytes() / 1e6,
+        })
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recall vs latency of the neighbour index backends")
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    # Random clustered vectors stand in for real embeddings of the same shape
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(1, args.customers // 100), args.dim))
+    data = centers[rng.integers(0, len(centers), args.customers)] + 1.5 * rng.normal(size=(args.customers, args.dim))
+    for row in compare_backends(data.astype(np.float32), args.k, args.queries):
+        print(f"{row['backend']:>7}  recall@{args.k}={row['recall_at_k']:.3f}  "
+              f"query={row['avg_query_ms']:.2f} ms  build={row['build_s']:.2f} s  memory={row['memory_mb']:.1f} MB")
@@ -0,0 +1,180 @@
+# Import required libraries
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from Utils.catalog import DEFAULT_CATALOG
+from Utils.neighbors import ExactIndex, merge_top_k
+from Utils.recommendations import get_candidates, rank_candidates_batch, render_recommendations
+
+# Customer fields that affect a customer's own recommendations
+PROFILE_FIELDS = ["Customer Name", "Purchase History", "Interests", "Sentiment Score", "Engagement Score",
+                  "Age", "Gender", "Social Media Activity"]
+
+# 64-bit fingerprint of a JSON-serialisable value
+def _hash64(value):
+    digest = hashlib.blake2b(json.dumps(value, default=str).encode("utf-8"), digest_size=8).digest()
+    return np.frombuffer(digest, dtype=np.uint64)[0]
+
+# Fingerprint of every customer's profile
+def profile_fingerprints(df):
+    columns = [df[field].tolist() for field in PROFILE_FIELDS]
+    return np.array([_hash64(values) for values in zip(*columns)], dtype=np.uint64)
+
+# Fingerprint of what each customer's collaborative candidates depend on: the purchase histories
+# of its neighbours (itself excluded)
+def neighbor_fingerprints(neighbors, purchases):
+    return np.array([_hash64([purchases[u] for u in row if u >= 0 and u != i]) for i, row in enumerate(neighbors)], dtype=np.uint64)
+
+# Neighbours of every customer, queried in batches
+def all_neighbors(neighbor_index, n_rows, k=3, chunk_size=4096):
+    neighbors = np.full((n_rows, k), -1, dtype=np.int64)
+    for start in range(0, n_rows, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, n_rows))
+        found, _ = neighbor_index.query_batch(neighbor_index.vectors[rows], k)
+        neighbors[rows, :found.shape[1]] = found
+    return neighbors
+
+# Neighbours of every customer, reusing the rows of a previous snapshot: an unchanged customer whose
+# old neighbours are all unchanged keeps them, merged with its best matches among the changed
+# customers; everyone else is queried again. `previous_rows` maps each customer to its row in the
+# previous snapshot (-1 if new) and `unchanged` marks customers whose vector is the same as there.
+# Gives the same neighbours as all_neighbors for an exact index
+def update_neighbors(neighbor_index, previous_neighbors, previous_rows, unchanged, k=3, chunk_size=4096):
+    n_rows = len(previous_rows)
+    kept = np.flatnonzero(unchanged)
+    # New row of every previous row, -1 when that customer changed or left; the extra trailing
+    # entry maps -1 padding to -1
+    new_row = np.full(len(previous_neighbors) + 1, -1, dtype=np.int64)
+    new_row[previous_rows[kept]] = kept
+    old = np.asarray(previous_neighbors)[previous_rows[kept]]
+    mapped = new_row[old]
+    reusable = np.all((old < 0) | (mapped >= 0), axis=1)
+
+    neighbors = np.full((n_rows, k), -1, dtype=np.int64)
+    changed = np.flatnonzero(~unchanged)
+    changed_index = ExactIndex(neighbor_index.vectors[changed]) if len(changed) else None
+    reuse_rows, reuse_neighbors = kept[reusable], mapped[reusable]
+    for start in range(0, len(reuse_rows), chunk_size):
+        rows, candidates = reuse_rows[start:start + chunk_size], reuse_neighbors[start:start + chunk_size]
+        queries = np.asarray(neighbor_index.vectors[rows])
+        scores = np.einsum("qcd,qd->qc", np.asarray(neighbor_index.vectors)[candidates], queries)
+        scores[candidates < 0] = -np.inf
+        if changed_index is not None:
+            found, found_scores = changed_index.query_batch(queries, k)
+            candidates, scores = merge_top_k(candidates, scores, changed[found], found_scores, k)
+        neighbors[rows, :candidates.shape[1]] = np.where(np.isneginf(scores), -1, candidates)
+
+    requery = np.setdiff1d(np.arange(n_rows), reuse_rows)
+    for start in range(0, len(requery), chunk_size):
+        rows = requery[start:start + chunk_size]
+        found, _ = neighbor_index.query_batch(neighbor_index.vectors[rows], k)
+        neighbors[rows, :found.shape[1]] = found
+    return neighbors
+
+# Rows that have each customer among their neighbours (itself excluded), as CSR arrays: the
+# customers listing row i are users[offsets[i]:offsets[i + 1]]
+def reverse_neighbors(neighbors):
+    neighbors = np.asarray(neighbors)
+    users = np.repeat(np.arange(len(neighbors)), neighbors.shape[1])
+    flat = neighbors.ravel()
+    keep = (flat >= 0) & (flat != users)
+    order = np.argsort(flat[keep], kind="stable")
+    offsets = np.searchsorted(flat[keep][order], np.arange(len(neighbors) + 1))
+    return offsets, users[keep][order]
+
+# Offline-materialised top-K recommendations per customer for one strategy, memory-mapped from disk.
+# Row i belongs to row i of the snapshot's customer store; names are resolved through the snapshot
+class RecommendationTable:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "table.json"), 'r') as f:
+            meta = json.load(f)
+        self.strategy = meta["strategy"]
+        self.k = meta["k"]
+        self.vocab = meta["vocab"]
+        # Rows whose customer changed since the table was built (e.g. by event ingestion)
+        self.stale = set()
+        for name in ["products", "scores", "profile_fp", "neighbor_fp"]:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return len(self.products)
+
+    # Stop serving rows whose customers changed; they are recomputed live until the next rebuild
+    def invalidate(self, rows):
+        self.stale = self.stale | {int(row) for row in rows}
+
+    # Ranked recommendations of a table row; reasons are rendered only for the returned items
+    def lookup(self, idx, customer_data, catalog=DEFAULT_CATALOG):
+        row = self.products[idx]
+        products = [self.vocab[p] for p in row if p >= 0]
+        return render_recommendations(products, self.scores[idx][:len(products)], customer_data, catalog)
+
+    # Build the table at `path`, recomputing only customers whose profile or neighbour set changed
+    # since `previous` (an older table of the same strategy), or every customer when there is none.
+    # `neighbors` are every customer's neighbours (all_neighbors, computed once for all strategies;
+    # unused by contextual), `previous_rows` maps each customer to its row in `previous` (-1 if new)
+    # and `profile_fp` are the customers' profile_fingerprints when already computed
+    @classmethod
+    def build(cls, path, df, neighbors=None, strategy="hybrid", k=5, catalog=DEFAULT_CATALOG, previous=None,
+              previous_rows=None, profile_fp=None, chunk_size=1000):
+        if profile_fp is None:
+            profile_fp = profile_fingerprints(df)
+        if strategy == "contextual":
+            # Contextual candidates never look at neighbours
+            neighbor_fp = np.zeros(len(df), dtype=np.uint64)
+            neighbors = np.full((len(df), 0), -1, dtype=np.int64)
+        else:
+            neighbor_fp = neighbor_fingerprints(neighbors, df["Purchase History"].tolist())
+        products = np.full((len(df), k), -1, dtype=np.int32)
+        scores = np.zeros((len(df), k), dtype=np.float64)
+        vocab_ids = {}
+
+        # Copy forward rows that are still valid
+        stale = np.ones(len(df), dtype=bool)
+        if previous is not None and previous_rows is not None and previous.strategy == strategy and previous.k == k:
+            # Old vocabulary IDs map to new ones; the trailing -1 keeps padding (-1) as padding
+            remap = np.array([vocab_ids.setdefault(p, len(vocab_ids)) for p in previous.vocab] + [-1], dtype=np.int32)
+            prev_rows = np.asarray(previous_rows, dtype=np.int64)
+            known = prev_rows >= 0
+            src = prev_rows[known]
+            still_valid = (previous.profile_fp[src] == profile_fp[known]) & (previous.neighbor_fp[src] == neighbor_fp[known])
+            kept = np.flatnonzero(known)[still_valid]
+            products[kept] = remap[np.asarray(previous.products)[src[still_valid]]]
+            scores[kept] = previous.scores[src[still_valid]]
+            stale[kept] = False
+
+        # Recompute the rest in chunks
+        stale_rows = np.flatnonzero(stale)
+        for start in range(0, len(stale_rows), chunk_size):
+            rows = stale_rows[start:start + chunk_size]
+            customers = [df.iloc[i].to_dict() for i in rows]
+            candidate_lists = [get_candidates(c, df, i, neighbors[i][neighbors[i] >= 0], strategy, catalog) for c, i in zip(customers, rows)]
+            top, top_scores = rank_candidates_batch(candidate_lists, customers, strategy, k, catalog)
+            for out_row, ranked, ranked_scores in zip(rows, top, top_scores):
+                ids = [vocab_ids.setdefault(catalog.products[p], len(vocab_ids)) for p in ranked if p >= 0]
+                products[out_row, :len(ids)] = ids
+                scores[out_row, :len(ids)] = ranked_scores[:len(ids)]
+
+        # Write to a temporary directory and swap it in
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, array in [("products", products), ("scores", scores), ("profile_fp", profile_fp), ("neighbor_fp", neighbor_fp)]:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        with open(os.path.join(tmp_path, "table.json"), 'w') as f:
+            json.dump({"strategy": strategy, "k": k, "vocab": list(vocab_ids), "recomputed": int(len(stale_rows))}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+# Open the tables stored under a directory, one per strategy subdirectory
+def load_tables(directory):
+    tables = {}
+    if os.path.isdir(directory):
+        for strategy in os.listdir(directory):
+            if os.path.exists(os.path.join(directory, strategy, "table.json")):
+                tables[strategy] = RecommendationTable(os.path.join(directory, strategy))
+    return tables
@@ -1,151 +1,182 @@
 # Import required libraries
 import numpy as np
-import plotly.express as px
 from datetime import datetime
 import random
-import requests  # New import for API calls
+import zlib
+from Utils.api_client import get_client
+from Utils.catalog import DEFAULT_CATALOG
+from Utils.data_processing import preprocess_record
+from Utils.embeddings import get_customer_vector
+from Utils.metrics import inc, observe, timed, API_FALLBACKS, CACHE_REQUESTS, CANDIDATE_SET_SIZE
+from Utils.scoring import encode_customers, score_matrix, select_top_k, COLLABORATIVE_STRATEGIES
 
 # Generate product recommendations for existing customers
-def recommend_products(customer_data, df, similarity_matrix, strategy="hybrid", api_key=None):
+@timed("recommend_products")
+def recommend_products(customer_data, df, neighbor_index, strategy="hybrid", api_key=None, idx=None, catalog=DEFAULT_CATALOG,
+                       table=None, item_index=None):
+    if idx is None:
+        idx = find_customer_index(df, customer_data["Customer Name"])
+    
+    # Serve from the precomputed table when it has this customer
+    if table is not None and not api_key:
+        if idx < len(table) and idx not in table.stale:
+            inc(CACHE_REQUESTS, cache="rec_table", result="hit")
+            return table.lookup(idx, customer_data, catalog)
+        inc(CACHE_REQUESTS, cache="rec_table", result="miss")
+    
+    # Get similar users using collaborative filtering; when the neighbour search is unreachable
+    # (e.g. the shard holding this customer is down) the candidates come from interests alone
+    try:
+        similar_users, similar_scores = neighbor_index.query(idx, 3)
+    except ConnectionError as e:
+        print(f"Neighbour search failed: {e}")
+        similar_users, similar_scores = np.empty(0, dtype=np.int64), np.empty(0)
+    
     if api_key:
         # API-based recommendation logic
         try:
-            # Prepare payload for API request
-            payload = {
-                "customer_data": customer_data,
-                "strategy": strategy,
-                "similarity_data": similarity_matrix[idx].tolist() if 'idx' in locals() else []
-            }
-            headers = {"Authorization": f"Bearer {api_key}"}
-            response = requests.post(
-                "https://api.recommendation-engine.com/recommend",  # Hypothetical API endpoint
-                json=payload,
-                headers=headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            api_recs = response.json().get("recommendations", [])
-            return api_recs  # Assuming API returns in compatible format
+            similarity_data = [{"index": int(u), "score": float(s)} for u, s in zip(similar_users, similar_scores) if u != idx]
+            return get_client(api_key).recommend(customer_data, strategy, similarity_data)
         except Exception as e:
             print(f"API request failed: {e}")
+            inc(API_FALLBACKS, endpoint="recommend")
             # Fallback to simulated responses if API fails
 
     # Existing simulated response logic
-    idx = df.index[df["Customer Name"] == customer_data["Customer Name"]].tolist()[0]
-    
-    # Get similar users using collaborative filtering
-    similar_users = np.argsort(similarity_matrix[idx])[-3:][::-1]
-    similar_users = [u for u in similar_users if u != idx]
-    
-    # Collect recommendations from similar users
-    collab_recs = set()
-    for user in similar_users:
-        collab_recs.update(df.iloc[user]["Purchase History"])
-    
-    # Filter out items customer already has
+    candidates = get_candidates(customer_data, df, idx, similar_users, strategy, catalog, item_index)
+    observe(CANDIDATE_SET_SIZE, len(candidates), strategy=strategy)
+    return rank_recommendations(candidates, customer_data, strategy, 5, catalog)
+
+# Find the row index of a customer by name
+def find_customer_index(df, customer_name):
+    return df.index[df["Customer Name"] == customer_name].tolist()[0]
+
+# Collect candidate products for a customer from similar users and their interests; the "item"
+# strategy takes them from the item co-occurrence index instead of similar users
+@timed("get_candidates")
+def get_candidates(customer_data, df, idx, similar_users, strategy="hybrid", catalog=DEFAULT_CATALOG, item_index=None):
     existing_items = set(customer_data["Purchase History"])
-    collab_recs = list(collab_recs - existing_items)
+    if strategy == "item":
+        if item_index is None:
+            raise ValueError("The item strategy needs an item co-occurrence index")
+        collab_recs = [catalog.intern(p) for p in item_index.candidates(customer_data["Purchase History"])]
+    else:
+        similar_users = [u for u in similar_users if u != idx]
+        
+        # Collect recommendations from similar users
+        collab_recs = set()
+        for user in similar_users:
+            collab_recs.update(catalog.intern(p) for p in df.iloc[user]["Purchase History"])
+        
+        # Filter out items customer already has
+        collab_recs = list(collab_recs - existing_items)
     
     # Filter recommendations based on customer interests
     filtered_collab_recs = []
     for rec in collab_recs:
-        if any(interest.lower() in rec.lower() for interest in customer_data["Interests"]):
+        if catalog.any_match(customer_data["Interests"], rec):
             filtered_collab_recs.append(rec)
     
     # Use unfiltered recommendations if no matches found
     if not filtered_collab_recs:
         filtered_collab_recs = collab_recs
     
-    # Map of interests to potential products
-    interest_map = {
-        "Tech": ["Wireless Keyboard", "External SSD"],
-        "Gaming": ["Gaming Mouse", "Mechanical Keyboard"],
-        "Fashion": ["Designer Watch", "Silk Scarf"],
-        "Winter Wear": ["Winter Boots", "Wool Gloves"],
-        "Mobile": ["Phone Stand", "Screen Protector"],
-        "Accessories": ["Smart Watch", "Wireless Earbuds"],
-        "Photography": ["Camera Bag", "Lens Cleaner"],
-        "Gadgets": ["Smart Speaker", "Fitness Tracker"],
-        "Luxury": ["Premium Credit Card", "Investment Portfolio"],
-        "Travel": ["Travel Insurance", "Currency Exchange Card"]
-    }
-    
     # Generate contextual recommendations based on interests
-    context_recs = []
-    for interest in customer_data["Interests"]:
-        if interest in interest_map:
-            context_recs.extend(interest_map[interest])
-    
-    # Assess customer risk score
-    risk_score = assess_risk(customer_data)
+    context_recs = catalog.contextual_products(customer_data["Interests"])
     
     # Combine recommendations based on selected strategy
-    if strategy == "collaborative":
-        all_recs = filtered_collab_recs
+    if strategy in COLLABORATIVE_STRATEGIES:
+        return filtered_collab_recs
     elif strategy == "contextual":
-        all_recs = context_recs
+        return context_recs
     else:  # hybrid
-        all_recs = list(set(filtered_collab_recs + context_recs))
-    
-    # Score and sort recommendations
-    final_recs = []
-    for rec in all_recs:
-        rec_score = score_recommendation(rec, customer_data, risk_score, strategy)
-        final_recs.append({"product": rec, "score": rec_score, "reason": get_reason(rec, customer_data), "risk": risk_score})
-    
-    return sorted(final_recs, key=lambda x: x["score"], reverse=True)[:5]
+        return list(set(filtered_collab_recs + context_recs))
+
+# Score candidate products and keep the best top_n
+def rank_recommendations(candidates, customer_data, strategy="hybrid", top_n=5, catalog=DEFAULT_CATALOG):
+    return rank_recommendations_batch([candidates], [customer_data], strategy, top_n, catalog)[0]
+
+# Score the candidates of many customers as one customers x products matrix and keep each one's best top_n
+def rank_recommendations_batch(candidate_lists, customers, strategy="hybrid", top_n=5, catalog=DEFAULT_CATALOG):
+    top, top_scores = rank_candidates_batch(candidate_lists, customers, strategy, top_n, catalog)
+    results = []
+    for customer_data, row, row_scores in zip(customers, top, top_scores):
+        results.append(render_recommendations([catalog.products[p] for p in row if p >= 0], row_scores, customer_data, catalog))
+    return results
+
+# Rank candidates without explanations: catalog product IDs (-1 padded) and scores of each customer's top_n
+@timed("rank_candidates")
+def rank_candidates_batch(candidate_lists, customers, strategy="hybrid", top_n=5, catalog=DEFAULT_CATALOG):
+    # Only the products that are a candidate for someone become matrix columns
+    candidate_ids = [catalog.ids(candidates) for candidates in candidate_lists]
+    columns = np.unique(np.concatenate(candidate_ids)) if candidate_ids else np.empty(0, dtype=np.int64)
+    mask = np.zeros((len(customers), len(columns)), dtype=bool)
+    for row, ids in enumerate(candidate_ids):
+        mask[row, np.searchsorted(columns, ids)] = True
+    
+    # Score everything in one pass, then select the top_n per customer
+    scores = score_matrix(encode_customers(customers, catalog), strategy, columns, catalog)
+    top, top_scores = select_top_k(scores, mask, top_n)
+    return np.where(top >= 0, columns[np.maximum(top, 0)], -1), top_scores
 
-# Generate recommendations for new customers based on interests
-def recommend_new_customer(customer_data, api_key=None):
+# Turn ranked products and scores into recommendation dicts with reasons
+@timed("render_recommendations")
+def render_recommendations(products, scores, customer_data, catalog=DEFAULT_CATALOG):
+    # Assess customer risk score and the customer-level reason parts once for all items
+    risk_score = assess_risk(customer_data)
+    context = reason_context(customer_data, catalog, risk_score)
+    return [{"product": rec, "score": float(rec_score), "reason": get_reason(rec, customer_data, catalog, context), "risk": risk_score}
+            for rec, rec_score in zip(products, scores)]
+
+# Strategies whose candidates for a new customer come from similar existing customers
+NEIGHBOR_STRATEGIES = ("hybrid", "collaborative")
+
+# True if recommend_new_customer embeds the customer for this strategy, so callers only build
+# (and load the model for) an encoder when it is used
+def needs_encoder(strategy):
+    return strategy in NEIGHBOR_STRATEGIES
+
+# Generate recommendations for new customers; for the neighbour strategies, given an encoder, a
+# neighbour index and the customers it indexes (df), the customer is embedded with the same feature
+# template as existing customers and gets collaborative candidates too; the item strategy only needs
+# the purchase history and the item co-occurrence index. Everything else falls back to contextual
+# recommendations
+@timed("recommend_new_customer")
+def recommend_new_customer(customer_data, api_key=None, catalog=DEFAULT_CATALOG, df=None, neighbor_index=None,
+                           encoder=None, strategy="hybrid", item_index=None):
     if api_key:
         # API-based recommendation logic
         try:
-            payload = {"customer_data": customer_data}
-            headers = {"Authorization": f"Bearer {api_key}"}
-            response = requests.post(
-                "https://api.recommendation-engine.com/recommend-new",  # Hypothetical API endpoint
-                json=payload,
-                headers=headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            api_recs = response.json().get("recommendations", [])
-            return api_recs  # Assuming API returns in compatible format
+            return get_client(api_key).recommend_new(customer_data)
         except Exception as e:
             print(f"API request failed: {e}")
+            inc(API_FALLBACKS, endpoint="recommend-new")
             # Fallback to simulated responses if API fails
 
     # Existing simulated response logic
-    # Map of interests to potential products
-    interest_map = {
-        "Tech": ["Wireless Keyboard", "External SSD"],
-        "Gaming": ["Gaming Mouse", "Mechanical Keyboard"],
-        "Fashion": ["Designer Watch", "Silk Scarf"],
-        "Winter Wear": ["Winter Boots", "Wool Gloves"],
-        "Mobile": ["Phone Stand", "Screen Protector"],
-        "Accessories": ["Smart Watch", "Wireless Earbuds"],
-        "Photography": ["Camera Bag", "Lens Cleaner"],
-        "Gadgets": ["Smart Speaker", "Fitness Tracker"],
-        "Luxury": ["Premium Credit Card", "Investment Portfolio"],
-        "Travel": ["Travel Insurance", "Currency Exchange Card"]
-    }
+    if strategy == "item" and item_index is not None:
+        # Item co-occurrence only needs the purchase history, not an embedding
+        candidates = get_candidates(customer_data, df, None, [], strategy, catalog, item_index)
+        observe(CANDIDATE_SET_SIZE, len(candidates), strategy=strategy)
+        return rank_recommendations(candidates, customer_data, strategy, 5, catalog)
+    if needs_encoder(strategy) and encoder is not None and neighbor_index is not None and df is not None:
+        vector = get_customer_vector(preprocess_record(customer_data), encoder.encode)
+        # As in recommend_products, an unreachable neighbour search leaves the interest candidates
+        try:
+            similar_users, _ = neighbor_index.query(vector, 3)
+        except ConnectionError as e:
+            print(f"Neighbour search failed: {e}")
+            similar_users = np.empty(0, dtype=np.int64)
+        candidates = get_candidates(customer_data, df, None, similar_users, strategy, catalog)
+        observe(CANDIDATE_SET_SIZE, len(candidates), strategy=strategy)
+        return rank_recommendations(candidates, customer_data, strategy, 5, catalog)
     
     # Generate recommendations based on interests
-    context_recs = []
-    for interest in customer_data["Interests"]:
-        if interest in interest_map:
-            context_recs.extend(interest_map[interest])
-    
-    # Assess customer risk score
-    risk_score = assess_risk(customer_data)
+    context_recs = catalog.contextual_products(customer_data["Interests"])
+    observe(CANDIDATE_SET_SIZE, len(context_recs), strategy="contextual")
     
     # Score and sort recommendations
-    final_recs = []
-    for rec in context_recs:
-        rec_score = score_recommendation(rec, customer_data, risk_score, "contextual")
-        final_recs.append({"product": rec, "score": rec_score, "reason": get_reason(rec, customer_data), "risk": risk_score})
-    
-    return sorted(final_recs, key=lambda x: x["score"], reverse=True)[:5]
+    return rank_recommendations(context_recs, customer_data, "contextual", 5, catalog)
 
 # Calculate basic risk score based on sentiment and engagement
 def assess_risk(customer_data):
@@ -157,11 +188,11 @@ def assess_risk(customer_data):
     return min(risk, 1.0)
 
 # Score recommendations based on multiple factors
-def score_recommendation(product, customer_data, risk_score, strategy):
+def score_recommendation(product, customer_data, risk_score, strategy, catalog=DEFAULT_CATALOG):
     base_score = 0.5
     
     # Adjust score based on interest match
-    interest_match = any(interest.lower() in product.lower() for interest in customer_data["Interests"])
+    interest_match = catalog.any_match(customer_data["Interests"], product)
     if interest_match:
         base_score += 0.3
         if strategy == "contextual":
@@ -170,25 +201,10 @@ def score_recommendation(product, customer_data, risk_score, strategy):
         base_score -= 0.2
     
     # Adjust score based on purchase history alignment
-    purchase_categories = set()
-    for purchase in customer_data["Purchase History"]:
-        for interest, products in {
-            "Tech": ["Laptop", "Mouse", "Wireless Keyboard", "External SSD"],
-            "Gaming": ["Gaming Mouse", "Mechanical Keyboard"],
-            "Fashion": ["Shoes", "Jacket", "Designer Watch", "Silk Scarf"],
-            "Winter Wear": ["Winter Boots", "Wool Gloves"],
-            "Mobile": ["Phone", "Phone Stand", "Screen Protector"],
-            "Accessories": ["Earbuds", "Smart Watch", "Wireless Earbuds"],
-            "Photography": ["Camera", "Tripod", "Camera Bag", "Lens Cleaner"],
-            "Gadgets": ["Smart Speaker", "Fitness Tracker"],
-            "Luxury": ["Watch", "Sunglasses", "Premium Credit Card", "Investment Portfolio"],
-            "Travel": ["Travel Insurance", "Currency Exchange Card"]
-        }.items():
-            if purchase in products:
-                purchase_categories.add(interest)
-    if any(category.lower() in product.lower() for category in purchase_categories):
+    purchase_categories = catalog.purchase_categories(customer_data["Purchase History"])
+    if catalog.any_match(purchase_categories, product):
         base_score += 0.15
-        if strategy == "collaborative":
+        if strategy in COLLABORATIVE_STRATEGIES:
             base_score += 0.2
     
     # Adjust score for insurance products if risk is high
@@ -205,164 +221,187 @@ def score_recommendation(product, customer_data, risk_score, strategy):
     
     return min(max(base_score, 0.0), 1.0)
 
+# Reason templates, built once at import; "{}" takes the joined interests or purchases
+INTEREST_TEMPLATES = [
+    "Perfect for your passion in {}!",
+    "Designed for {} lovers like you!",
+    "Enhance your {} experience with this!"
+]
+PURCHASE_TEMPLATES = [
+    "Pairs well with your {}!",
+    "Complements your recent purchase of {}!",
+    "A great addition to your {} setup!"
+]
+PRODUCT_PHRASES = {
+    "Gaming Mouse": ["Level up your gaming with precision control!"],
+    "Mechanical Keyboard": ["Experience the ultimate typing and gaming performance!"],
+    "Wireless Keyboard": ["Boost your productivity with seamless connectivity!"],
+    "External SSD": ["Store your tech projects with lightning-fast speed!"],
+    "Phone": ["Stay connected with the latest smartphone technology!"],
+    "Phone Stand": ["Keep your device handy while you work or play!"],
+    "Screen Protector": ["Protect your phone in style!"],
+    "Earbuds": ["Immerse yourself in music on the go!"],
+    "Smart Watch": ["Track your fitness and stay connected!"],
+    "Wireless Earbuds": ["Enjoy wireless freedom with crystal-clear sound!"],
+    "Camera": ["Capture every moment with stunning clarity!"],
+    "Camera Bag": ["Keep your photography gear safe and organized!"],
+    "Lens Cleaner": ["Ensure your shots are always crystal clear!"],
+    "Smart Speaker": ["Bring your home to life with smart audio!"],
+    "Fitness Tracker": ["Stay motivated with your fitness goals!"],
+    "Designer Watch": ["Add a touch of elegance to your style!"],
+    "Silk Scarf": ["Elevate your fashion with this luxurious accessory!"],
+    "Winter Boots": ["Stay warm and stylish this winter!"],
+    "Wool Gloves": ["Keep your hands cozy in the cold!"],
+    "Premium Credit Card": ["Unlock exclusive benefits with this card!"],
+    "Investment Portfolio": ["Secure your financial future with smart investments!"],
+    "Travel Insurance": ["Travel with peace of mind!"],
+    "Currency Exchange Card": ["Make international travel hassle-free!"]
+}
+POSITIVE_SENTIMENT_PHRASES = [
+    "You seem to be in a great mood—treat yourself with this!",
+    "Celebrate your positive vibes with this awesome product!",
+    "Your happiness deserves this special addition!"
+]
+NEGATIVE_SENTIMENT_PHRASES = [
+    "This might help lift your spirits!",
+    "Brighten your day with this fantastic product!",
+    "A little something to cheer you up!"
+]
+ENGAGEMENT_PHRASES = [
+    "As one of our most engaged users, we think you'll love this!",
+    "Your active engagement makes this a perfect fit for you!",
+    "We picked this just for a loyal user like you!"
+]
+RISK_PHRASES = [
+    "A smart choice to secure your future!",
+    "Protect what matters most with this!",
+    "Ensure peace of mind with this essential product!"
+]
+YOUNG_PHRASES = [
+    "A trendy pick for young enthusiasts like you!",
+    "Young and tech-savvy? This is for you!",
+    "Perfect for the next generation of innovators!"
+]
+SENIOR_PHRASES = [
+    "A reliable choice tailored for your needs!",
+    "Designed with your experience in mind!",
+    "A timeless addition for seasoned users!"
+]
+SOCIAL_PHRASES = [
+    "Share your experience with this on social media!",
+    "Show off this awesome product to your followers!",
+    "This is worth posting about on your socials!"
+]
+FALLBACK_PHRASES = [
+    "A great addition to your collection!",
+    "We think you'll enjoy this product!",
+    "A fantastic choice for someone like you!"
+]
+
+# Seed for reason phrasing; the same seed, customer and product always give the same reason
+REASON_SEED = 0
+
+# Parts of a reason that depend only on the customer, computed once per customer
+def reason_context(customer_data, catalog=DEFAULT_CATALOG, risk_score=None):
+    # Phrase lists that apply to every product, in the order reasons are assembled
+    profile_phrases = []
+    if customer_data["Sentiment Score"] > 0.5:
+        profile_phrases.append(POSITIVE_SENTIMENT_PHRASES)
+    elif customer_data["Sentiment Score"] < -0.5:
+        profile_phrases.append(NEGATIVE_SENTIMENT_PHRASES)
+    if customer_data["Engagement Score"] > 80:
+        profile_phrases.append(ENGAGEMENT_PHRASES)
+    age_phrases = YOUNG_PHRASES if customer_data["Age"] < 30 else SENIOR_PHRASES if customer_data["Age"] > 50 else None
+    return {
+        "name": customer_data.get("Customer Name", ""),
+        "interests": customer_data["Interests"],
+        "purchases": ", ".join(customer_data["Purchase History"]),
+        "purchase_categories": catalog.purchase_categories(customer_data["Purchase History"]),
+        "risk": assess_risk(customer_data) if risk_score is None else risk_score,
+        "profile_phrases": profile_phrases,
+        "age_phrases": age_phrases,
+        "social": customer_data["Social Media Activity"] == "High",
+    }
+
+# Random generator for one (customer, product) reason, stable across runs and processes
+def reason_rng(name, product, seed=None):
+    key = f"{REASON_SEED if seed is None else seed}|{name}|{product}"
+    return random.Random(zlib.crc32(key.encode("utf-8")))
+
 # Generate human-readable reasons for recommendations
-def get_reason(product, customer_data):
+def get_reason(product, customer_data, catalog=DEFAULT_CATALOG, context=None, rng=None):
+    if context is None:
+        context = reason_context(customer_data, catalog)
+    if rng is None:
+        rng = reason_rng(context["name"], product)
     reasons = []
     
     # Add interest-based reason if applicable
-    matching_interests = [interest for interest in customer_data["Interests"] if interest.lower() in product.lower()]
+    matching_interests = catalog.matching_terms(context["interests"], product)
     if matching_interests:
-        interest_phrases = [
-            f"Perfect for your passion in {', '.join(matching_interests)}!",
-            f"Designed for {', '.join(matching_interests)} lovers like you!",
-            f"Enhance your {', '.join(matching_interests)} experience with this!"
-        ]
-        reasons.append(random.choice(interest_phrases))
+        reasons.append(rng.choice(INTEREST_TEMPLATES).format(", ".join(matching_interests)))
     
     # Add purchase history reason if applicable
-    purchase_categories = set()
-    for purchase in customer_data["Purchase History"]:
-        for interest, products in {
-            "Tech": ["Laptop", "Mouse", "Wireless Keyboard", "External SSD"],
-            "Gaming": ["Gaming Mouse", "Mechanical Keyboard"],
-            "Fashion": ["Shoes", "Jacket", "Designer Watch", "Silk Scarf"],
-            "Winter Wear": ["Winter Boots", "Wool Gloves"],
-            "Mobile": ["Phone", "Phone Stand", "Screen Protector"],
-            "Accessories": ["Earbuds", "Smart Watch", "Wireless Earbuds"],
-            "Photography": ["Camera", "Tripod", "Camera Bag", "Lens Cleaner"],
-            "Gadgets": ["Smart Speaker", "Fitness Tracker"],
-            "Luxury": ["Watch", "Sunglasses", "Premium Credit Card", "Investment Portfolio"],
-            "Travel": ["Travel Insurance", "Currency Exchange Card"]
-        }.items():
-            if purchase in products:
-                purchase_categories.add(interest)
-    if any(category.lower() in product.lower() for category in purchase_categories):
-        purchase_phrases = [
-            f"Pairs well with your {', '.join(customer_data['Purchase History'])}!",
-            f"Complements your recent purchase of {', '.join(customer_data['Purchase History'])}!",
-            f"A great addition to your {', '.join(customer_data['Purchase History'])} setup!"
-        ]
-        reasons.append(random.choice(purchase_phrases))
+    if catalog.any_match(context["purchase_categories"], product):
+        reasons.append(rng.choice(PURCHASE_TEMPLATES).format(context["purchases"]))
     
     # Add product-specific reasons if available
-    product_phrases = {
-        "Gaming Mouse": ["Level up your gaming with precision control!"],
-        "Mechanical Keyboard": ["Experience the ultimate typing and gaming performance!"],
-        "Wireless Keyboard": ["Boost your productivity with seamless connectivity!"],
-        "External SSD": ["Store your tech projects with lightning-fast speed!"],
-        "Phone": ["Stay connected with the latest smartphone technology!"],
-        "Phone Stand": ["Keep your device handy while you work or play!"],
-        "Screen Protector": ["Protect your phone in style!"],
-        "Earbuds": ["Immerse yourself in music on the go!"],
-        "Smart Watch": ["Track your fitness and stay connected!"],
-        "Wireless Earbuds": ["Enjoy wireless freedom with crystal-clear sound!"],
-        "Camera": ["Capture every moment with stunning clarity!"],
-        "Camera Bag": ["Keep your photography gear safe and organized!"],
-        "Lens Cleaner": ["Ensure your shots are always crystal clear!"],
-        "Smart Speaker": ["Bring your home to life with smart audio!"],
-        "Fitness Tracker": ["Stay motivated with your fitness goals!"],
-        "Designer Watch": ["Add a touch of elegance to your style!"],
-        "Silk Scarf": ["Elevate your fashion with this luxurious accessory!"],
-        "Winter Boots": ["Stay warm and stylish this winter!"],
-        "Wool Gloves": ["Keep your hands cozy in the cold!"],
-        "Premium Credit Card": ["Unlock exclusive benefits with this card!"],
-        "Investment Portfolio": ["Secure your financial future with smart investments!"],
-        "Travel Insurance": ["Travel with peace of mind!"],
-        "Currency Exchange Card": ["Make international travel hassle-free!"]
-    }
-    if product in product_phrases:
-        reasons.append(random.choice(product_phrases[product]))
+    if product in PRODUCT_PHRASES:
+        reasons.append(rng.choice(PRODUCT_PHRASES[product]))
     
-    # Add sentiment-based reason if applicable
-    if customer_data["Sentiment Score"] > 0.5:
-        sentiment_phrases = [
-            "You seem to be in a great mood—treat yourself with this!",
-            "Celebrate your positive vibes with this awesome product!",
-            "Your happiness deserves this special addition!"
-        ]
-        reasons.append(random.choice(sentiment_phrases))
-    elif customer_data["Sentiment Score"] < -0.5:
-        sentiment_phrases = [
-            "This might help lift your spirits!",
-            "Brighten your day with this fantastic product!",
-            "A little something to cheer you up!"
-        ]
-        reasons.append(random.choice(sentiment_phrases))
-    
-    # Add engagement-based reason if applicable
-    if customer_data["Engagement Score"] > 80:
-        engagement_phrases = [
-            "As one of our most engaged users, we think you'll love this!",
-            "Your active engagement makes this a perfect fit for you!",
-            "We picked this just for a loyal user like you!"
-        ]
-        reasons.append(random.choice(engagement_phrases))
+    # Add sentiment- and engagement-based reasons if applicable
+    for phrases in context["profile_phrases"]:
+        reasons.append(rng.choice(phrases))
     
     # Add risk-based reason if applicable
-    risk_score = assess_risk(customer_data)
-    if risk_score > 0.5 and "Insurance" in product:
-        risk_phrases = [
-            "A smart choice to secure your future!",
-            "Protect what matters most with this!",
-            "Ensure peace of mind with this essential product!"
-        ]
-        reasons.append(random.choice(risk_phrases))
+    if context["risk"] > 0.5 and "Insurance" in product:
+        reasons.append(rng.choice(RISK_PHRASES))
     
     # Add age-based reason if applicable
-    if customer_data["Age"] < 30:
-        age_phrases = [
-            "A trendy pick for young enthusiasts like you!",
-            "Young and tech-savvy? This is for you!",
-            "Perfect for the next generation of innovators!"
-        ]
-        reasons.append(random.choice(age_phrases))
-    elif customer_data["Age"] > 50:
-        age_phrases = [
-            "A reliable choice tailored for your needs!",
-            "Designed with your experience in mind!",
-            "A timeless addition for seasoned users!"
-        ]
-        reasons.append(random.choice(age_phrases))
+    if context["age_phrases"] is not None:
+        reasons.append(rng.choice(context["age_phrases"]))
     
     # Add social media activity reason if applicable
-    if customer_data["Social Media Activity"] == "High":
-        social_phrases = [
-            "Share your experience with this on social media!",
-            "Show off this awesome product to your followers!",
-            "This is worth posting about on your socials!"
-        ]
-        reasons.append(random.choice(social_phrases))
+    if context["social"]:
+        reasons.append(rng.choice(SOCIAL_PHRASES))
     
     # Add fallback reason if no other reasons apply
     if not reasons:
-        fallback_phrases = [
-            "A great addition to your collection!",
-            "We think you'll enjoy this product!",
-            "A fantastic choice for someone like you!"
-        ]
-        reasons.append(random.choice(fallback_phrases))
+        reasons.append(rng.choice(FALLBACK_PHRASES))
     
     # Return 1-2 reasons for brevity
-    return " ".join(random.sample(reasons, min(len(reasons), 2)))
+    return " ".join(rng.sample(reasons, min(len(reasons), 2)))
 
-# Create radar chart visualization of customer profile
-def plot_customer_insights(customer_data):
+# Create radar chart visualization of customer profile; with a CohortIndex the chart also shows the
+# customer base's medians and the customer's percentile on each metric
+def plot_customer_insights(customer_data, cohorts=None):
+    # Imported on first use to keep plotly off the startup path
+    import plotly.express as px
+    
     categories = ['Sentiment', 'Engagement', 'Social Activity', 'Risk']
     
     # Calculate values for each metric
+    risk_score = assess_risk(customer_data)
     sentiment_value = max(0, customer_data['Sentiment Score'] + 1)
     engagement_value = customer_data['Engagement Score'] / 100 * 2
     social_activity_value = {"Low": 0, "Medium": 1, "High": 2}[customer_data['Social Media Activity']]
-    risk_value = assess_risk(customer_data) * 2
+    risk_value = risk_score * 2
     
     values = [sentiment_value, engagement_value, social_activity_value, risk_value]
     
+    # Where the customer stands in the whole base
+    ranks = [""] * 4
+    if cohorts is not None:
+        fields = [("sentiment", customer_data['Sentiment Score']), ("engagement", customer_data['Engagement Score']),
+                   (None, None), ("risk", risk_score)]
+        ranks = [f" - percentile {cohorts.percentile_rank(metric, value):.0f}" if metric else "" for metric, value in fields]
+    
     # Create hover text for tooltips
     hover_text = [
-        f"Sentiment: {sentiment_value:.2f} (Score: {customer_data['Sentiment Score']})",
-        f"Engagement: {engagement_value:.2f} (Score: {customer_data['Engagement Score']}/100)",
+        f"Sentiment: {sentiment_value:.2f} (Score: {customer_data['Sentiment Score']}){ranks[0]}",
+        f"Engagement: {engagement_value:.2f} (Score: {customer_data['Engagement Score']}/100){ranks[1]}",
         f"Social Activity: {social_activity_value:.2f} (Level: {customer_data['Social Media Activity']})",
-        f"Risk: {risk_value:.2f} (Score: {assess_risk(customer_data):.2f})"
+        f"Risk: {risk_value:.2f} (Score: {risk_score:.2f}){ranks[3]}"
     ]
     
     # Create radar chart
@@ -413,4 +452,21 @@ def plot_customer_insights(customer_data):
         width=400
     )
     
+    # Overlay the customer base's medians for comparison
+    if cohorts is not None:
+        import plotly.graph_objects as go
+        
+        medians = {metric: cohorts.percentiles(metric, (50,))[50] for metric in ["sentiment", "engagement", "risk"]}
+        social_counts = cohorts.segment_counts()["social"]
+        median_social = int(np.argmax(np.cumsum(list(social_counts.values())) >= sum(social_counts.values()) / 2))
+        base = [max(0, medians["sentiment"] + 1), medians["engagement"] / 100 * 2, median_social, medians["risk"] * 2]
+        fig.add_trace(go.Scatterpolar(
+            r=base + base[:1],
+            theta=categories + categories[:1],
+            mode='lines',
+            line=dict(color='gray', dash='dash'),
+            name='Customer base median',
+            hoverinfo='name'
+        ))
+    
     return fig
\ No newline at end of file
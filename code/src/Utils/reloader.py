@@ -0,0 +1,125 @@
+# Import required libraries
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from Utils import metrics
+from Utils.data_processing import SAMPLE_DATA_PATH
+from Utils.embeddings import load_model
+from Utils.snapshot import (DEFAULT_SNAPSHOT_DIR, build_snapshot, current_snapshot, load_or_build_snapshot,
+                            load_snapshot, snapshot_key)
+
+# A loaded snapshot, the object derived from it and the number of requests still using it
+class _Buffer:
+    def __init__(self, snapshot, value):
+        self.snapshot = snapshot
+        self.value = value
+        self.in_flight = 0
+
+# Double-buffered snapshot: requests lease the active buffer while a background thread rebuilds
+# the snapshot when the dataset changes and swaps the new one in. At most two snapshots are
+# resident: a new one is only built after requests on the previously retired one have finished
+class SnapshotReloader:
+    def __init__(self, json_path=SAMPLE_DATA_PATH, snapshot_dir=DEFAULT_SNAPSHOT_DIR, backend="exact", interval=30.0,
+                 model_factory=None, on_load=None):
+        self.json_path = json_path
+        self.snapshot_dir = snapshot_dir
+        self.backend = backend
+        self.interval = interval
+        self.model_factory = model_factory
+        # Encoder snapshots are built and checked with; None (also for load_model) leaves the default
+        # transformer model to build_snapshot, which only loads it when there is something to encode
+        self.model = None if model_factory in (None, load_model) else model_factory()
+        # Builds what requests actually use (e.g. a service object) from each loaded snapshot
+        self.on_load = on_load or (lambda snapshot: snapshot)
+        # Context managers entered with each newly loaded snapshot before it is swapped in and
+        # exited after the swap (see add_swap_hook)
+        self.swap_hooks = []
+        self.condition = threading.Condition()
+        self.reloading = threading.Lock()
+        self.active = self._load(load_or_build_snapshot(json_path, snapshot_dir, backend, self.model))
+        self.retired = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _load(self, snapshot):
+        return _Buffer(snapshot, self.on_load(snapshot))
+
+    # Register `hook(snapshot)`, a context manager factory: it is entered with every reloaded
+    # snapshot before that snapshot serves any request and exited once it is live, so state kept
+    # outside the snapshot (e.g. ingested profiles) can be applied to it without a gap
+    def add_swap_hook(self, hook):
+        self.swap_hooks.append(hook)
+
+    @property
+    def version(self):
+        return self.active.snapshot["version"]
+
+    # Use the active snapshot for one request; a swap during the request does not affect it
+    @contextmanager
+    def lease(self):
+        with self.condition:
+            buffer = self.active
+            buffer.in_flight += 1
+        try:
+            yield buffer.value
+        finally:
+            with self.condition:
+                buffer.in_flight -= 1
+                # Drop the retired buffer as soon as its last request is done
+                if buffer is self.retired and buffer.in_flight == 0:
+                    self.retired = None
+                self.condition.notify_all()
+
+    # True if the dataset, model or backend no longer match the active snapshot
+    def is_stale(self):
+        manifest = self.active.snapshot["manifest"]
+        return any(manifest.get(k) != v for k, v in snapshot_key(self.json_path, self.backend, self.model).items())
+
+    # True if another process has published a snapshot other than the active one
+    def has_newer(self):
+        path = current_snapshot(self.snapshot_dir)
+        return path is not None and os.path.basename(path) != self.version
+
+    # Rebuild (when `build` is set and the data changed) and swap in the published snapshot.
+    # Unchanged customers keep the previous snapshot's vectors, neighbour rows and table rows
+    def reload(self, build=True):
+        with self.reloading:
+            stale = build and self.is_stale()
+            if not stale and not self.has_newer():
+                return False
+            with metrics.stage("snapshot_reload"):
+                # Bound memory: wait until nothing uses the retired snapshot before making another
+                with self.condition:
+                    while self.retired is not None and self.retired.in_flight:
+                        self.condition.wait()
+                    self.retired = None
+                if stale:
+                    build_snapshot(self.json_path, self.snapshot_dir, self.backend, self.model)
+                standby = self._load(load_snapshot(current_snapshot(self.snapshot_dir)))
+                with ExitStack() as hooks:
+                    for hook in self.swap_hooks:
+                        hooks.enter_context(hook(standby.snapshot))
+                    with self.condition:
+                        self.retired, self.active = self.active, standby
+                        if self.retired.in_flight == 0:
+                            self.retired = None
+            return True
+
+    # Check for changes every `interval` seconds in a background thread; processes that only
+    # follow snapshots published by another process pass build=False
+    def start(self, build=True):
+        def run():
+            while not self.stop_event.wait(self.interval):
+                try:
+                    self.reload(build)
+                except Exception as e:
+                    print(f"Snapshot reload failed: {e}")
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
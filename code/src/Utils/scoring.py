@@ -0,0 +1,122 @@
+# Import required libraries
+import time
+import numpy as np
+from Utils.catalog import DEFAULT_CATALOG
+
+# Encode customer records into the arrays the vectorised scorer works on
+def encode_customers(customers, catalog=DEFAULT_CATALOG):
+    terms = {}
+    interest_pairs = []
+    category_col = {category: i for i, category in enumerate(catalog.categories)}
+    purchase_hot = np.zeros((len(customers), len(catalog.categories)), dtype=np.float32)
+    sentiment = np.empty(len(customers), dtype=np.float64)
+    engagement = np.empty(len(customers), dtype=np.float64)
+    for row, customer in enumerate(customers):
+        for interest in customer["Interests"]:
+            interest_pairs.append((row, terms.setdefault(interest, len(terms))))
+        for category in catalog.purchase_categories(customer["Purchase History"]):
+            purchase_hot[row, category_col[category]] = 1.0
+        sentiment[row] = customer["Sentiment Score"]
+        engagement[row] = customer["Engagement Score"]
+    interest_hot = np.zeros((len(customers), len(terms)), dtype=np.float32)
+    if interest_pairs:
+        rows, cols = zip(*interest_pairs)
+        interest_hot[list(rows), list(cols)] = 1.0
+    return {
+        "terms": list(terms),
+        "interest_hot": interest_hot,
+        "purchase_hot": purchase_hot,
+        "sentiment": sentiment,
+        "engagement": engagement,
+        "risk": assess_risk_vector(sentiment, engagement),
+    }
+
+# Vectorised version of assess_risk
+def assess_risk_vector(sentiment, engagement):
+    risk = np.zeros(len(sentiment), dtype=np.float64)
+    risk = risk + np.where(sentiment < -0.5, 0.3, 0.0)
+    risk = risk + np.where(engagement < 30, 0.2, 0.0)
+    return np.minimum(risk, 1.0)
+
+# Strategies whose candidates come from other customers' purchases and get the purchase-alignment bonus
+COLLABORATIVE_STRATEGIES = ("collaborative", "item")
+
+# Score every customer against every product (or the given product IDs) in one pass.
+# Adjustments are added in the same order as score_recommendation so results are bit-identical.
+def score_matrix(features, strategy="hybrid", product_ids=None, catalog=DEFAULT_CATALOG):
+    if product_ids is None:
+        product_ids = np.arange(len(catalog.products))
+    products = [catalog.products[i] for i in product_ids]
+    term_matrix = catalog.term_matrix(features["terms"], product_ids).astype(np.float32)
+    category_matrix = catalog.category_matrix()[:, product_ids].astype(np.float32)
+    insurance = np.array(["Insurance" in p for p in products], dtype=bool)
+
+    interest_match = (features["interest_hot"] @ term_matrix) > 0
+    category_match = (features["purchase_hot"] @ category_matrix) > 0
+    high_risk = (features["risk"] > 0.5)[:, None]
+    engaged = (features["engagement"] > 80)[:, None]
+    sentiment = features["sentiment"][:, None]
+
+    scores = np.full(interest_match.shape, 0.5)
+    scores = scores + np.where(interest_match, 0.3, -0.2)
+    if strategy == "contextual":
+        scores = scores + np.where(interest_match, 0.2, 0.0)
+    scores = scores + np.where(category_match, 0.15, 0.0)
+    if strategy in COLLABORATIVE_STRATEGIES:
+        scores = scores + np.where(category_match, 0.2, 0.0)
+    scores = scores + np.where(high_risk & insurance[None, :], 0.2, 0.0)
+    scores = scores + np.where(engaged, 0.1, 0.0)
+    scores = scores + np.where(sentiment > 0, 0.05 * sentiment, 0.0)
+    return np.clip(scores, 0.0, 1.0)
+
+# Pick the k best columns per row among the allowed ones, best first and ties broken by column.
+# Rows with fewer than k allowed columns are padded with -1.
+def select_top_k(scores, mask, k):
+    masked = np.where(mask, scores, -np.inf)
+    k = min(k, masked.shape[1])
+    if k == 0:
+        return np.empty((len(masked), 0), dtype=np.int64), np.empty((len(masked), 0))
+    # A stable sort of the whole row keeps tied columns in column order, so a row's top k never
+    # depends on the other rows of the matrix (a partition would keep an arbitrary subset of the
+    # columns tied at the cutoff); the catalog is small enough for a full sort
+    top = np.argsort(-masked, axis=1, kind="stable")[:, :k]
+    top_scores = np.take_along_axis(masked, top, axis=1)
+    top[np.isneginf(top_scores)] = -1
+    return top, top_scores
+
+# Compare the scalar score_recommendation loop with the vectorised scorer on random customers
+def benchmark(n_customers=2000, seed=0, catalog=DEFAULT_CATALOG, strategy="hybrid"):
+    from Utils.recommendations import score_recommendation, assess_risk
+
+    rng = np.random.default_rng(seed)
+    interests = list(catalog.interest_products)
+    customers = [{
+        "Interests": list(rng.choice(interests, 2, replace=False)),
+        "Purchase History": list(rng.choice(catalog.products, 2, replace=False)),
+        "Sentiment Score": round(float(rng.uniform(-1, 1)), 2),
+        "Engagement Score": int(rng.integers(0, 101)),
+    } for _ in range(n_customers)]
+
+    start = time.perf_counter()
+    scalar = np.array([[score_recommendation(p, c, assess_risk(c), strategy, catalog) for p in catalog.products] for c in customers])
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorised = score_matrix(encode_customers(customers, catalog), strategy, catalog=catalog)
+    vector_time = time.perf_counter() - start
+
+    return {
+        "customers": n_customers,
+        "products": len(catalog.products),
+        "identical": bool(np.array_equal(scalar, vectorised)),
+        "scalar_s": scalar_time,
+        "vectorised_s": vector_time,
+        "speedup": scalar_time / vector_time if vector_time else float("inf"),
+    }
+
+if __name__ == "__main__":
+    for strategy in ["hybrid", "collaborative", "contextual"]:
+        result = benchmark(strategy=strategy)
+        print(f"{strategy:>13}: {result['customers']} x {result['products']}  identical={result['identical']}  "
+              f"scalar={result['scalar_s'] * 1000:.1f} ms  vectorised={result['vectorised_s'] * 1000:.1f} ms  "
+              f"speedup={result['speedup']:.0f}x")
@@ -0,0 +1,494 @@
+# Import required libraries
+import json
+import os
+import queue
+import selectors
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from Utils import metrics
+from Utils.cohorts import SEGMENTS
+from Utils.recommendations import needs_encoder, recommend_products, recommend_new_customer
+
+# Strategies accepted by the endpoints
+STRATEGIES = {"hybrid", "collaborative", "item", "contextual"}
+
+# Requests served, by endpoint and HTTP status
+HTTP_REQUESTS = metrics.REGISTRY.counter("aidhp_http_requests_total", "HTTP requests served by endpoint and status")
+
+# Recommendations over artifacts loaded once per process, shared by all request threads
+class RecommendationService:
+    def __init__(self, snapshot, encoder_factory=None):
+        self.snapshot = snapshot
+        self.neighbor_index = snapshot["neighbor_index"]
+        self.catalog = snapshot["catalog"]
+        self.tables = snapshot["tables"]
+        self.item_index = snapshot["item_index"]
+        self.row_of = snapshot["row_of"]
+        self.encoder_factory = encoder_factory
+        self.encoder = None
+        self.encoder_lock = threading.Lock()
+
+    # Customer view; event ingestion publishes updated views instead of writing to it, so it is
+    # read from the snapshot each time
+    @property
+    def customers(self):
+        return self.snapshot["customers"]
+
+    # Encoder for new customers, created on first use so each worker process builds its own
+    def get_encoder(self):
+        if self.encoder is None and self.encoder_factory is not None:
+            with self.encoder_lock:
+                if self.encoder is None:
+                    self.encoder = self.encoder_factory()
+        return self.encoder
+
+    # Stored record of an existing customer
+    def customer(self, name):
+        if name not in self.row_of:
+            raise KeyError(f"Unknown customer {name!r}")
+        return self.customers.record(self.row_of[name])
+
+    # Number of customers whose name contains `query` (case-insensitive) and one page of their names
+    def search(self, query="", offset=0, limit=50):
+        store = self.customers.store
+        matches = store.search(query)
+        return len(matches), store.strings("Customer Name", matches[offset:offset + limit])
+
+    # Stored record and live revision of an existing customer
+    def profile(self, name):
+        record = self.customer(name)
+        return record, int(self.snapshot["revisions"][self.row_of[name]])
+
+    # Number of customers in a named segment and the records of the first `limit`
+    def segment(self, name, limit=50):
+        rows = self.snapshot["cohorts"].named_segment(name)
+        return len(rows), self.customers.records(rows[:limit])
+
+    # Recommendations for an existing customer; unknown customers are treated as new
+    def recommend(self, payload):
+        strategy = _strategy(payload)
+        customer_data = payload.get("customer_data")
+        if customer_data is None:
+            customer_data = self.customer(payload["customer_name"])
+        idx = self.row_of.get(customer_data["Customer Name"])
+        if idx is None:
+            return self.recommend_new(dict(payload, customer_data=customer_data))
+        return recommend_products(customer_data, self.customers, self.neighbor_index, strategy, idx=idx, catalog=self.catalog,
+                                  table=self.tables.get(strategy), item_index=self.item_index)
+
+    # Recommendations for a customer that is not in the dataset
+    def recommend_new(self, payload):
+        strategy = _strategy(payload)
+        encoder = self.get_encoder() if needs_encoder(strategy) else None
+        return recommend_new_customer(payload["customer_data"], None, self.catalog, self.customers, self.neighbor_index,
+                                      encoder, strategy, self.item_index)
+
+    # Recommendations for many payloads of one endpoint
+    def recommend_batch(self, payload):
+        handler = self.recommend_new if payload.get("endpoint") == "/recommend-new" else self.recommend
+        return [{"recommendations": handler(p)} for p in payload.get("requests", [])]
+
+# Gives every request the same service; SnapshotReloader offers the same lease() with hot reload
+class StaticLease:
+    def __init__(self, value):
+        self.value = value
+
+    @contextmanager
+    def lease(self):
+        yield self.value
+
+# Strategy of a request payload (validated by _payload_error)
+def _strategy(payload):
+    return payload.get("strategy", "hybrid")
+
+# Fields a customer record must have, with their accepted types
+CUSTOMER_FIELDS = {
+    "Customer Name": (str,), "Purchase History": (list,), "Sentiment Score": (int, float),
+    "Social Media Activity": (str,), "Age": (int, float), "Gender": (str,), "Interests": (list,),
+    "Engagement Score": (int, float),
+}
+
+# Why a customer record cannot be recommended for, or None
+def _customer_error(customer_data):
+    if not isinstance(customer_data, dict):
+        return "customer_data must be an object"
+    for field, types in CUSTOMER_FIELDS.items():
+        value = customer_data.get(field)
+        if not isinstance(value, types) or isinstance(value, bool):
+            return f"customer_data[{field!r}] is missing or not a {' or '.join(t.__name__ for t in types)}"
+        if isinstance(value, list) and not all(isinstance(item, str) for item in value):
+            return f"customer_data[{field!r}] must be a list of strings"
+    return None
+
+# Why the payload of a POST endpoint is invalid, or None. Only what this finds is answered with
+# 400; anything that fails after it is a server error (500), so clients and their circuit breakers
+# never take a server bug for a bad request
+def _payload_error(path, payload, service):
+    if not isinstance(payload, dict):
+        return "the request body must be a JSON object"
+    if path == "/recommend-batch":
+        if payload.get("endpoint", "/recommend") not in ("/recommend", "/recommend-new"):
+            return f"unknown batch endpoint {payload.get('endpoint')!r}"
+        if not isinstance(payload.get("requests", []), list):
+            return "requests must be a list"
+        for i, request in enumerate(payload.get("requests", [])):
+            error = _payload_error(payload.get("endpoint", "/recommend"), request, service)
+            if error:
+                return f"requests[{i}]: {error}"
+        return None
+    if payload.get("strategy", "hybrid") not in STRATEGIES:
+        return f"unknown strategy {payload.get('strategy')!r}"
+    if path == "/recommend" and payload.get("customer_data") is None:
+        if payload.get("customer_name") not in service.row_of:
+            return f"unknown customer {payload.get('customer_name')!r}"
+        return None
+    return _customer_error(payload.get("customer_data"))
+
+# Why the offset and limit query parameters of a paged request are invalid, or None
+def _page_error(query):
+    for name in ("offset", "limit"):
+        value = query.get(name, "0")
+        if not value.isdigit():
+            return f"{name} must be a non-negative integer, got {value!r}"
+    return None
+
+# JSON endpoints compatible with Utils.api_client, so the same client can call this server
+class RecommendationHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive; PooledHTTPServer parks idle connections, so `timeout` only bounds how
+    # long a started request may take to arrive
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+    # Headers and body go out in separate writes; without TCP_NODELAY the body of every response
+    # on a kept-alive connection waits for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        metrics.inc(HTTP_REQUESTS, endpoint=self.path.split("?")[0], status=status)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path, query = url.path, {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if path == "/health":
+            with self.server.services.lease() as service:
+                self._send(200, {"status": "ok", "customers": len(service.row_of), "pid": os.getpid()})
+        elif path in ("/customers", "/customer", "/segment", "/cohorts"):
+            # Browsing endpoints of a thin client; every response names the snapshot it came from
+            with self.server.services.lease() as service:
+                snapshot = service.snapshot
+                body = {"version": snapshot["version"], "revisions": int(snapshot["revisions"].sum())}
+                if path == "/cohorts":
+                    body.update(snapshot["cohorts"].summary())
+                elif path == "/customer":
+                    if query.get("name") not in service.row_of:
+                        self._send(404, {"error": f"unknown customer {query.get('name')!r}"})
+                        return
+                    body["customer"], body["revision"] = service.profile(query["name"])
+                else:
+                    error = _page_error(query)
+                    if path == "/segment" and query.get("name") not in SEGMENTS:
+                        error = f"unknown segment {query.get('name')!r}"
+                    if error:
+                        self._send(400, {"error": error})
+                        return
+                    offset, limit = int(query.get("offset", 0)), int(query.get("limit", 50))
+                    if path == "/segment":
+                        body["total"], body["customers"] = service.segment(query["name"], limit)
+                    else:
+                        body["total"], body["customers"] = service.search(query.get("query", ""), offset, limit)
+                self._send(200, body)
+        elif path == "/metrics":
+            self._send(200, metrics.export_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send(404, {"error": f"unknown endpoint {path}"})
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError as e:
+            self._send(400, {"error": f"invalid JSON body: {e}"})
+            return
+        try:
+            # The whole request runs against one snapshot, even if a reload swaps it meanwhile
+            with metrics.stage("http" + self.path), self.server.services.lease() as service:
+                routes = {"/recommend": service.recommend, "/recommend-new": service.recommend_new,
+                          "/recommend-batch": service.recommend_batch}
+                if self.path not in routes:
+                    self._send(404, {"error": f"unknown endpoint {self.path}"})
+                    return
+                error = _payload_error(self.path, payload, service)
+                if error:
+                    self._send(400, {"error": error})
+                    return
+                result = routes[self.path](payload)
+                self._send(200, {"results" if self.path == "/recommend-batch" else "recommendations": result})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        pass
+
+# HTTP server handing requests to a fixed pool of worker threads; `service` is a
+# RecommendationService or a SnapshotReloader producing them. A worker only holds a connection
+# while it serves a request: idle keep-alive connections are parked in a selector and handed back
+# to the pool when their next request arrives, so idle clients never starve active ones
+class PooledHTTPServer(HTTPServer):
+    # Listen backlog, so bursts of new connections queue instead of being reset
+    request_queue_size = 1024
+    # Seconds a parked keep-alive connection may stay idle before it is closed
+    idle_timeout = 30
+
+    def __init__(self, address, handler, service, workers=16):
+        super().__init__(address, handler)
+        self.services = service if hasattr(service, "lease") else StaticLease(service)
+        self.workers = workers
+        self.executor = None
+        self.selector = None
+        self.parked = queue.SimpleQueue()
+
+    # The pool and the selector are created lazily so they belong to the process that serves, not
+    # the one that forked it
+    def _start_pool(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.selector = selectors.DefaultSelector()
+        self.wakeup, self.waker = socket.socketpair()
+        self.selector.register(self.wakeup, selectors.EVENT_READ)
+        threading.Thread(target=self._watch_parked, daemon=True).start()
+
+    def process_request(self, request, client_address):
+        if self.executor is None:
+            self._start_pool()
+        self.executor.submit(self._open, request, client_address)
+
+    # Set up the handler of a new connection (what BaseRequestHandler.__init__ does, without
+    # handling every request of the connection in one go) and serve its first request
+    def _open(self, request, client_address):
+        handler = self.RequestHandlerClass.__new__(self.RequestHandlerClass)
+        handler.request, handler.client_address, handler.server = request, client_address, self
+        try:
+            handler.setup()
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        self._serve(handler)
+
+    # Serve the requests a connection has ready, then park it or close it
+    def _serve(self, handler):
+        try:
+            while True:
+                handler.close_connection = True
+                handler.handle_one_request()
+                if handler.close_connection:
+                    break
+                if not self._has_buffered(handler):
+                    handler.parked_at = time.monotonic()
+                    self.parked.put(handler)
+                    self.waker.send(b"\0")
+                    return
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+        self._close(handler)
+
+    # True if a request (e.g. a pipelined one) is already waiting, without blocking for one
+    def _has_buffered(self, handler):
+        handler.connection.setblocking(False)
+        try:
+            return bool(handler.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            handler.connection.settimeout(handler.timeout)
+
+    def _close(self, handler):
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+
+    # Watch parked connections: a readable one goes back to the pool, an idle one is closed
+    def _watch_parked(self):
+        last_sweep = time.monotonic()
+        while True:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self.wakeup:
+                    self.wakeup.recv(4096)
+                else:
+                    self.selector.unregister(key.fileobj)
+                    try:
+                        self.executor.submit(self._serve, key.data)
+                    except RuntimeError:
+                        # The pool was shut down: the process is exiting
+                        return
+            while True:
+                try:
+                    handler = self.parked.get_nowait()
+                except queue.Empty:
+                    break
+                self.selector.register(handler.connection, selectors.EVENT_READ, handler)
+            now = time.monotonic()
+            if now - last_sweep >= 1.0:
+                last_sweep = now
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None and now - key.data.parked_at > self.idle_timeout:
+                        self.selector.unregister(key.fileobj)
+                        self._close(key.data)
+
+# Start the server in a background thread of this process; port 0 picks a free port
+def start_server(service, host="127.0.0.1", port=0, workers=16):
+    server = PooledHTTPServer((host, port), RecommendationHandler, service, workers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+# Serve forever with `processes` forked workers sharing one listening socket; the artifacts are
+# loaded before forking, so memory-mapped arrays are shared between the processes. With a
+# SnapshotReloader the first process rebuilds changed data and the others follow its snapshots
+def serve(service, host="0.0.0.0", port=8000, workers=16, processes=1):
+    server = PooledHTTPServer((host, port), RecommendationHandler, service, workers)
+    reloader = service if hasattr(service, "start") else None
+    children = []
+    for _ in range(processes - 1):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                if reloader is not None:
+                    reloader.start(build=False)
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    if reloader is not None:
+        reloader.start(build=True)
+    try:
+        server.serve_forever()
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+# Fire `requests` recommend calls at a server from `concurrency` threads and report throughput
+def load_test(url, customer_names, requests=2000, concurrency=16, strategy="hybrid"):
+    from Utils.api_client import RecommendationClient
+
+    client = RecommendationClient("load-test", url, pool_size=concurrency, cache_ttl=0)
+    latencies = []
+
+    def call(i):
+        start = time.perf_counter()
+        client._post("/recommend", json.dumps({"customer_name": customer_names[i % len(customer_names)], "strategy": strategy}))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    seconds = time.perf_counter() - start
+    client.close()
+    latencies.sort()
+    return {
+        "requests": requests,
+        "qps": requests / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    from Utils.data_processing import SAMPLE_DATA_PATH
+    from Utils.snapshot import DEFAULT_SNAPSHOT_DIR, load_or_build_snapshot
+
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP without the Streamlit UI")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=16, help="worker threads per process")
+    parser.add_argument("--processes", type=int, default=1, help="forked server processes")
+    parser.add_argument("--data", default=SAMPLE_DATA_PATH, help="customer JSON dataset")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--backend", default="exact", help="neighbour index backend")
+    parser.add_argument("--no-encoder", action="store_true", help="recommend new customers from interests only")
+    parser.add_argument("--metrics", action="store_true", help="record metrics, served on GET /metrics")
+    parser.add_argument("--load-test", metavar="URL", help="load-test a running server instead of serving")
+    parser.add_argument("--requests", type=int, default=2000, help="requests sent by --load-test")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="concurrent clients for --load-test (default: the default --workers)")
+    parser.add_argument("--reload-interval", type=float, default=0,
+                        help="seconds between checks for a changed dataset to hot-reload (0: off)")
+    parser.add_argument("--shard-dir", help="search neighbours through local workers serving these shards")
+    parser.add_argument("--shard-worker", action="append", default=[], metavar="HOST:PORT",
+                        help="attach a running shard worker (repeatable)")
+    parser.add_argument("--events", metavar="NDJSON", help="apply customer events appended to this file")
+    parser.add_argument("--events-port", type=int, help="accept NDJSON customer events on this local port")
+    parser.add_argument("--checkpoint", metavar="JSON",
+                        help="write ingested profiles to this dataset file (use it as --data to reload from it)")
+    parser.add_argument("--checkpoint-interval", type=float, default=60,
+                        help="seconds between checkpoints of the ingested profiles")
+    args = parser.parse_args()
+    if args.checkpoint and os.path.abspath(args.checkpoint) == os.path.abspath(SAMPLE_DATA_PATH):
+        parser.error("--checkpoint must not overwrite the bundled sample dataset")
+    if args.checkpoint and not (args.events or args.events_port):
+        parser.error("--checkpoint needs --events or --events-port")
+    if (args.events or args.events_port) and args.processes > 1:
+        parser.error("event ingestion needs --processes 1 (each forked process would hold its own profiles)")
+    if (args.shard_dir or args.shard_worker) and args.processes > 1:
+        parser.error("sharded neighbour search needs --processes 1 (shard connections cannot be shared across forks)")
+    if args.shard_worker and not os.environ.get("SHARD_AUTHKEY"):
+        parser.error("--shard-worker needs SHARD_AUTHKEY set to the secret the workers were started with")
+    if (args.shard_dir or args.shard_worker) and args.reload_interval:
+        parser.error("hot reload does not rebuild shards; rebuild them with Utils.sharding instead")
+
+    if args.load_test:
+        snapshot = load_or_build_snapshot(args.data, args.snapshot_dir, args.backend)
+        result = load_test(args.load_test, snapshot["customers"].store.strings("Customer Name"), args.requests, args.concurrency)
+        print(f"{result['requests']} requests: {result['qps']:.0f} QPS, p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    else:
+        def encoder_factory():
+            from Utils.batch_encoder import MicroBatchEncoder
+            from Utils.embeddings import load_model
+            return MicroBatchEncoder(load_model().encode)
+
+        if args.metrics:
+            metrics.enable()
+        if args.reload_interval:
+            from Utils.embeddings import load_model
+            from Utils.reloader import SnapshotReloader
+
+            service = SnapshotReloader(args.data, args.snapshot_dir, args.backend, args.reload_interval, load_model,
+                                       lambda snapshot: RecommendationService(snapshot, None if args.no_encoder else encoder_factory))
+            description = f"snapshot {service.version} (reloading every {args.reload_interval:g}s)"
+        else:
+            snapshot = load_or_build_snapshot(args.data, args.snapshot_dir, args.backend)
+            if args.shard_dir or args.shard_worker:
+                from Utils.sharding import ShardedIndex, parse_address, spawn_local_workers
+
+                # Neighbour search goes through the shard coordinator instead of the snapshot's index
+                snapshot["neighbor_index"] = ShardedIndex()
+                authkey = snapshot["neighbor_index"].authkey
+                addresses = [address for _, address in spawn_local_workers(args.shard_dir, authkey=authkey)] if args.shard_dir else []
+                for address in addresses + [parse_address(a) for a in args.shard_worker]:
+                    snapshot["neighbor_index"].attach(address)
+            service = RecommendationService(snapshot, None if args.no_encoder else encoder_factory)
+            description = f"{len(service.row_of)} customers"
+        if args.events or args.events_port:
+            from Utils.ingestion import EventIngestor
+
+            ingestor = EventIngestor(service)
+            if args.events:
+                ingestor.consume_file(args.events)
+            if args.events_port:
+                ingestor.listen("127.0.0.1", args.events_port)
+            if args.checkpoint:
+                ingestor.start_checkpoints(args.checkpoint, args.checkpoint_interval)
+        print(f"Serving {description} on http://{args.host}:{args.port} "
+              f"({args.processes} process(es) x {args.workers} workers)")
+        serve(service, args.host, args.port, args.workers, args.processes)
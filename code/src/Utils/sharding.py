@@ -0,0 +1,267 @@
+# Import required libraries
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+import numpy as np
+from Utils import metrics
+from Utils.neighbors import NeighborIndex, build_index, load_index, merge_top_k, normalize_rows, save_index
+
+# Shared secret that coordinators and shard workers authenticate with, from SHARD_AUTHKEY. Workers
+# unpickle whatever an authenticated peer sends, so there is no built-in fallback: without the
+# variable, `generate` makes a random key (usable only by workers this process starts itself)
+# and otherwise this refuses
+def shard_authkey(generate=False):
+    key = os.environ.get("SHARD_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    if generate:
+        return os.urandom(32)
+    raise RuntimeError("Set SHARD_AUTHKEY to the secret shared by shard workers and coordinators")
+
+# Queries that had to skip a shard because none of its workers was reachable
+SHARD_UNAVAILABLE = metrics.REGISTRY.counter("aidhp_shard_unavailable_total", "Queries answered without an unreachable shard")
+
+# Write one shard: the index over a contiguous block of customers plus its global row range
+def write_shard(vectors, directory, name, start, backend="exact"):
+    shard_dir = os.path.join(directory, name)
+    save_index(build_index(vectors, backend), os.path.join(shard_dir, "index"))
+    with open(os.path.join(shard_dir, "shard.json"), 'w') as f:
+        json.dump({"name": name, "start": int(start), "stop": int(start + len(vectors)), "backend": backend}, f)
+    return shard_dir
+
+# Shards stored under a directory, ordered by the rows they cover
+def list_shards(directory):
+    shards = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, name, "shard.json")
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                shards.append(dict(json.load(f), path=os.path.join(directory, name)))
+    return sorted(shards, key=lambda shard: shard["start"])
+
+# Partition embeddings into n_shards contiguous shards
+def build_shards(embeddings, directory, n_shards=4, backend="exact"):
+    bounds = np.linspace(0, len(embeddings), n_shards + 1).astype(int)
+    return [write_shard(embeddings[a:b], directory, f"shard-{i:03d}", a, backend)
+            for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])) if b > a]
+
+# Add newly embedded customers as a new shard after the existing ones, leaving those untouched
+def append_shard(embeddings, directory, backend="exact"):
+    shards = list_shards(directory)
+    start = shards[-1]["stop"] if shards else 0
+    return write_shard(embeddings, directory, f"shard-{len(shards):03d}", start, backend)
+
+# Answer requests from one coordinator connection until it disconnects
+def _handle(conn, index, info):
+    with conn:
+        while True:
+            try:
+                op, *args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if op == "query":
+                    queries, k = args
+                    found, scores = index.query_batch(queries, k)
+                    result = (np.where(found >= 0, found + info["start"], -1), scores)
+                elif op == "vectors":
+                    result = np.asarray(index.vectors[np.asarray(args[0]) - info["start"]])
+                elif op == "info":
+                    result = info
+                else:
+                    raise ValueError(f"Unknown shard operation {op!r}")
+                conn.send(("ok", result))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+
+# Serve one shard on `address` until the process is stopped; `ready` receives the bound address.
+# Refuses to start without an authkey (given or from SHARD_AUTHKEY)
+def serve_shard(shard_dir, address=("127.0.0.1", 0), authkey=None, ready=None):
+    authkey = authkey or shard_authkey()
+    index = load_index(os.path.join(shard_dir, "index"))
+    with open(os.path.join(shard_dir, "shard.json"), 'r') as f:
+        info = json.load(f)
+    listener = Listener(address, authkey=authkey)
+    if ready is not None:
+        ready.put(listener.address)
+    while True:
+        try:
+            conn = listener.accept()
+        except (multiprocessing.AuthenticationError, OSError):
+            continue
+        threading.Thread(target=_handle, args=(conn, index, info), daemon=True).start()
+
+# Start one local worker process per shard (and replica), returning (process, address) pairs;
+# pass the coordinator's authkey (e.g. ShardedIndex.authkey) so it can attach them
+def spawn_local_workers(directory, replicas=1, authkey=None):
+    authkey = authkey or shard_authkey()
+    ready = multiprocessing.Queue()
+    workers = []
+    for shard in list_shards(directory):
+        for _ in range(replicas):
+            process = multiprocessing.Process(target=serve_shard, args=(shard["path"], ("127.0.0.1", 0), authkey, ready), daemon=True)
+            process.start()
+            workers.append((process, ready.get(timeout=60)))
+    return workers
+
+# Connection to one shard worker; calls are serialised because a connection is not thread-safe
+class ShardClient:
+    def __init__(self, address, authkey):
+        self.address = tuple(address)
+        self.conn = Client(self.address, authkey=authkey)
+        self.lock = threading.Lock()
+
+    def call(self, op, *args):
+        with self.lock:
+            self.conn.send((op, *args))
+            status, result = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"Shard worker {self.address} failed: {result}")
+        return result
+
+    def close(self):
+        self.conn.close()
+
+# Coordinator with the NeighborIndex interface: fans each query out to one worker per shard and
+# merges the per-shard top-K. Workers attach and detach at runtime; a shard keeps serving while
+# any of its replicas is attached. Without SHARD_AUTHKEY the index gets a random key, which only
+# workers started with spawn_local_workers(..., authkey=index.authkey) can use
+class ShardedIndex(NeighborIndex):
+    def __init__(self, authkey=None, max_workers=32):
+        self.authkey = authkey or shard_authkey(generate=True)
+        self.shards = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.vectors = _ShardVectors(self)
+
+    def __len__(self):
+        return max((shard["stop"] for shard in self.shards.values()), default=0)
+
+    # Connect a worker and register it as a replica of the shard it serves
+    def attach(self, address):
+        client = ShardClient(address, self.authkey)
+        info = client.call("info")
+        with self.lock:
+            shard = self.shards.setdefault(info["name"], dict(info, workers=[], turn=itertools.count()))
+            shard["workers"].append(client)
+        return info["name"]
+
+    # Disconnect a worker; the shard is dropped once its last replica is gone
+    def detach(self, address):
+        with self.lock:
+            for name, shard in list(self.shards.items()):
+                for client in [c for c in shard["workers"] if c.address == tuple(address)]:
+                    shard["workers"].remove(client)
+                    client.close()
+                if not shard["workers"]:
+                    del self.shards[name]
+
+    # Send a call to one replica of a shard, trying the others if it fails
+    def _call_shard(self, shard, op, *args):
+        workers = list(shard["workers"])
+        first = next(shard["turn"])
+        for i in range(len(workers)):
+            client = workers[(first + i) % len(workers)]
+            try:
+                return client.call(op, *args)
+            except (OSError, EOFError):
+                # A broken connection cannot be reused, so the worker is detached
+                self.detach(client.address)
+        raise ConnectionError(f"No reachable worker for {shard['name']}")
+
+    # Scatter the queries to every shard and gather the best k overall
+    def query_batch(self, queries, k):
+        queries = normalize_rows(queries)
+        with self.lock:
+            shards = list(self.shards.values())
+        futures = [self.executor.submit(self._call_shard, shard, "query", queries, k) for shard in shards]
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for future in futures:
+            try:
+                found, scores = future.result()
+            except ConnectionError:
+                metrics.inc(SHARD_UNAVAILABLE)
+                continue
+            best_idx, best_scores = merge_top_k(best_idx, best_scores, found, scores.astype(np.float32), k)
+        return best_idx, best_scores
+
+    def close(self):
+        with self.lock:
+            for shard in self.shards.values():
+                for client in shard["workers"]:
+                    client.close()
+            self.shards = {}
+        self.executor.shutdown(wait=False)
+
+# Row access to the normalised vectors held by the shard workers, so callers can keep using
+# neighbor_index.vectors[rows]; raises ConnectionError when a shard holding any of the rows is down
+class _ShardVectors:
+    def __init__(self, index):
+        self.index = index
+
+    def __getitem__(self, rows):
+        single = np.isscalar(rows)
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        out = None
+        covered = np.zeros(len(rows), dtype=bool)
+        with self.index.lock:
+            shards = list(self.index.shards.values())
+        try:
+            for shard in shards:
+                mask = (rows >= shard["start"]) & (rows < shard["stop"])
+                if mask.any():
+                    part = self.index._call_shard(shard, "vectors", rows[mask])
+                    if out is None:
+                        out = np.empty((len(rows), part.shape[1]), dtype=part.dtype)
+                    out[mask] = part
+                    covered |= mask
+            if not covered.all():
+                raise ConnectionError(f"No attached shard holds rows {rows[~covered].tolist()[:10]}")
+        except ConnectionError:
+            metrics.inc(SHARD_UNAVAILABLE)
+            raise
+        return out[0] if single else out
+
+# Parse "host:port" into a connection address
+def parse_address(value):
+    host, port = value.rsplit(":", 1)
+    return host, int(port)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or serve neighbour-search shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="partition embeddings into shards")
+    build.add_argument("--embeddings", help=".npy embeddings (default: the current snapshot's)")
+    build.add_argument("--out", required=True, help="shard directory")
+    build.add_argument("--shards", type=int, default=4)
+    build.add_argument("--backend", default="exact", help="index backend of each shard")
+    build.add_argument("--append", action="store_true", help="add the embeddings as a new shard instead")
+    serve = commands.add_parser("serve", help="serve one shard to coordinators")
+    serve.add_argument("shard_dir")
+    serve.add_argument("--listen", default="127.0.0.1:7000", help="host:port to listen on")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        path = args.embeddings
+        if path is None:
+            from Utils.snapshot import current_snapshot
+            path = os.path.join(current_snapshot(), "embeddings.npy")
+        embeddings = np.load(path, mmap_mode="r")
+        if args.append:
+            print(f"Wrote {append_shard(embeddings, args.out, args.backend)}")
+        else:
+            print(f"Wrote {len(build_shards(embeddings, args.out, args.shards, args.backend))} shards to {args.out}")
+    else:
+        try:
+            authkey = shard_authkey()
+        except RuntimeError as e:
+            parser.error(str(e))
+        print(f"Serving {args.shard_dir} on {args.listen}")
+        serve_shard(args.shard_dir, parse_address(args.listen), authkey)
@@ -0,0 +1,292 @@
+# Import required libraries
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+from Utils.catalog import ProductCatalog, DEFAULT_CATALOG
+from Utils.cohorts import CohortIndex
+from Utils.customer_store import CustomerStore, CustomerView, NameIndex, convert_json_to_store, source_signature
+from Utils.data_processing import preprocess_data, SAMPLE_DATA_PATH
+from Utils.embeddings import model_identity
+from Utils.file_lock import file_lock
+from Utils.item_cf import ItemCooccurrence
+from Utils.neighbors import load_index, save_index
+from Utils.rec_table import RecommendationTable, all_neighbors, load_tables, profile_fingerprints, update_neighbors
+
+# Strategies with a precomputed recommendation table
+TABLE_STRATEGIES = ["hybrid", "collaborative", "contextual"]
+
+# Bump when the snapshot layout changes so old snapshots are rebuilt instead of misread
+SNAPSHOT_FORMAT = 6
+
+# Default location of the prebuilt artifact snapshots
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "snapshots")
+
+# Number of old snapshot versions kept next to the current one
+KEEP_VERSIONS = 1
+
+# Settings a snapshot must match to be reused; `model` is the encoder it is built with (None for the
+# default transformer model)
+def snapshot_key(json_path, backend, model=None):
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "source": source_signature(json_path),
+        **model_identity(model),
+        "backend": backend,
+    }
+
+# Share of changed customers above which an approximate index is retrained instead of reusing
+# the previous snapshot's centroids
+RETRAIN_FRACTION = 0.1
+
+# Customers to encode from which a build runs the multi-process embedding pipeline instead of encoding
+# them in the building process
+PIPELINE_MIN_ROWS = 50000
+
+# Output of the embedding pipeline (python -m Utils.embedding_pipeline --out <snapshot dir>/embeddings.npy)
+# that builds read instead of encoding, when it was run over the same dataset with the same model
+PIPELINE_EMBEDDINGS = "embeddings.npy"
+
+# Neighbours per customer kept in the snapshot (the collaborative candidates' similar users)
+NEIGHBORS_K = 3
+
+# Build a versioned snapshot of customers, embeddings, neighbour index, item co-occurrence and catalog.
+# When the previous snapshot was built with the same model and backend, unchanged customers keep
+# its vectors and neighbour rows (exact backend) and an IVF index keeps its centroids, so only the
+# customers whose profile changed are encoded and queried again.
+# Builds into one directory are serialised by a lock file; a build that waited for another one
+# returns that build's version when it already matches the dataset, model and backend
+def build_snapshot(json_path=SAMPLE_DATA_PATH, snapshot_dir=DEFAULT_SNAPSHOT_DIR, backend="exact", model=None):
+    with file_lock(os.path.join(snapshot_dir, ".lock")):
+        key = snapshot_key(json_path, backend, model)
+        previous = current_snapshot(snapshot_dir)
+        if previous is not None:
+            with open(os.path.join(previous, "manifest.json"), 'r') as f:
+                manifest = json.load(f)
+            if all(manifest.get(k) == v for k, v in key.items()):
+                return manifest["version"]
+            if any(manifest.get(k) != v for k, v in key.items() if k != "source"):
+                previous = None
+        return _build_snapshot(json_path, snapshot_dir, backend, model, key, previous)
+
+# Snapshot version: build time to the microsecond, then the building process and the settings digest,
+# so versions sort by build time and two builds never share a directory
+def _new_version(key):
+    now = time.time()
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now % 1 * 1e6):06d}-{os.getpid()}-{digest}"
+
+# Build a snapshot under the build lock, reusing `previous` (a compatible snapshot directory or None)
+def _build_snapshot(json_path, snapshot_dir, backend, model, key, previous):
+    from Utils.embeddings import get_neighbor_index
+
+    version = _new_version(key)
+    # Nothing else builds while the lock is held, so any leftover .tmp directory is from a crashed build
+    for name in os.listdir(snapshot_dir):
+        if name.endswith(".tmp") and os.path.isdir(os.path.join(snapshot_dir, name)):
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+    tmp_dir = os.path.join(snapshot_dir, version + ".tmp")
+    os.makedirs(tmp_dir)
+
+    # Customers, matched to their rows in the previous snapshot by name
+    store = convert_json_to_store(json_path, os.path.join(tmp_dir, "customers"))
+    df = store.to_dataframe()
+    profile_fp = profile_fingerprints(df)
+    np.save(os.path.join(tmp_dir, "profile_fp.npy"), profile_fp)
+    previous_rows = np.full(len(df), -1, dtype=np.int64)
+    unchanged = np.zeros(len(df), dtype=bool)
+    if previous is not None:
+        previous_row_of = {name: i for i, name in enumerate(CustomerStore(os.path.join(previous, "customers")).strings("Customer Name"))}
+        previous_rows = np.array([previous_row_of.get(name, -1) for name in df["Customer Name"].tolist()], dtype=np.int64)
+        known = previous_rows >= 0
+        unchanged[known] = np.load(os.path.join(previous, "profile_fp.npy"))[previous_rows[known]] == profile_fp[known]
+
+    # Embeddings: copied for unchanged customers, encoded for the rest
+    embeddings = None
+    changed = np.flatnonzero(~unchanged)
+    from_pipeline = False
+    if len(changed):
+        fresh, from_pipeline = _encode_changed(json_path, snapshot_dir, store, df, changed, model, key)
+        embeddings = np.empty((len(df), fresh.shape[1]), dtype=np.float32)
+        embeddings[changed] = fresh
+    if len(changed) < len(df):
+        previous_embeddings = np.load(os.path.join(previous, "embeddings.npy"), mmap_mode="r")
+        if embeddings is None:
+            embeddings = np.empty((len(df), previous_embeddings.shape[1]), dtype=np.float32)
+        embeddings[unchanged] = previous_embeddings[previous_rows[unchanged]]
+    np.save(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+
+    # Neighbour index; an IVF index keeps the previous centroids while few customers changed
+    index_options = {}
+    if previous is not None and backend == "ivf" and len(changed) <= RETRAIN_FRACTION * len(df):
+        index_options["centroids"] = np.load(os.path.join(previous, "index", "centroids.npy"))
+    neighbor_index = get_neighbor_index(embeddings, backend, **index_options)
+    save_index(neighbor_index, os.path.join(tmp_dir, "index"))
+
+    # Every customer's neighbours, computed once and shared by every table that uses them
+    if previous is not None and backend == "exact":
+        previous_neighbors = np.load(os.path.join(previous, "neighbors.npy"), mmap_mode="r")
+        neighbors = update_neighbors(neighbor_index, previous_neighbors, previous_rows, unchanged, NEIGHBORS_K)
+    else:
+        neighbors = all_neighbors(neighbor_index, len(df), NEIGHBORS_K)
+    np.save(os.path.join(tmp_dir, "neighbors.npy"), neighbors)
+
+    # Catalog with every purchased product interned, so product IDs are stable across processes
+    catalog = ProductCatalog.from_dict(DEFAULT_CATALOG.to_dict())
+    for purchases in df["Purchase History"]:
+        for product in purchases:
+            catalog.intern(product)
+    with open(os.path.join(tmp_dir, "catalog.json"), 'w') as f:
+        json.dump(catalog.to_dict(), f)
+
+    # Item-to-item co-occurrence of purchases for the item strategy
+    item_index = ItemCooccurrence.from_histories(df["Purchase History"])
+    item_index.save(os.path.join(tmp_dir, "item_cf"))
+
+    # Recommendation tables, carrying forward the previous snapshot's rows that are still valid
+    previous_tables = load_tables(os.path.join(previous, "tables")) if previous else {}
+    for strategy in TABLE_STRATEGIES:
+        RecommendationTable.build(os.path.join(tmp_dir, "tables", strategy), df, neighbors, strategy, catalog=catalog,
+                                  previous=previous_tables.get(strategy), previous_rows=previous_rows,
+                                  profile_fp=profile_fp)
+
+    with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+        json.dump(dict(key, version=version, rows=len(df), encoded=int(len(changed)), pipeline=from_pipeline), f)
+    os.replace(tmp_dir, os.path.join(snapshot_dir, version))
+    _set_current(snapshot_dir, version)
+    return version
+
+# Vectors of the `changed` rows and whether they came from the multi-process embedding pipeline: read
+# from a finished pipeline run over this dataset and model left at <snapshot_dir>/embeddings.npy,
+# produced by running the pipeline now when many customers changed, or else encoded in this process
+def _encode_changed(json_path, snapshot_dir, store, df, changed, model, key):
+    from Utils.embedding_pipeline import encode_dataset, finished_embeddings, progress_path
+    from Utils.embeddings import load_model, load_embedding_cache, get_embeddings
+
+    pipeline_path = os.path.join(snapshot_dir, PIPELINE_EMBEDDINGS)
+    identity = {"model_name": key["model_name"], "model_version": key["model_version"]}
+    vectors = finished_embeddings(pipeline_path, json_path, identity)
+    if vectors is not None:
+        return np.asarray(vectors[changed], dtype=np.float32), True
+    # The pipeline's workers load the model themselves, which they can only do for the default model
+    if model is None and len(changed) >= PIPELINE_MIN_ROWS:
+        encode_dataset(json_path, pipeline_path, store.store_dir)
+        fresh = np.asarray(np.load(pipeline_path, mmap_mode="r")[changed], dtype=np.float32)
+        # Every vector is in the snapshot now; a killed build would have resumed from these files
+        os.remove(progress_path(pipeline_path))
+        os.remove(pipeline_path)
+        return fresh, True
+    changed_df = preprocess_data(df.iloc[changed].reset_index(drop=True))
+    return get_embeddings(changed_df, model or load_model(), cache=load_embedding_cache(model)), False
+
+# Point CURRENT at a snapshot version atomically and prune older versions
+def _set_current(snapshot_dir, version):
+    tmp_path = os.path.join(snapshot_dir, "CURRENT.tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(snapshot_dir, "CURRENT"))
+    versions = sorted(v for v in os.listdir(snapshot_dir)
+                      if os.path.isdir(os.path.join(snapshot_dir, v)) and not v.endswith(".tmp") and v != version)
+    for old in versions[:len(versions) - KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+
+# Directory of the current snapshot, or None if there is none yet
+def current_snapshot(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT"), 'r') as f:
+            path = os.path.join(snapshot_dir, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return path if os.path.isdir(path) else None
+
+# Open a snapshot, memory-mapping its arrays. Customers stay in the mapped columns of the store and
+# are decoded row by row as requests read them
+def load_snapshot(path):
+    with open(os.path.join(path, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+    with open(os.path.join(path, "catalog.json"), 'r') as f:
+        catalog = ProductCatalog.from_dict(json.load(f))
+    store = CustomerStore(os.path.join(path, "customers"))
+    return {
+        "version": manifest["version"],
+        "manifest": manifest,
+        "customers": CustomerView(store),
+        # Name -> row lookups through the store's sorted name hashes, so they never scan the names
+        "row_of": NameIndex(store),
+        # Live profile updates applied per customer since the snapshot was loaded
+        "revisions": np.zeros(len(store), dtype=np.int64),
+        "embeddings": np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r"),
+        "neighbor_index": load_index(os.path.join(path, "index")),
+        # Every customer's NEIGHBORS_K nearest customers, as used by the recommendation tables
+        "neighbors": np.load(os.path.join(path, "neighbors.npy"), mmap_mode="r"),
+        "catalog": catalog,
+        "tables": load_tables(os.path.join(path, "tables")),
+        "item_index": ItemCooccurrence.load(os.path.join(path, "item_cf")),
+        # Whole-base percentiles, segment counts and segment queries for the insights views
+        "cohorts": CohortIndex.from_store(store),
+    }
+
+# Load the current snapshot if it matches the dataset and model, otherwise build a new one first
+def load_or_build_snapshot(json_path=SAMPLE_DATA_PATH, snapshot_dir=DEFAULT_SNAPSHOT_DIR, backend="exact", model=None):
+    path = current_snapshot(snapshot_dir)
+    if path is not None:
+        with open(os.path.join(path, "manifest.json"), 'r') as f:
+            manifest = json.load(f)
+        if all(manifest.get(k) == v for k, v in snapshot_key(json_path, backend, model).items()):
+            return load_snapshot(path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    build_snapshot(json_path, snapshot_dir, backend, model)
+    return load_snapshot(current_snapshot(snapshot_dir))
+
+# Startup code of the original pipeline and of the snapshot path, for time-to-first-render comparison
+STARTUP_SCRIPTS = {
+    "pipeline": (
+        "import streamlit, plotly.express, sklearn.metrics.pairwise\n"
+        "from Utils.data_processing import load_sample_data, preprocess_data\n"
+        "from Utils.embeddings import load_model, get_embeddings, get_neighbor_index\n"
+        "df = load_sample_data(); get_neighbor_index(get_embeddings(preprocess_data(df), load_model()))\n"
+    ),
+    "snapshot": (
+        "import streamlit\n"
+        "from Utils.snapshot import load_or_build_snapshot\n"
+        "load_or_build_snapshot()\n"
+    ),
+}
+
+# Time each startup script in a fresh interpreter, best of `repeat` runs
+def measure_startup(repeat=3):
+    cwd = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    results = {}
+    for name, script in STARTUP_SCRIPTS.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True)
+            timings.append(time.perf_counter() - start)
+            if completed.returncode != 0:
+                results[name] = {"error": completed.stderr.strip().splitlines()[-1]}
+                break
+        else:
+            results[name] = {"seconds": min(timings)}
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the startup artifact snapshot")
+    parser.add_argument("--data", default=SAMPLE_DATA_PATH, help="customer JSON dataset")
+    parser.add_argument("--out", default=DEFAULT_SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--backend", default="exact", help="neighbour index backend")
+    parser.add_argument("--measure", action="store_true", help="compare time-to-first-render with and without a snapshot")
+    args = parser.parse_args()
+
+    if args.measure:
+        for name, result in measure_startup().items():
+            print(f"{name:>9}: " + (f"{result['seconds']:.2f}s" if "seconds" in result else f"failed ({result['error']})"))
+    else:
+        os.makedirs(args.out, exist_ok=True)
+        print(f"Built snapshot {build_snapshot(args.data, args.out, args.backend)} in {args.out}")
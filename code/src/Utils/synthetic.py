@@ -0,0 +1,75 @@
+# Import required libraries
+import json
+import numpy as np
+from Utils.catalog import INTEREST_PRODUCTS, CATEGORY_PRODUCTS
+
+# Name parts combined into unique synthetic customer names
+FIRST_NAMES = ["Aisha", "Ethan", "Sofia", "Liam", "Nia", "Mateo", "Priya", "Noah", "Yuki", "Omar",
+               "Elena", "Kwame", "Chloe", "Ravi", "Zara", "Lucas", "Amara", "Jonas", "Mei", "Diego"]
+LAST_NAMES = ["Malik", "Carter", "Rodriguez", "Harper", "Thompson", "Silva", "Patel", "Kim", "Tanaka", "Haddad",
+              "Novak", "Mensah", "Dubois", "Iyer", "Okafor", "Rossi", "Berg", "Chen", "Lopez", "Walsh"]
+
+# Named dataset sizes for the benchmark suite
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Generate customers matching the sample_data.json schema, reproducibly for a given seed
+def generate_customers(n, seed=0, chunk_size=10000):
+    rng = np.random.default_rng(seed)
+    interests = list(INTEREST_PRODUCTS)
+    products = sorted({p for items in CATEGORY_PRODUCTS.values() for p in items})
+    # Skewed popularity so some interests and products dominate, like real data
+    interest_p = 1.0 / np.arange(1, len(interests) + 1)
+    interest_p /= interest_p.sum()
+    product_p = 1.0 / np.arange(1, len(products) + 1) ** 0.8
+    product_p /= product_p.sum()
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        sentiment = np.round(np.clip(rng.normal(0.2, 0.5, size), -1, 1), 2)
+        engagement = np.clip(rng.normal(60, 20, size), 0, 100).astype(int)
+        age = rng.integers(18, 75, size)
+        social = rng.choice(["Low", "Medium", "High"], size, p=[0.3, 0.45, 0.25])
+        gender = rng.choice(["Male", "Female"], size)
+        n_purchases = rng.integers(1, 5, size)
+        n_interests = rng.integers(1, 4, size)
+        for i in range(size):
+            row = start + i
+            yield {
+                "Customer Name": f"{FIRST_NAMES[row % len(FIRST_NAMES)]} {LAST_NAMES[(row // len(FIRST_NAMES)) % len(LAST_NAMES)]} {row}",
+                "Purchase History": rng.choice(products, n_purchases[i], replace=False, p=product_p).tolist(),
+                "Sentiment Score": float(sentiment[i]),
+                "Social Media Activity": str(social[i]),
+                "Age": int(age[i]),
+                "Gender": str(gender[i]),
+                "Interests": rng.choice(interests, n_interests[i], replace=False, p=interest_p).tolist(),
+                "Engagement Score": int(engagement[i]),
+            }
+
+# Stream generated customers to a JSON array file, or NDJSON when the path ends in .ndjson/.jsonl
+def write_dataset(path, n, seed=0):
+    ndjson = path.endswith((".ndjson", ".jsonl"))
+    with open(path, 'w') as f:
+        if not ndjson:
+            f.write("[\n")
+        for i, customer in enumerate(generate_customers(n, seed)):
+            if i and not ndjson:
+                f.write(",\n")
+            f.write(json.dumps(customer))
+            if ndjson:
+                f.write("\n")
+        if not ndjson:
+            f.write("\n]\n")
+    return path
+
+# Parse a row count such as 10000, 10k, 100k or 1m
+def parse_size(value):
+    return SIZES.get(value.lower()) or int(value)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic customers with the sample_data.json schema")
+    parser.add_argument("rows", type=parse_size, help="number of customers, e.g. 10k, 100k, 1m")
+    parser.add_argument("--out", required=True, help="output .json or .ndjson path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"Wrote {args.rows} customers to {write_dataset(args.out, args.rows, args.seed)}")
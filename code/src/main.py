@@ -1,9 +1,10 @@
 # Import required libraries and modules
 import streamlit as st
-import pandas as pd
-from Utils.data_processing import preprocess_data, load_sample_data
-from Utils.embeddings import load_model, get_embeddings, get_similarity_matrix
-from Utils.recommendations import recommend_products, recommend_new_customer, plot_customer_insights
+from Utils import metrics
+from Utils.reloader import SnapshotReloader
+from Utils.batch_encoder import MicroBatchEncoder
+from Utils.api_client import get_client, TTLCache
+from Utils.recommendations import needs_encoder, recommend_products, recommend_new_customer, plot_customer_insights
 
 # Configure Streamlit page settings
 st.set_page_config(
@@ -15,13 +16,78 @@ st.set_page_config(
 # Cache resource to load and process data efficiently
 @st.cache_resource
 def load_all_data():
-    # Load and preprocess customer data, generate embeddings and similarity matrix
-    df = load_sample_data()
-    processed_df = preprocess_data(df)
-    model = load_model()
-    embeddings = get_embeddings(processed_df, model)
-    similarity_matrix = get_similarity_matrix(embeddings)
-    return df, processed_df, model, embeddings, similarity_matrix
+    # Map the prebuilt snapshot of customers, embeddings, neighbour index and catalog;
+    # it is only rebuilt (loading the model) when the dataset or model changed. A background
+    # reloader rebuilds it when the dataset changes and swaps it in without a restart
+    with metrics.stage("load_all_data"):
+        reloader = SnapshotReloader(
+            backend=st.secrets.get("neighbor_backend", "exact"),
+            interval=float(st.secrets.get("reload_interval", 30))
+        )
+    return reloader.start()
+
+# Load the transformer model only when something needs to encode text
+@st.cache_resource
+def get_model():
+    from Utils.embeddings import load_model
+    return load_model()
+
+# Shared encoder that micro-batches concurrent new-customer requests into one model.encode call
+@st.cache_resource
+def get_encoder():
+    return MicroBatchEncoder(
+        get_model().encode,
+        max_batch_size=int(st.secrets.get("encoder_max_batch_size", 32)),
+        max_wait=float(st.secrets.get("encoder_max_wait", 0.01))
+    )
+
+# Expose Prometheus metrics when a metrics_port is configured (one server per process)
+@st.cache_resource
+def start_metrics():
+    port = st.secrets.get("metrics_port")
+    return metrics.start_metrics_server(int(port)) if port else None
+
+# Apply live customer events (NDJSON file and/or local socket) to the loaded snapshots when configured
+@st.cache_resource
+def start_ingestion():
+    events_path, events_port = st.secrets.get("events_path"), st.secrets.get("events_port")
+    if not events_path and not events_port:
+        return None
+    from Utils.ingestion import EventIngestor
+
+    ingestor = EventIngestor(load_all_data())
+    if events_path:
+        ingestor.consume_file(events_path)
+    if events_port:
+        ingestor.listen("127.0.0.1", int(events_port))
+    return ingestor
+
+# Show the stages and events of the last request when instrumentation is on
+def show_trace(trace):
+    if trace is not None:
+        with st.expander("Request trace"):
+            st.json(trace.to_dict())
+
+# Customers listed per page of the sidebar picker
+PAGE_SIZE = 50
+
+# Per-session LRU memo of search results, recommendations and figures. Keys include the snapshot
+# version (and the customer's live revision), so reloads and ingested events never serve results
+# computed from older data
+def session_memo():
+    if "memo" not in st.session_state:
+        st.session_state["memo"] = TTLCache(ttl=float("inf"), max_entries=int(st.secrets.get("memo_entries", 256)))
+    return st.session_state["memo"]
+
+# Memoised value of `compute` for `key`, computed on the first view only
+def memoized(key, compute):
+    memo = session_memo()
+    value = memo.get(key)
+    metrics.inc(metrics.CACHE_REQUESTS, cache="session", result="miss" if value is None else "hit")
+    if value is None:
+        value = compute()
+        memo.set(key, value)
+    return value
 
 # Get API key from secrets.toml
 try:
@@ -29,22 +95,154 @@ try:
 except KeyError:
     API_KEY = None
 
+# Optional headless recommendation server (python -m Utils.server); when set the UI is a thin client:
+# it loads no snapshot and asks the server for customers, aggregates and recommendations
+SERVER_URL = st.secrets.get("server_url")
+
+# What the UI renders, read from a snapshot loaded in this process
+class LocalData:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot["version"]
+        # Ingested events change profiles without a new version; memo keys follow their total
+        self.revisions = int(snapshot["revisions"].sum())
+
+    # Number of customers whose name contains `query` and the names in [offset, offset + limit)
+    def search(self, query, offset, limit):
+        store = self.snapshot["customers"].store
+        matches = memoized(("search", query.lower(), self.version), lambda: store.search(query))
+        return len(matches), store.strings("Customer Name", matches[offset:offset + limit])
+
+    # A customer's record and the live revision of the profile
+    def customer(self, name):
+        row = self.snapshot["row_of"][name]
+        return self.snapshot["customers"].record(row), int(self.snapshot["revisions"][row])
+
+    # Cohort aggregates for the insights chart
+    def cohorts(self):
+        return self.snapshot["cohorts"]
+
+    def cohort_summary(self):
+        return memoized(("cohorts", self.version, self.revisions), self.snapshot["cohorts"].summary)
+
+    # Number of customers in a named segment and the records of the first `limit`
+    def segment(self, name, limit):
+        rows = self.snapshot["cohorts"].named_segment(name)
+        return len(rows), self.snapshot["customers"].records(rows[:limit])
+
+    def recommend(self, customer_data, strategy):
+        snapshot = self.snapshot
+        return recommend_products(customer_data, snapshot["customers"], snapshot["neighbor_index"], strategy, API_KEY,
+                                  idx=snapshot["row_of"][customer_data["Customer Name"]], catalog=snapshot["catalog"],
+                                  table=snapshot["tables"].get(strategy), item_index=snapshot["item_index"])
+
+    # The model is only loaded for strategies that embed the new customer
+    def recommend_new(self, customer_data, strategy):
+        snapshot = self.snapshot
+        return recommend_new_customer(customer_data, API_KEY, snapshot["catalog"], snapshot["customers"], snapshot["neighbor_index"],
+                                      get_encoder() if needs_encoder(strategy) else None, strategy, snapshot["item_index"])
+
+# What the UI renders, read from the recommendation server. Responses carry the server's snapshot
+# version and revision total, which key the session memo
+class RemoteData:
+    def __init__(self, client):
+        self.client = client
+        state = client.customers(limit=0)
+        self.version, self.revisions = state["version"], state["revisions"]
+
+    def search(self, query, offset, limit):
+        page = self.client.customers(query, offset, limit)
+        return page["total"], page["customers"]
+
+    def customer(self, name):
+        profile = self.client.customer(name)
+        return profile["customer"], profile["revision"]
+
+    def cohorts(self):
+        from Utils.cohorts import CohortSummary
+        return CohortSummary(self.cohort_summary())
+
+    def cohort_summary(self):
+        return memoized(("cohorts", self.version, self.revisions), self.client.cohorts)
+
+    def segment(self, name, limit):
+        segment = self.client.segment(name, limit)
+        return segment["total"], segment["customers"]
+
+    def recommend(self, customer_data, strategy):
+        return self.client.recommend(customer_data, strategy)
+
+    def recommend_new(self, customer_data, strategy):
+        return self.client.recommend_new(customer_data, strategy)
+
+# Client of the recommendation server. It sends the optional server_token, never the API key, and
+# caches nothing: the session memo already keys results by the server's snapshot version and
+# revisions, so reloads and ingested events show up on the next run
+def get_server_client():
+    return get_client(st.secrets.get("server_token", ""), SERVER_URL, cache_ttl=0)
+
+# Searchable, paginated customer picker; only one page of names is decoded and reaches the browser.
+# Returns the selected customer's name, or None when nothing matches
+def pick_customer(data):
+    query = st.text_input("Search customers", key="customer_query").strip()
+    total, _ = data.search(query, 0, 0)
+    if total == 0:
+        st.warning("No customers match the search")
+        return None
+    pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    # One page counter per query, so a narrower search starts again from page 1
+    page = st.number_input(f"Page (of {pages})", 1, pages, 1, key=f"customer_page:{query}") if pages > 1 else 1
+    _, page_names = data.search(query, (page - 1) * PAGE_SIZE, PAGE_SIZE)
+    st.caption(f"{total} matching customers")
+    return st.selectbox("Select Customer", page_names)
+
+# Percentiles, segment counts and named segments of the whole customer base
+def show_cohorts(data):
+    from Utils.cohorts import SEGMENTS
+
+    summary = data.cohort_summary()
+    with st.expander(f"📊 Customer Base Insights ({summary['customers']} customers)"):
+        st.table({metric.title(): {f"p{q}": f"{v:.2f}" for q, v in values.items()} for metric, values in summary["percentiles"].items()})
+        count_cols = st.columns(3)
+        for col, (title, key) in zip(count_cols, [("Top interests", "interest"), ("Age bands", "age_band"), ("Social activity", "social")]):
+            with col:
+                st.markdown(f"**{title}**")
+                st.bar_chart(dict(list(summary["counts"][key].items())[:10]))
+        segment = st.selectbox("Segment", list(SEGMENTS), key="cohort_segment")
+        total, records = data.segment(segment, PAGE_SIZE)
+        st.markdown(f"**{total}** customers ({100 * total / max(1, summary['customers']):.1f}%)")
+        st.dataframe([{field: record[field] for field in ["Customer Name", "Age", "Sentiment Score", "Engagement Score", "Social Media Activity"]}
+                      for record in records], hide_index=True)
+
 def main():
+    start_metrics()
+    if SERVER_URL:
+        import requests
+        from Utils.api_client import CircuitOpenError
+
+        try:
+            render(RemoteData(get_server_client()))
+        except (requests.RequestException, CircuitOpenError) as e:
+            st.error(f"Recommendation server {SERVER_URL} is unavailable: {e}")
+        return
+    # Render the whole run from one snapshot, even if a reload swaps in a newer one meanwhile
+    with load_all_data().lease() as snapshot:
+        start_ingestion()
+        render(LocalData(snapshot))
+
+def render(data):
     # Set up page title and description
     st.title("🚀 AI-Driven Hyper-Personalization System")
     st.markdown("**Next-Gen Recommendation Engine**  \n*Combining collaborative filtering with AI-powered insights*")
     
-    # Load all required data
-    df, processed_df, model, embeddings, similarity_matrix = load_all_data()
-    
     # Create sidebar for user inputs
     with st.sidebar:
         st.header("Existing Customer Selection")
-        customer_name = st.selectbox("Select Customer", df["Customer Name"])
+        customer_name = pick_customer(data)
         
         st.header("Configuration")
         strategy = st.radio("Recommendation Strategy", 
-                          ["Hybrid (Recommended)", "Collaborative Filtering", "Contextual"])
+                          ["Hybrid (Recommended)", "Collaborative Filtering", "Item Co-occurrence", "Contextual"])
         
         # Show API status
         if API_KEY:
@@ -53,31 +251,40 @@ def main():
             st.info("Using enhanced simulated responses since API key is not found...!")
     
     # Create two-column layout for customer profile and recommendations
-    col1, col2 = st.columns([1, 2])
+    if customer_name is not None:
+        col1, col2 = st.columns([1, 2])
     
-    # Display customer profile in first column
-    with col1:
-        st.subheader("👤 Existing Customer Profile")
-        customer_data = df[df["Customer Name"] == customer_name].iloc[0].to_dict()
+        # Display customer profile in first column
+        with col1:
+            st.subheader("👤 Existing Customer Profile")
+            customer_data, revision = data.customer(customer_name)
         
-        # Show customer details in markdown format
-        st.markdown(f"- **Age:** {customer_data['Age']}\n- **Gender:** {customer_data['Gender']}\n- **Interests:** {', '.join(customer_data['Interests'])}\n- **Engagement Score:** {customer_data['Engagement Score']}/100\n- **Sentiment:** {'😊 Positive' if customer_data['Sentiment Score'] > 0 else '😞 Negative'}\n- **Social Media:** {customer_data['Social Media Activity']}")
-        st.plotly_chart(plot_customer_insights(customer_data), use_container_width=True)
+            # Show customer details in markdown format
+            st.markdown(f"- **Age:** {customer_data['Age']}\n- **Gender:** {customer_data['Gender']}\n- **Interests:** {', '.join(customer_data['Interests'])}\n- **Engagement Score:** {customer_data['Engagement Score']}/100\n- **Sentiment:** {'😊 Positive' if customer_data['Sentiment Score'] > 0 else '😞 Negative'}\n- **Social Media:** {customer_data['Social Media Activity']}")
+            st.plotly_chart(memoized(("insights", customer_name, data.version, revision), lambda: plot_customer_insights(customer_data, data.cohorts())),
+                            use_container_width=True)
     
-    # Display recommendations in second column
-    with col2:
-        st.subheader("✨ Recommendations for Existing Customer")
+        # Display recommendations in second column
+        with col2:
+            st.subheader("✨ Recommendations for Existing Customer")
         
-        # Generate recommendations when button is clicked
-        if st.button("Generate Recommendations", type="primary"):
-            with st.spinner('Analyzing customer data...'):
-                st.subheader("System Recommendations")
-                recs = recommend_products(customer_data, df, similarity_matrix, strategy.split()[0].lower(), API_KEY)
-                if recs:
-                    for rec in recs:
-                        st.markdown(f"🎯 **{rec['product']}** (Score: {rec['score']:.2f}) - {rec['reason']}")
-                else:
-                    st.info("No recommendations found")
+            # Generate recommendations when button is clicked
+            if st.button("Generate Recommendations", type="primary"):
+                with st.spinner('Analyzing customer data...'):
+                    st.subheader("System Recommendations")
+                    strategy_key = strategy.split()[0].lower()
+                    with metrics.trace("recommend_products") as trace:
+                        recs = memoized(("recommendations", customer_name, strategy_key, data.version, revision),
+                                        lambda: data.recommend(customer_data, strategy_key))
+                    if recs:
+                        for rec in recs:
+                            st.markdown(f"🎯 **{rec['product']}** (Score: {rec['score']:.2f}) - {rec['reason']}")
+                    else:
+                        st.info("No recommendations found")
+                    show_trace(trace)
+    
+    # Whole-base view from the precomputed cohort aggregates
+    show_cohorts(data)
     
     # Section for new customer recommendations
     st.header("New Customer Recommendation")
@@ -113,17 +320,20 @@ def main():
             with new_col1:
                 st.subheader("👤 New Customer Profile")
                 st.markdown(f"- **Age:** {new_customer_data['Age']}\n- **Gender:** {new_customer_data['Gender']}\n- **Interests:** {', '.join(new_customer_data['Interests'])}\n- **Engagement Score:** {new_customer_data['Engagement Score']}/100\n- **Sentiment:** {'😊 Positive' if new_customer_data['Sentiment Score'] > 0 else '😞 Negative'}\n- **Social Media:** {new_customer_data['Social Media Activity']}")
-                st.plotly_chart(plot_customer_insights(new_customer_data), use_container_width=True)
+                st.plotly_chart(plot_customer_insights(new_customer_data, data.cohorts()), use_container_width=True)
             
             # Display recommendations for new customer
             with new_col2:
                 st.subheader("✨ Recommendations for New Customer")
-                new_recs = recommend_new_customer(new_customer_data, API_KEY)
+                strategy_key = strategy.split()[0].lower()
+                with metrics.trace("recommend_new_customer") as trace:
+                    new_recs = data.recommend_new(new_customer_data, strategy_key)
                 if new_recs:
                     for rec in new_recs:
                         st.markdown(f"🎯 **{rec['product']}** (Score: {rec['score']:.2f}) - {rec['reason']}")
                 else:
                     st.info("No recommendations found based on interests")
+                show_trace(trace)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
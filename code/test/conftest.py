@@ -0,0 +1,45 @@
+# Make the application modules under code/src importable from the tests
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from Utils.benchmark import HashingEncoder
+from Utils.catalog import DEFAULT_CATALOG
+from Utils.snapshot import build_snapshot, current_snapshot, load_snapshot
+
+# Random customers with every field of the sample dataset
+def random_customers(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    interests = list(DEFAULT_CATALOG.interest_products)
+    return [{
+        "Customer Name": f"Customer {i}",
+        "Purchase History": [str(p) for p in rng.choice(DEFAULT_CATALOG.products, int(rng.integers(1, 4)), replace=False)],
+        "Sentiment Score": round(float(rng.uniform(-1, 1)), 2),
+        "Social Media Activity": str(rng.choice(["Low", "Medium", "High"])),
+        "Age": int(rng.integers(18, 70)),
+        "Gender": str(rng.choice(["Male", "Female"])),
+        "Interests": [str(t) for t in rng.choice(interests, int(rng.integers(1, 3)), replace=False)],
+        "Engagement Score": int(rng.integers(0, 101)),
+    } for i in range(n)]
+
+# Write customers to a dataset file
+def write_customers(customers, data_path):
+    with open(data_path, 'w') as f:
+        json.dump(customers, f)
+
+# Build a snapshot of a customer list with the hashing encoder and load it; the embedding cache
+# stays out of the source tree
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path / "embedding-cache"))
+
+    def build(customers, data_path, snapshot_dir, backend="exact"):
+        write_customers(customers, data_path)
+        build_snapshot(str(data_path), str(snapshot_dir), backend, HashingEncoder())
+        return load_snapshot(current_snapshot(str(snapshot_dir)))
+
+    return build
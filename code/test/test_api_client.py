@@ -0,0 +1,69 @@
+# Import required libraries
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+import requests
+from Utils.api_client import CircuitOpenError, RecommendationClient
+
+# Local API answering every request with the next configured status (the last one repeats)
+@pytest.fixture
+def api():
+    statuses, paths = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            paths.append(self.path)
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            if status == 200 and self.path == "/recommend-batch":
+                response = {"results": [{"recommendations": [{"product": "Tent"}]} for _ in body["requests"]]}
+            else:
+                response = {"recommendations": [{"product": "Tent"}]} if status == 200 else {"error": "rejected"}
+            data = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = RecommendationClient("key", f"http://127.0.0.1:{server.server_address[1]}", cache_ttl=0, failure_threshold=3)
+    yield client, statuses, paths
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+def test_client_errors_do_not_open_the_breaker(api):
+    client, statuses, _ = api
+    statuses[:] = [400]
+    for i in range(5):
+        with pytest.raises(requests.HTTPError):
+            client.recommend({"Customer Name": f"Customer {i}"})
+    assert not client.breaker.is_open
+
+def test_server_errors_open_the_breaker(api):
+    client, statuses, _ = api
+    statuses[:] = [503]
+    for i in range(3):
+        with pytest.raises(requests.HTTPError):
+            client.recommend({"Customer Name": f"Customer {i}"})
+    with pytest.raises(CircuitOpenError):
+        client.recommend({"Customer Name": "Customer 3"})
+
+def test_rejected_batch_is_not_resent_one_by_one(api):
+    client, statuses, paths = api
+    statuses[:] = [400]
+    with pytest.raises(requests.HTTPError):
+        client.recommend_many([{"customer_name": f"Customer {i}"} for i in range(4)])
+    assert paths == ["/recommend-batch"]
+
+def test_missing_batch_endpoint_falls_back_to_single_requests(api):
+    client, statuses, paths = api
+    statuses[:] = [404, 200]
+    results = client.recommend_many([{"customer_name": f"Customer {i}"} for i in range(4)])
+    assert results == [[{"product": "Tent"}]] * 4
+    assert paths == ["/recommend-batch"] + ["/recommend"] * 4
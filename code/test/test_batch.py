@@ -0,0 +1,30 @@
+# Import required libraries
+import io
+import json
+import pandas as pd
+import pytest
+from conftest import random_customers
+from Utils.batch import JsonlWriter, run_batch
+from Utils.benchmark import HashingEncoder
+from Utils.data_processing import preprocess_data
+from Utils.embeddings import get_embeddings, get_neighbor_index
+from Utils.recommendations import recommend_products
+
+@pytest.mark.parametrize("strategy", ["hybrid", "collaborative", "contextual"])
+def test_jsonl_output_matches_recommend_products(tmp_path, strategy):
+    df = pd.DataFrame(random_customers(60))
+    neighbor_index = get_neighbor_index(get_embeddings(preprocess_data(df), HashingEncoder()))
+    out_path = tmp_path / "recommendations.jsonl"
+    writer = JsonlWriter(str(out_path))
+    try:
+        stats = run_batch(df, neighbor_index, writer, strategy=strategy, chunk_size=25, workers=2, log=io.StringIO())
+    finally:
+        writer.close()
+
+    with open(out_path, 'r') as f:
+        records = [json.loads(line) for line in f]
+    assert stats["customers"] == len(df)
+    assert [record["Customer Name"] for record in records] == df["Customer Name"].tolist()
+    for idx, record in enumerate(records):
+        expected = recommend_products(df.iloc[idx].to_dict(), df, neighbor_index, strategy, idx=idx)
+        assert record["recommendations"] == json.loads(json.dumps(expected, default=float))
@@ -0,0 +1,19 @@
+# Import required libraries
+from concurrent.futures import ThreadPoolExecutor
+from Utils.catalog import ProductCatalog
+
+def test_concurrent_interning_assigns_one_id_per_product():
+    catalog = ProductCatalog()
+    names = [f"Product {i % 500}" for i in range(20000)]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        ids = list(executor.map(lambda name: int(catalog.ids([name])[0]), names))
+    assert len(catalog.products) == len(set(catalog.products)) == len(catalog.product_ids)
+    assert all(catalog.products[i] == name for i, name in zip(ids, names))
+
+def test_unknown_terms_are_not_memoised():
+    catalog = ProductCatalog()
+    size = len(catalog._matches)
+    assert catalog.matches("watch", "Smart Watch")
+    assert not catalog.matches("tech", "Unseen Product")
+    assert len(catalog._matches) == size
+    assert catalog.matches("Tech", "Wireless Keyboard") is False
@@ -0,0 +1,69 @@
+# Import required libraries
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import random_customers, write_customers
+from Utils.cohorts import AGE_BANDS, SEGMENTS, CohortIndex
+from Utils.customer_store import CustomerView, convert_json_to_store
+from Utils.recommendations import assess_risk
+
+# Rows of a DataFrame matching a segment, by a plain pandas scan
+def scan(df, interest=None, age_band=None, social=None, **bounds):
+    mask = pd.Series(True, index=df.index)
+    for metric, (low, high) in bounds.items():
+        values = df[metric]
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    if age_band is not None:
+        start, stop = next((start, stop) for label, start, stop in AGE_BANDS if label == age_band)
+        mask &= (df["Age"] >= start) & (df["Age"] < stop)
+    if social is not None:
+        mask &= df["Social Media Activity"] == social
+    if interest is not None:
+        mask &= df["Interests"].apply(lambda interests: interest in interests)
+    return np.flatnonzero(mask.to_numpy())
+
+# Customers as a DataFrame with the metric columns the segments use
+def metrics_frame(records):
+    df = pd.DataFrame(records)
+    df["sentiment"] = df["Sentiment Score"]
+    df["engagement"] = df["Engagement Score"]
+    df["risk"] = df.apply(assess_risk, axis=1)
+    return df
+
+@pytest.fixture
+def cohorts(tmp_path):
+    customers = random_customers(500)
+    write_customers(customers, tmp_path / "data.json")
+    store = convert_json_to_store(str(tmp_path / "data.json"), str(tmp_path / "store"))
+    return CohortIndex.from_store(store), CustomerView(store), metrics_frame(customers)
+
+QUERIES = [dict(conditions) for conditions in SEGMENTS.values()] + [
+    {"interest": "Tech"},
+    {"interest": "Travel", "age_band": "25-34"},
+    {"age_band": "65+", "social": "Low", "engagement": (None, 50)},
+    {"sentiment": (-0.2, 0.4), "risk": (None, 0.0)},
+    {"interest": "No such interest"},
+]
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_segments_match_a_pandas_scan(cohorts, query):
+    index, _, df = cohorts
+    assert np.array_equal(index.segment(**query), scan(df, **query))
+
+def test_counts_and_updates_match_a_pandas_scan(cohorts):
+    index, customers, df = cohorts
+    counts = index.segment_counts()
+    assert counts["social"] == df["Social Media Activity"].value_counts().to_dict()
+    assert counts["interest"] == df["Interests"].explode().value_counts().to_dict()
+    assert counts["age_band"] == {label: len(scan(df, age_band=label)) for label, _, _ in AGE_BANDS}
+
+    # Live profile updates move customers between segments
+    updates = {3: {"Sentiment Score": -0.9, "Engagement Score": 10}, 8: {"Social Media Activity": "High", "Sentiment Score": 0.8}}
+    customers = customers.with_updates(updates)
+    index.update(list(updates), customers)
+    df = metrics_frame(customers.records(np.arange(len(df))))
+    for query in QUERIES:
+        assert np.array_equal(index.segment(**query), scan(df, **query))
@@ -0,0 +1,46 @@
+# Import required libraries
+import numpy as np
+from conftest import random_customers, write_customers
+from Utils.customer_store import CustomerView, NameIndex, convert_json_to_store
+from Utils.data_processing import SAMPLE_DATA_PATH, load_sample_data
+
+def test_store_round_trips_the_sample_data(tmp_path):
+    store = convert_json_to_store(SAMPLE_DATA_PATH, str(tmp_path / "store"))
+    expected = load_sample_data().to_dict(orient="records")
+    assert store.records(np.arange(len(store))) == expected
+    assert store.to_dataframe().astype(object).to_dict(orient="records") == expected
+
+def test_fractional_and_missing_scores_are_kept(tmp_path):
+    customers = random_customers(3)
+    customers[1]["Engagement Score"] = 72.5
+    del customers[2]["Age"]
+    write_customers(customers, tmp_path / "data.json")
+    store = convert_json_to_store(str(tmp_path / "data.json"), str(tmp_path / "store"))
+    assert store.numeric("Engagement Score").dtype == np.float32
+    assert store.records([1])[0]["Engagement Score"] == 72.5
+    assert np.isnan(store.records([2])[0]["Age"])
+    assert store.numeric("Sentiment Score").dtype == np.float64
+
+def test_names_are_found_and_searched_without_decoding_the_column(tmp_path):
+    customers = random_customers(300)
+    customers[7]["Customer Name"] = "Zoë Quinn"
+    write_customers(customers, tmp_path / "data.json")
+    store = convert_json_to_store(str(tmp_path / "data.json"), str(tmp_path / "store"))
+    names = [c["Customer Name"] for c in customers]
+    row_of = NameIndex(store)
+    assert all(row_of[name] == row for row, name in enumerate(names))
+    assert "Nobody" not in row_of and row_of.get("Nobody") is None
+    for query in ["customer 1", "ZOË", "9", "", "no such name"]:
+        expected = [row for row, name in enumerate(names) if query.casefold() in name.casefold()]
+        assert store.search(query).tolist() == expected
+
+def test_view_updates_leave_the_old_view_unchanged(tmp_path):
+    customers = random_customers(10)
+    customers[4]["Engagement Score"] = 10
+    write_customers(customers, tmp_path / "data.json")
+    view = CustomerView(convert_json_to_store(str(tmp_path / "data.json"), str(tmp_path / "store")))
+    updated = view.with_updates({4: {"Engagement Score": 99}})
+    assert updated.record(4)["Engagement Score"] == 99
+    assert view.record(4)["Engagement Score"] == 10
+    assert updated.iloc[4].to_dict() == updated.record(4)
+    assert updated.iloc[[3, 4]]["Engagement Score"].tolist()[1] == 99
@@ -0,0 +1,66 @@
+# Import required libraries
+import numpy as np
+from Utils.benchmark import HashingEncoder
+from Utils.embedding_cache import EmbeddingCache
+
+def test_caches_sharing_a_directory_do_not_overwrite_each_other(tmp_path):
+    encoder = HashingEncoder(16)
+    # Both opened before either writes, like two processes started together
+    first = EmbeddingCache("hashing", "1", str(tmp_path / "cache"))
+    second = EmbeddingCache("hashing", "1", str(tmp_path / "cache"))
+    first.get_or_encode(["a", "b"], encoder.encode)
+    second.get_or_encode(["c", "b"], encoder.encode)
+
+    features = ["a", "b", "c"]
+    assert np.array_equal(first.get_or_encode(features, encoder.encode), encoder.encode(features))
+    reopened = EmbeddingCache("hashing", "1", str(tmp_path / "cache"))
+    assert reopened.count == 3
+    assert np.array_equal(reopened.get_or_encode(features, encoder.encode), encoder.encode(features))
+
+def test_a_full_cache_keeps_the_most_recently_used_vectors(tmp_path):
+    encoder = HashingEncoder(16)
+    encoded = []
+
+    def encode(texts):
+        encoded.extend(texts)
+        return encoder.encode(texts)
+
+    cache = EmbeddingCache("hashing", "1", str(tmp_path / "cache"), max_rows=10)
+    cache.get_or_encode([f"old {i}" for i in range(6)], encode)
+    cache.get_or_encode(["old 0", "old 1"], encode)
+    # 12 rows pass the limit: the 7 most recent stay, counting the 6 strings used just now
+    new = [f"new {i}" for i in range(6)]
+    assert np.array_equal(cache.get_or_encode(new, encode), encoder.encode(new))
+    assert cache.count == 7 and cache.generation == 1
+    assert sorted((tmp_path / "cache").iterdir()) == sorted(tmp_path / "cache" / name for name in
+                                                            ["meta.json", "keys-1.json", "vectors-1.npy", "used-1.npy"])
+
+    reopened = EmbeddingCache("hashing", "1", str(tmp_path / "cache"), max_rows=10)
+    encoded.clear()
+    features = ["old 0", "old 1", "old 2"] + new
+    assert np.array_equal(reopened.get_or_encode(features, encode), encoder.encode(features))
+    # One of the recently used old strings survived; the least recently used ones are encoded again
+    assert len(encoded) == 2 and "old 2" in encoded
+
+def test_only_new_strings_are_encoded_and_a_model_change_starts_over(tmp_path):
+    encoder = HashingEncoder(16)
+    encoded = []
+
+    def encode(texts):
+        encoded.extend(texts)
+        return encoder.encode(texts)
+
+    EmbeddingCache("hashing", "1", str(tmp_path / "cache")).get_or_encode(["a", "b", "c"], encode)
+    encoded.clear()
+    features = ["a", "b changed", "c", "d", "d"]
+    assert np.array_equal(EmbeddingCache("hashing", "1", str(tmp_path / "cache")).get_or_encode(features, encode),
+                          encoder.encode(features))
+    assert encoded == ["b changed", "d"]
+
+    # Another model version discards every vector of the old one
+    encoded.clear()
+    upgraded = EmbeddingCache("hashing", "2", str(tmp_path / "cache"))
+    assert upgraded.count == 0
+    upgraded.get_or_encode(["a", "b"], encode)
+    assert encoded == ["a", "b"]
+    assert EmbeddingCache("hashing", "2", str(tmp_path / "cache")).count == 2
@@ -0,0 +1,47 @@
+# Import required libraries
+import io
+import numpy as np
+from conftest import random_customers, write_customers
+from Utils.benchmark import HashingEncoder
+from Utils.embedding_pipeline import encode_dataset
+from Utils.snapshot import build_snapshot, current_snapshot, load_snapshot
+
+# A different model with the same output shape
+class ShortHashingEncoder(HashingEncoder):
+    def encode(self, texts, batch_size=None):
+        return super().encode([text[:20] for text in texts], batch_size)
+
+def test_resume_requires_the_same_model(tmp_path):
+    data_path, out_path = tmp_path / "data.json", str(tmp_path / "embeddings.npy")
+    write_customers(random_customers(50), data_path)
+    options = dict(store_dir=str(tmp_path / "store"), chunk_size=20, workers=1, log=io.StringIO())
+
+    assert encode_dataset(str(data_path), out_path, model_factory=HashingEncoder, **options)["customers"] == 50
+    first = np.load(out_path)
+    # Everything was written, so the same job resumes with nothing left to do
+    assert encode_dataset(str(data_path), out_path, model_factory=HashingEncoder, **options)["customers"] == 0
+    # Another model starts over instead of mixing its vectors into the finished file
+    assert encode_dataset(str(data_path), out_path, model_factory=ShortHashingEncoder, **options)["customers"] == 50
+    assert not np.array_equal(np.load(out_path), first)
+
+# Build a snapshot of the dataset file as it is, so its signature still matches the pipeline's run
+def build_from_file(data_path, snapshot_dir):
+    build_snapshot(str(data_path), str(snapshot_dir), model=HashingEncoder())
+    return load_snapshot(current_snapshot(str(snapshot_dir)))
+
+def test_snapshot_build_reads_a_finished_run(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path / "embedding-cache"))
+    data_path = tmp_path / "data.json"
+    write_customers(random_customers(50), data_path)
+    options = dict(store_dir=str(tmp_path / "store"), chunk_size=20, workers=1, log=io.StringIO())
+    for name, factory in [("snapshots", HashingEncoder), ("other", ShortHashingEncoder)]:
+        (tmp_path / name).mkdir()
+        encode_dataset(str(data_path), str(tmp_path / name / "embeddings.npy"), model_factory=factory, **options)
+
+    # Same data and model: the build takes the pipeline's vectors instead of encoding
+    snapshot = build_from_file(data_path, tmp_path / "snapshots")
+    encoded_here = build_from_file(data_path, tmp_path / "encoded-here")
+    assert snapshot["manifest"]["pipeline"] and not encoded_here["manifest"]["pipeline"]
+    assert np.array_equal(snapshot["embeddings"], encoded_here["embeddings"])
+    # Vectors of another model are not used
+    assert not build_from_file(data_path, tmp_path / "other")["manifest"]["pipeline"]
@@ -0,0 +1,77 @@
+# Import required libraries
+import numpy as np
+import pytest
+from conftest import random_customers, write_customers
+from Utils.benchmark import HashingEncoder
+from Utils.ingestion import EventIngestor
+from Utils.recommendations import assess_risk
+from Utils.reloader import SnapshotReloader
+from Utils.server import RecommendationService
+
+# Start ingestors that are closed after the test
+@pytest.fixture
+def ingestor():
+    started = []
+
+    def start(services):
+        started.append(EventIngestor(services))
+        return started[-1]
+
+    yield start
+    for ingestor in started:
+        ingestor.close()
+
+def test_reload_keeps_ingested_profiles(build, ingestor, tmp_path):
+    customers = random_customers(200)
+    customers[0]["Sentiment Score"] = 0.2
+    data_path, snapshot_dir = tmp_path / "data.json", tmp_path / "snapshots"
+    build(customers, data_path, snapshot_dir)
+    reloader = SnapshotReloader(str(data_path), str(snapshot_dir), model_factory=HashingEncoder, on_load=RecommendationService)
+    events = ingestor(reloader)
+    events.apply([{"customer": "Customer 0", "type": "sentiment", "value": -0.8, "ts": 0}])
+
+    # Another customer changes in the dataset; the reloaded snapshot must still have the live profile
+    customers[5]["Age"] += 1
+    write_customers(customers, data_path)
+    assert reloader.reload()
+    with reloader.lease() as service:
+        snapshot = service.snapshot
+        row = snapshot["row_of"]["Customer 0"]
+        assert snapshot["customers"].record(row)["Sentiment Score"] == -0.8
+        assert service.customer("Customer 0")["Sentiment Score"] == -0.8
+        assert all(row in table.stale for table in snapshot["tables"].values())
+
+def test_purchase_invalidates_the_buyers_dependents(build, ingestor, tmp_path):
+    snapshot = build(random_customers(200), tmp_path / "data.json", tmp_path / "snapshots")
+    neighbors = np.asarray(snapshot["neighbors"])
+    # A customer that other customers have as a neighbour
+    buyer = next(row for row in range(len(neighbors)) if np.any(np.delete(neighbors, row, axis=0) == row))
+    dependents = {u for u in range(len(neighbors)) if u != buyer and buyer in neighbors[u]}
+    customers = snapshot["customers"]
+    name = customers.record(buyer)["Customer Name"]
+    before = customers.record(buyer)["Purchase History"]
+    product = next(p for p in snapshot["catalog"].products if p not in before)
+
+    ingestor(snapshot).apply([{"customer": name, "type": "purchase", "product": product, "ts": 0}])
+
+    # The customer view is replaced, not written to, so readers holding the old one see no change
+    assert customers.record(buyer)["Purchase History"] == before
+    assert product in snapshot["customers"].record(buyer)["Purchase History"]
+    assert snapshot["tables"]["contextual"].stale == {buyer}
+    for strategy in ["hybrid", "collaborative"]:
+        assert snapshot["tables"][strategy].stale == dependents | {buyer}
+
+def test_an_event_never_makes_an_engaged_customer_look_disengaged(build, ingestor, tmp_path):
+    customers = random_customers(200)
+    customers[0].update({"Engagement Score": 85, "Social Media Activity": "High", "Sentiment Score": 0.4})
+    snapshot = build(customers, tmp_path / "data.json", tmp_path / "snapshots")
+    risk = assess_risk(customers[0])
+    ingestor(snapshot).apply([{"customer": "Customer 0", "type": "purchase", "product": "Designer Watch", "ts": 0},
+                              {"customer": "Customer 0", "type": "interaction", "channel": "web", "ts": 1}])
+
+    row = snapshot["row_of"]["Customer 0"]
+    customer = snapshot["customers"].record(row)
+    assert customer["Engagement Score"] >= 85
+    assert customer["Social Media Activity"] == "High"
+    assert assess_risk(customer) <= risk
+    assert snapshot["cohorts"].columns["risk"][row] <= risk
@@ -0,0 +1,34 @@
+# Import required libraries
+import numpy as np
+import pytest
+from Utils.item_cf import ItemCooccurrence
+
+# Random purchase histories over a small product range, so products co-occur often
+def random_histories(n=300, n_products=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return [[f"P{p}" for p in rng.choice(n_products, int(rng.integers(1, 5)), replace=False)] for _ in range(n)]
+
+# Score of every product with a history, by product name
+def named_scores(index, history):
+    return {p: s for p, s in zip(index.products, index.scores(history)) if s > 0}
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_incremental_updates_match_full_rebuild(compact):
+    histories = random_histories()
+    index = ItemCooccurrence.from_histories(histories)
+    rng = np.random.default_rng(1)
+    # Existing products, and new ones first seen in a pending purchase and then bought again
+    for product in [f"P{p}" for p in rng.integers(0, 40, 200)] + ["New A", "New B", "New A", "New B", "New A"]:
+        customer = int(rng.integers(len(histories)))
+        index.add_purchase(histories[customer], product)
+        if product not in histories[customer]:
+            histories[customer] = histories[customer] + [product]
+    if compact:
+        index.compact()
+
+    rebuilt = ItemCooccurrence.from_histories(histories)
+    for history in histories + [["New A"], ["New B", "P3"]]:
+        expected = named_scores(rebuilt, history)
+        actual = named_scores(index, history)
+        assert actual.keys() == expected.keys()
+        assert all(actual[p] == pytest.approx(expected[p]) for p in expected)
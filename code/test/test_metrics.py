@@ -0,0 +1,64 @@
+# Import required libraries
+import re
+import pytest
+from Utils import metrics
+
+# A sample line: metric name, optional labels, value
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? \S+$')
+
+# Start every test with empty metrics and restore the enabled flag afterwards
+@pytest.fixture(autouse=True)
+def clean_registry():
+    enabled = metrics.ENABLED
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.reset()
+    metrics.enable(enabled)
+
+# Sample lines of the exported metrics
+def samples():
+    return [line for line in metrics.export_prometheus().splitlines() if not line.startswith("#")]
+
+def test_export_is_valid_prometheus_text():
+    metrics.enable()
+    metrics.inc(metrics.CACHE_REQUESTS, 3, cache="rec_table", result="hit")
+    metrics.inc(metrics.API_FALLBACKS, endpoint='say "hi"\\now')
+    for value in (0.0007, 0.003, 0.003, 99.0):
+        metrics.STAGE_SECONDS.observe(value, stage="query")
+
+    text = metrics.export_prometheus()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    for metric in metrics.REGISTRY.metrics.values():
+        help_line = lines.index(f"# HELP {metric.name} {metric.help}")
+        assert lines[help_line + 1] == f"# TYPE {metric.name} {metric.kind}"
+    assert all(SAMPLE.match(line) for line in samples())
+    assert 'aidhp_cache_requests_total{cache="rec_table",result="hit"} 3' in lines
+    assert 'aidhp_api_fallback_total{endpoint="say \\"hi\\"\\\\now"} 1' in lines
+
+    # Buckets are cumulative and end with +Inf, which equals the count
+    buckets = [line for line in lines if line.startswith('aidhp_stage_seconds_bucket{stage="query"')]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert len(buckets) == len(metrics.LATENCY_BUCKETS) + 1
+    assert buckets[0] == 'aidhp_stage_seconds_bucket{stage="query",le="0.0005"} 0'
+    assert buckets[-1] == 'aidhp_stage_seconds_bucket{stage="query",le="+Inf"} 4'
+    assert counts == sorted(counts) and counts[1] == 1 and counts[3] == 3 and counts[-2] == 3
+    assert 'aidhp_stage_seconds_count{stage="query"} 4' in lines
+    total = next(line for line in lines if line.startswith('aidhp_stage_seconds_sum{stage="query"}'))
+    assert float(total.rsplit(" ", 1)[1]) == pytest.approx(99.0067)
+
+def test_disabled_instrumentation_records_nothing():
+    metrics.enable(False)
+
+    @metrics.timed("disabled_stage")
+    def work():
+        return 42
+
+    assert work() == 42
+    with metrics.stage("disabled_block"):
+        pass
+    with metrics.trace("request") as trace:
+        metrics.inc(metrics.CACHE_REQUESTS, cache="embedding", result="miss")
+        metrics.observe(metrics.CANDIDATE_SET_SIZE, 7, strategy="hybrid")
+    assert trace is None
+    assert samples() == []
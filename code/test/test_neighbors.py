@@ -0,0 +1,39 @@
+# Import required libraries
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import random_customers
+from Utils.benchmark import HashingEncoder
+from Utils.data_processing import preprocess_data
+from Utils.embeddings import get_embeddings
+from Utils.neighbors import ExactIndex, IVFIndex, build_index, load_index, normalize_rows, save_index
+
+def test_ivf_training_matches_per_cell_means():
+    vectors = normalize_rows(np.random.default_rng(0).normal(size=(2000, 16)))
+    index = IVFIndex(vectors, n_lists=30, n_iter=1, seed=42)
+    # One k-means step by hand: the same initial centroids, then the mean of every cell
+    centroids = vectors[np.random.default_rng(42).choice(len(vectors), 30, replace=False)].copy()
+    assignments = np.argmax(vectors @ centroids.T, axis=1)
+    for cell in range(30):
+        if np.any(assignments == cell):
+            centroids[cell] = vectors[assignments == cell].mean(axis=0)
+    assert np.allclose(index.centroids, normalize_rows(centroids), atol=1e-6)
+
+def test_ivf_probing_every_cell_is_exact():
+    vectors = np.random.default_rng(1).normal(size=(1000, 16))
+    index = IVFIndex(vectors, n_lists=10, n_probe=10)
+    found, _ = index.query_batch(vectors[:50], 5)
+    expected, _ = ExactIndex(vectors).query_batch(vectors[:50], 5)
+    assert np.array_equal(found, expected)
+
+@pytest.mark.parametrize("backend", ["int8", "float16"])
+def test_quantized_reranking_matches_exact_top_k(tmp_path, backend):
+    embeddings = get_embeddings(preprocess_data(pd.DataFrame(random_customers(500))), HashingEncoder())
+    expected, expected_scores = ExactIndex(embeddings).query_batch(embeddings, 5)
+    # Small blocks so candidates are merged across blocks; saved and memory-mapped like a snapshot's index
+    save_index(build_index(embeddings, backend, block_size=64), str(tmp_path / "index"))
+    index = load_index(str(tmp_path / "index"))
+    found, scores = index.query_batch(embeddings, 5)
+    assert np.array_equal(found, expected)
+    assert np.allclose(scores, expected_scores, atol=1e-5)
+    assert np.array_equal(index.query(7, 5)[0], expected[7])
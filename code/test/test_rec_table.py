@@ -0,0 +1,40 @@
+# Import required libraries
+import numpy as np
+import pytest
+from Utils.benchmark import HashingEncoder
+from Utils.data_processing import load_sample_data, preprocess_data
+from Utils.embeddings import get_embeddings, get_neighbor_index
+from Utils.rec_table import RecommendationTable, all_neighbors
+from Utils.recommendations import recommend_products
+
+# Sample customers with their neighbour index and every customer's neighbours
+@pytest.fixture(scope="module")
+def sample():
+    df = load_sample_data()
+    neighbor_index = get_neighbor_index(get_embeddings(preprocess_data(df), HashingEncoder()))
+    return df, neighbor_index, all_neighbors(neighbor_index, len(df))
+
+@pytest.mark.parametrize("strategy", ["hybrid", "collaborative", "contextual"])
+def test_table_lookups_match_live_recommendations(sample, tmp_path, strategy):
+    df, neighbor_index, neighbors = sample
+    table = RecommendationTable.build(str(tmp_path / strategy), df, neighbors, strategy)
+    for idx in range(len(df)):
+        customer = df.iloc[idx].to_dict()
+        live = recommend_products(customer, df, neighbor_index, strategy, idx=idx)
+        assert table.lookup(idx, customer) == live
+
+def test_carried_forward_rows_match_full_rebuild(sample, tmp_path):
+    df, neighbor_index, neighbors = sample
+    previous = RecommendationTable.build(str(tmp_path / "previous"), df, neighbors)
+    changed = df.copy()
+    changed.at[0, "Sentiment Score"] = -0.9
+    # The previous table's rows in reverse order, so carrying forward has to go through previous_rows
+    reordered = changed.iloc[::-1].reset_index(drop=True)
+    order = np.arange(len(df))[::-1]
+    neighbors = np.where(neighbors[order] >= 0, order[neighbors[order]], -1)
+    incremental = RecommendationTable.build(str(tmp_path / "incremental"), reordered, neighbors, previous=previous,
+                                            previous_rows=order)
+    full = RecommendationTable.build(str(tmp_path / "full"), reordered, neighbors)
+    for idx in range(len(df)):
+        customer = reordered.iloc[idx].to_dict()
+        assert incremental.lookup(idx, customer) == full.lookup(idx, customer)
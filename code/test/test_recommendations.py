@@ -0,0 +1,51 @@
+# Import required libraries
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import random_customers
+from Utils.neighbors import build_index
+from Utils.catalog import DEFAULT_CATALOG
+from Utils.recommendations import needs_encoder, rank_recommendations, recommend_new_customer
+
+# Encoder that must not be used
+class UnusedEncoder:
+    def encode(self, text):
+        raise AssertionError("the encoder was used")
+
+# Encoder with a constant vector
+class ConstantEncoder:
+    def encode(self, text):
+        return np.ones(8, dtype=np.float32)
+
+# Neighbour search whose shard is down
+class UnreachableIndex:
+    def query(self, vector, k):
+        raise ConnectionError("shard 0 is down")
+
+@pytest.fixture
+def customers():
+    df = pd.DataFrame(random_customers(50))
+    return df, build_index(np.random.default_rng(0).normal(size=(len(df), 8)))
+
+@pytest.mark.parametrize("strategy", ["item", "contextual"])
+def test_strategies_without_neighbours_never_encode(customers, strategy):
+    df, neighbor_index = customers
+    new_customer = random_customers(1, seed=1)[0]
+    assert not needs_encoder(strategy)
+    # With no item index the item strategy falls back to contextual recommendations
+    recs = recommend_new_customer(new_customer, None, df=df, neighbor_index=neighbor_index, encoder=UnusedEncoder(),
+                                  strategy=strategy, item_index=None)
+    assert recs == recommend_new_customer(new_customer, strategy="contextual")
+
+def test_unreachable_neighbour_search_falls_back_to_interests(customers):
+    df, _ = customers
+    new_customer = random_customers(1, seed=1)[0]
+    recs = recommend_new_customer(new_customer, None, df=df, neighbor_index=UnreachableIndex(), encoder=ConstantEncoder())
+    assert recs == rank_recommendations(DEFAULT_CATALOG.contextual_products(new_customer["Interests"]), new_customer)
+
+def test_neighbour_strategies_without_customers_are_contextual(customers):
+    _, neighbor_index = customers
+    new_customer = random_customers(1, seed=1)[0]
+    # The similar users' purchases cannot be read without the customers they index
+    recs = recommend_new_customer(new_customer, None, neighbor_index=neighbor_index, encoder=UnusedEncoder())
+    assert recs == recommend_new_customer(new_customer, strategy="contextual")
@@ -0,0 +1,63 @@
+# Import required libraries
+import numpy as np
+import pytest
+from Utils.catalog import DEFAULT_CATALOG
+from Utils.recommendations import assess_risk, rank_candidates_batch, score_recommendation
+from Utils.scoring import select_top_k
+
+STRATEGIES = ["hybrid", "collaborative", "contextual", "item"]
+
+# Customers drawn from a few profiles, so many products tie on score
+def tied_customers(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    interests = list(DEFAULT_CATALOG.interest_products)
+    customers = []
+    for i in range(n):
+        customers.append({
+            "Customer Name": f"Customer {i}",
+            "Interests": list(rng.choice(interests, 1)),
+            "Purchase History": list(rng.choice(DEFAULT_CATALOG.products, 1)),
+            "Sentiment Score": float(rng.choice([-0.8, 0.0, 0.5])),
+            "Engagement Score": int(rng.choice([10, 50, 90])),
+        })
+    candidates = [list(rng.choice(DEFAULT_CATALOG.products, int(rng.integers(3, 25)), replace=False)) for _ in customers]
+    return customers, candidates
+
+# Reference: score each candidate with the scalar scorer, best first, ties broken by product ID
+def scalar_top_k(customer, candidates, strategy, k=5):
+    risk = assess_risk(customer)
+    ranked = sorted((-score_recommendation(p, customer, risk, strategy, DEFAULT_CATALOG), DEFAULT_CATALOG.ids([p])[0])
+                    for p in set(candidates))
+    return [int(pid) for _, pid in ranked[:k]], [-score for score, _ in ranked[:k]]
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_vectorised_ranking_matches_scalar(strategy):
+    customers, candidates = tied_customers()
+    top, top_scores = rank_candidates_batch(candidates, customers, strategy, 5)
+    for customer, cands, row, row_scores in zip(customers, candidates, top, top_scores):
+        expected, expected_scores = scalar_top_k(customer, cands, strategy)
+        assert [int(p) for p in row if p >= 0] == expected
+        assert np.array_equal(row_scores[:len(expected)], expected_scores)
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_ranking_is_independent_of_chunking(strategy):
+    customers, candidates = tied_customers()
+    alone = [[p for p in rank_candidates_batch([c], [customer], strategy, 5)[0][0].tolist() if p >= 0]
+             for customer, c in zip(customers, candidates)]
+    for chunk_size in (1, 7, 64, len(customers)):
+        chunked = []
+        for start in range(0, len(customers), chunk_size):
+            top, _ = rank_candidates_batch(candidates[start:start + chunk_size], customers[start:start + chunk_size], strategy, 5)
+            chunked.extend([p for p in row if p >= 0] for row in top.tolist())
+        assert chunked == alone
+
+def test_select_top_k_breaks_ties_by_column():
+    scores = np.array([[0.5, 0.7, 0.5, 0.5, 0.7, 0.5]])
+    mask = np.array([[True, True, True, False, True, True]])
+    top, top_scores = select_top_k(scores, mask, 4)
+    assert top.tolist() == [[1, 4, 0, 2]]
+    assert top_scores.tolist() == [[0.7, 0.7, 0.5, 0.5]]
+
+def test_select_top_k_pads_short_rows():
+    top, _ = select_top_k(np.array([[0.9, 0.1, 0.3]]), np.array([[False, True, False]]), 2)
+    assert top.tolist() == [[1, -1]]
@@ -0,0 +1,102 @@
+# Import required libraries
+import http.client
+import json
+import time
+from types import SimpleNamespace
+import pytest
+import requests
+from conftest import random_customers
+from Utils.api_client import RecommendationClient
+from Utils.cohorts import CohortSummary
+from Utils.server import RecommendationService, start_server
+
+# GET /health over an open connection
+def health(conn):
+    conn.request("GET", "/health")
+    response = conn.getresponse()
+    return response.status, json.loads(response.read()), response.getheader("Connection")
+
+def test_idle_keep_alive_connections_do_not_hold_workers():
+    server, url = start_server(SimpleNamespace(row_of={}), workers=2)
+    host, port = server.server_address
+    try:
+        # More idle keep-alive clients than workers
+        idle = [http.client.HTTPConnection(host, port, timeout=10) for _ in range(6)]
+        for conn in idle:
+            assert health(conn)[0] == 200
+
+        start = time.perf_counter()
+        fresh = http.client.HTTPConnection(host, port, timeout=10)
+        assert health(fresh)[0] == 200
+        assert time.perf_counter() - start < 1.0
+
+        # The parked connections are still open and served when they send again
+        for conn in idle:
+            sock = conn.sock
+            status, body, connection = health(conn)
+            assert (status, body["customers"], connection) == (200, 0, None)
+            assert conn.sock is sock
+        for conn in idle + [fresh]:
+            conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_thin_client_browses_the_server(build, tmp_path):
+    snapshot = build(random_customers(120), tmp_path / "data.json", tmp_path / "snapshots")
+    server, url = start_server(RecommendationService(snapshot), workers=2)
+    client = RecommendationClient("", url, cache_ttl=0)
+    try:
+        assert "Authorization" not in client.session.headers
+        names = [f"Customer {i}" for i in range(120)]
+        expected = [name for name in names if "customer 1" in name.lower()]
+        page = client.customers("CUSTOMER 1", 5, 10)
+        assert (page["version"], page["total"], page["customers"]) == (snapshot["version"], len(expected), expected[5:15])
+
+        profile = client.customer("Customer 7")
+        assert profile["customer"] == snapshot["customers"].record(7) and profile["revision"] == 0
+        with pytest.raises(requests.HTTPError):
+            client.customer("Nobody")
+
+        cohorts, local = CohortSummary(client.cohorts()), snapshot["cohorts"]
+        for metric, value in [("sentiment", 0.1), ("engagement", 40), ("risk", 0.2)]:
+            assert abs(cohorts.percentile_rank(metric, value) - local.percentile_rank(metric, value)) <= 1
+        assert cohorts.percentiles("engagement") == local.percentiles("engagement")
+
+        segment = client.segment("Disengaged", 3)
+        rows = local.named_segment("Disengaged")
+        assert segment["total"] == len(rows) and segment["customers"] == snapshot["customers"].records(rows[:3])
+        with pytest.raises(requests.HTTPError):
+            client.segment("No such segment")
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+def test_only_invalid_requests_are_client_errors(build, tmp_path):
+    snapshot = build(random_customers(50), tmp_path / "data.json", tmp_path / "snapshots")
+    service = RecommendationService(snapshot)
+    server, url = start_server(service, workers=2)
+    client = RecommendationClient("", url, cache_ttl=0)
+    customer = snapshot["customers"].record(3)
+    try:
+        assert client.recommend(customer, "contextual")
+        invalid = [{"customer_name": "Nobody"}, {"customer_name": "Customer 3", "strategy": "psychic"},
+                   {"customer_data": dict(customer, Interests="Tech")}, {"customer_data": {"Customer Name": "New"}}]
+        for payload in invalid:
+            with pytest.raises(requests.HTTPError) as error:
+                client._post("/recommend", json.dumps(payload))
+            assert error.value.response.status_code == 400
+
+        # A failure inside the recommender is the server's, even if it raises KeyError
+        def broken(payload):
+            raise KeyError("Purchase History")
+        service.recommend = broken
+        with pytest.raises(requests.HTTPError) as error:
+            client.recommend(customer, "hybrid")
+        assert error.value.response.status_code == 500
+        assert client.breaker.failures == 1
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
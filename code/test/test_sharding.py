@@ -0,0 +1,41 @@
+# Import required libraries
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import random_customers
+from Utils.recommendations import recommend_products
+from Utils.sharding import ShardedIndex, build_shards, serve_shard, shard_authkey, spawn_local_workers
+
+def test_workers_refuse_to_start_without_a_key(tmp_path, monkeypatch):
+    monkeypatch.delenv("SHARD_AUTHKEY", raising=False)
+    with pytest.raises(RuntimeError):
+        shard_authkey()
+    with pytest.raises(RuntimeError):
+        serve_shard(str(tmp_path))
+    # A coordinator without the variable gets a fresh random key for the workers it starts
+    assert len(shard_authkey(generate=True)) == 32 and shard_authkey(generate=True) != shard_authkey(generate=True)
+
+def test_recommendations_survive_a_down_shard(tmp_path, monkeypatch):
+    monkeypatch.delenv("SHARD_AUTHKEY", raising=False)
+    df = pd.DataFrame(random_customers(40))
+    build_shards(np.random.default_rng(0).normal(size=(len(df), 8)).astype(np.float32), str(tmp_path), n_shards=2)
+    index = ShardedIndex()
+    workers = spawn_local_workers(str(tmp_path), authkey=index.authkey)
+    try:
+        for _, address in workers:
+            index.attach(address)
+        customer = df.iloc[30].to_dict()
+        assert recommend_products(customer, df, index, "hybrid", idx=30)
+
+        # The worker of the shard holding customer 30 goes away
+        workers[1][0].kill()
+        workers[1][0].join()
+        with pytest.raises(ConnectionError):
+            index.vectors[30]
+        assert recommend_products(customer, df, index, "hybrid", idx=30)
+        # Customers of the remaining shard are still served with their neighbours
+        assert len(index.query(5, 3)[0]) == 3
+    finally:
+        index.close()
+        for process, _ in workers:
+            process.kill()
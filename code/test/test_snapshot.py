@@ -0,0 +1,74 @@
+# Import required libraries
+import os
+import numpy as np
+import pytest
+from conftest import random_customers, write_customers
+from Utils.benchmark import HashingEncoder
+from Utils.embeddings import MODEL_NAME, load_embedding_cache
+from Utils.snapshot import build_snapshot, current_snapshot, load_or_build_snapshot
+
+@pytest.mark.parametrize("backend", ["exact", "ivf"])
+def test_incremental_snapshot_matches_full_build(build, tmp_path, backend):
+    customers = random_customers()
+    first = build(customers, tmp_path / "data.json", tmp_path / "incremental", backend)
+
+    # Change a few profiles, drop a customer, add one and shuffle the rows
+    changed = [dict(c) for c in customers]
+    changed[3]["Interests"] = ["Travel"]
+    changed[10]["Purchase History"] = changed[10]["Purchase History"] + ["Tent"]
+    changed[25]["Sentiment Score"] = -0.9
+    del changed[40]
+    changed.append(dict(random_customers(1, seed=1)[0], **{"Customer Name": "Customer new"}))
+    changed = [changed[i] for i in np.random.default_rng(2).permutation(len(changed))]
+
+    incremental = build(changed, tmp_path / "data.json", tmp_path / "incremental", backend)
+    full = build(changed, tmp_path / "data.json", tmp_path / "full", backend)
+    assert incremental["manifest"]["encoded"] == 4
+    assert full["manifest"]["encoded"] == len(changed)
+    assert np.array_equal(incremental["embeddings"], full["embeddings"])
+    if backend == "ivf":
+        # Few customers changed: the index keeps its cells instead of being retrained
+        assert np.array_equal(incremental["neighbor_index"].centroids, first["neighbor_index"].centroids)
+        return
+    assert np.array_equal(incremental["neighbors"], full["neighbors"])
+    for strategy, table in full["tables"].items():
+        for idx in range(len(changed)):
+            customer = full["customers"].record(idx)
+            assert incremental["tables"][strategy].lookup(idx, customer) == table.lookup(idx, customer)
+
+# Same output shape as the hashing encoder, different vectors
+class ShortHashingEncoder(HashingEncoder):
+    def encode(self, texts, batch_size=None):
+        return super().encode([text[:20] for text in texts], batch_size)
+
+def test_snapshot_and_cache_follow_the_model_used(build, tmp_path):
+    customers = random_customers(50)
+    snapshot = build(customers, tmp_path / "data.json", tmp_path / "snapshots")
+    assert snapshot["manifest"]["model_name"] == "Utils.benchmark.HashingEncoder"
+    # The hashing vectors went to that encoder's cache, not to the transformer model's
+    assert load_embedding_cache(HashingEncoder()).count == len(customers)
+    assert load_embedding_cache(ShortHashingEncoder()).count == 0
+    assert not (tmp_path / "embedding-cache" / MODEL_NAME).exists()
+
+    # Another model does not reuse the snapshot or its vectors
+    write_customers(customers, tmp_path / "data.json")
+    other = load_or_build_snapshot(str(tmp_path / "data.json"), str(tmp_path / "snapshots"), model=ShortHashingEncoder())
+    assert other["version"] != snapshot["version"]
+    assert other["manifest"]["encoded"] == len(customers)
+    assert not np.array_equal(other["embeddings"], snapshot["embeddings"])
+
+def test_builds_in_the_same_second_get_their_own_versions(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path / "embedding-cache"))
+    customers = random_customers(30)
+    data_path, snapshot_dir = tmp_path / "data.json", tmp_path / "snapshots"
+    versions = []
+    for age in (30, 31, 32):
+        customers[0]["Age"] = age
+        write_customers(customers, data_path)
+        versions.append(build_snapshot(str(data_path), str(snapshot_dir), model=HashingEncoder()))
+    assert len(set(versions)) == 3
+    # The newest is current and the one before it is kept
+    assert os.path.basename(current_snapshot(str(snapshot_dir))) == versions[-1]
+    assert sorted(v for v in os.listdir(snapshot_dir) if os.path.isdir(snapshot_dir / v)) == versions[1:]
+    # A build with nothing to change returns the current version
+    assert build_snapshot(str(data_path), str(snapshot_dir), model=HashingEncoder()) == versions[-1]